@@ -0,0 +1,54 @@
+import os
+import json
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from utils.rate_limit import GovernedClient
+
+from utils.backtest import run_backtest, sync_history, load_history
+
+load_dotenv()
+
+
+def load_data(client, symbols, start_ms, end_ms):
+    sync_history(client, symbols, start_ms, end_ms)
+    data = {}
+    for symbol in symbols:
+        data[symbol] = load_history(symbol, start_ms, end_ms)
+        print(f"📥 {symbol}: {len(data[symbol]['3m'])} candles de 3m")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest das estratégias scalper e turtle")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--capital", type=float, default=1000.0, help="capital inicial por moeda (USDT)")
+    parser.add_argument("--fee", type=float, default=None, help="taxa por lado (padrão 0.0004)")
+    parser.add_argument("--trades-csv", help="salva a lista de trades em CSV")
+    args = parser.parse_args()
+
+    configs = json.loads(os.getenv("COIN_CONFIGS", "{}"))
+    symbols = args.symbols or list(configs.keys())
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - args.days * 24 * 3600 * 1000
+
+    client = GovernedClient(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+    data = load_data(client, symbols, start_ms, end_ms)
+
+    started = time.time()
+    summary, trades = run_backtest(data, configs, capital=args.capital, fee=args.fee, start_time=start_ms)
+    elapsed = time.time() - started
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(summary.round(2).to_string(index=False))
+    print(f"⏱️ Backtest de {len(symbols)} moedas em {elapsed:.2f}s")
+
+    if args.trades_csv and not trades.empty:
+        trades.to_csv(args.trades_csv, index=False)
+        print(f"💾 {len(trades)} trades salvos em {args.trades_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Benchmark ponta a ponta do ciclo do bot contra o mock_exchange.py, sem rede.
+# Cada escala (número de moedas) roda num processo próprio: sobe o mock, importa
+# main.py com um COIN_CONFIGS sintético e mede as tarefas agendadas e os
+# caminhos quentes (latência p50/p99, alocações via tracemalloc e chamadas REST
+# por ciclo). O resultado vai para um JSON comparável entre revisões:
+#
+#   python benchmarks/bench_cycle.py --scales 1 10 100 500 --output benchmarks/results/atual.json
+#   python benchmarks/bench_cycle.py --compare benchmarks/results/antes.json benchmarks/results/atual.json
+#
+# Com --from-store os preços vêm dos candles de 1m gravados (sync_klines.py
+# --intervals 1m) em vez do passeio aleatório.
+
+DEFAULT_SCALES = [1, 10, 50, 100, 250, 500]
+OPEN_FRACTION = 0.2  # fração das moedas com posição aberta (stop loss e monitoramento)
+MICRO_REPEAT = 20
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize_times(times):
+    return {
+        'p50_ms': round(percentile(times, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(times, 0.99) * 1000, 3),
+        'mean_ms': round(sum(times) / len(times) * 1000, 3),
+        'samples': len(times),
+    }
+
+
+def bench_configs(symbols):
+    configs = {}
+    for i, symbol in enumerate(symbols):
+        configs[symbol] = {
+            'leverage': 10,
+            'risk_percent': 0.01,
+            'take_profit_percent': 0.015,
+            'direction': 'BOTH',
+            'strategy': 'turtle' if i % 4 == 3 else 'scalper',
+        }
+    return configs
+
+
+# --- processo de uma escala --------------------------------------------------
+
+def run_worker(n, cycles, from_store, seed):
+    symbols = [f"MOCK{i:04d}USDT" for i in range(1, n + 1)]
+    log_dir = tempfile.mkdtemp(prefix="bench_cycle_")
+    # Configuração lida na importação dos módulos do bot
+    os.environ.update({
+        'BINANCE_API_KEY': 'mock',
+        'BINANCE_API_SECRET': 'mock',
+        'BINANCE_WEIGHT_LIMIT': str(10**9),
+        'COIN_CONFIGS': json.dumps(bench_configs(symbols)),
+        'LOG_CONSOLE': 'false',
+        'LOG_FILE': os.path.join(log_dir, 'logs.txt'),
+        'STATE_DB': os.path.join(log_dir, 'state.db'),
+        'TELEGRAM_BOT_TOKEN': '',
+        'DISCORD_WEBHOOK_URL': '',
+    })
+
+    from mock_exchange import start_mock_exchange
+
+    exchange, servers = start_mock_exchange(
+        symbols, port=0, ws_port=0, weight_limit=10**9, seed=seed, from_store=from_store,
+    )
+    host, port = servers[0].server_address[:2]
+    os.environ['BINANCE_FUTURES_URL'] = f"http://{host}:{port}"
+
+    import main
+    from utils import core, klines
+    from utils.indicators import live_values, WilderRSI, SMA
+
+    # Posições abertas para que stop loss e monitoramento tenham trabalho
+    for symbol in symbols[:max(1, int(n * OPEN_FRACTION))]:
+        price = exchange.price(symbol)
+        qty = max(exchange.specs[symbol]['step'], round(20 / price / exchange.specs[symbol]['step']) * exchange.specs[symbol]['step'])
+        exchange.create_order({'symbol': symbol, 'side': 'BUY', 'type': 'MARKET', 'quantity': str(qty)})
+    core.detect_open_positions()
+
+    tasks = {
+        'task_check_signals': main.task_check_signals,
+        'task_update_stop_loss': main.task_update_stop_loss,
+        'task_monitor_positions': main.task_monitor_positions,
+    }
+    # Ciclos reais ficam minutos apart: todo ciclo busca os candles novos
+    klines.KLINES_MAX_AGE = 0
+    results = {}
+    for name, fn in tasks.items():
+        fn()  # aquecimento (carga inicial do cache de klines)
+        times = []
+        rest = []
+        for _ in range(cycles):
+            exchange.reset_stats()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+            stats = exchange.stats_snapshot()
+            rest.append((stats['requests'], stats['weight']))
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        fn()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        diff = after.compare_to(before, 'filename')
+        results[name] = {
+            **summarize_times(times),
+            'rest_calls': round(sum(r[0] for r in rest) / cycles, 1),
+            'rest_weight': round(sum(r[1] for r in rest) / cycles, 1),
+            'alloc_peak_kb': round(peak / 1024, 1),
+            'alloc_blocks': sum(max(s.count_diff, 0) for s in diff),
+        }
+
+    # Caminhos quentes por chamada, com o cache de klines fresco (sem REST)
+    klines.KLINES_MAX_AGE = 1e9
+    micro = {
+        'get_klines_dataframe': lambda s: core.get_klines(s, '3m', 100),
+        'get_kline_array': lambda s: core.get_kline_array(s, '3m', 100),
+        'round_qty': lambda s: core.round_qty(0.123456, s),
+        'indicators_scalper': lambda s: (
+            live_values(s, '1h', core.get_kline_array(s, '1h', 100), 'rsi14', lambda: WilderRSI(14)),
+            live_values(s, '3m', core.get_kline_array(s, '3m', 100), 'ma9', lambda: SMA(9)),
+            live_values(s, '3m', core.get_kline_array(s, '3m', 100), 'ma21', lambda: SMA(21)),
+        ),
+    }
+    for name, fn in micro.items():
+        for symbol in symbols:
+            fn(symbol)
+        times = []
+        exchange.reset_stats()
+        for _ in range(max(1, MICRO_REPEAT // max(1, n // 50))):
+            for symbol in symbols:
+                start = time.perf_counter()
+                fn(symbol)
+                times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        for symbol in symbols:
+            fn(symbol)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            **summarize_times(times),
+            'rest_calls': exchange.stats_snapshot()['requests'],
+            'alloc_peak_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+# --- orquestração ------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_scales(scales, cycles, from_store, seed):
+    results = {}
+    for n in scales:
+        print(f"▶️  {n} moedas...", flush=True)
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', str(n), '--cycles', str(cycles), '--seed', str(seed)]
+        if from_store:
+            cmd.append('--from-store')
+        out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(out.stderr)
+            raise SystemExit(f"escala {n} falhou")
+        results[str(n)] = json.loads(out.stdout.strip().splitlines()[-1])
+        for task, r in results[str(n)].items():
+            print(f"   {task:<24} p50 {r['p50_ms']:>10.3f} ms  p99 {r['p99_ms']:>10.3f} ms  REST {r['rest_calls']:>7}")
+    return results
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('revision')} → {new['meta'].get('revision')}")
+    regressions = 0
+    for n, tasks in new['results'].items():
+        for task, r in tasks.items():
+            base = old['results'].get(n, {}).get(task)
+            if base is None:
+                continue
+            change = (r['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100 if base['p50_ms'] else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  ⚠️ regressão'
+                regressions += 1
+            print(f"{n:>4} {task:<24} p50 {base['p50_ms']:>10.3f} → {r['p50_ms']:>10.3f} ms ({change:+6.1f}%)"
+                  f"  REST {base['rest_calls']} → {r['rest_calls']}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do ciclo do bot contra o mock da Binance")
+    parser.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES, help="números de moedas")
+    parser.add_argument("--cycles", type=int, default=5, help="ciclos medidos por tarefa")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--from-store", action="store_true", help="preços dos candles de 1m gravados")
+    parser.add_argument("--output", help="arquivo JSON de resultados (padrão: benchmarks/results/<revisão>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois resultados")
+    parser.add_argument("--threshold", type=float, default=20.0, help="aumento de p50 (%%) considerado regressão")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker, args.cycles, args.from_store, args.seed)))
+        os._exit(0)  # não espera as threads do bot/mock
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    revision = git_revision()
+    results = run_scales(args.scales, args.cycles, args.from_store, args.seed)
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{revision or 'local'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'revision': revision,
+                'date': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'cycles': args.cycles,
+                'from_store': args.from_store,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"💾 {output}")
+
+
+if __name__ == "__main__":
+    main()
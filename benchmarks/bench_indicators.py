@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+import ta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import WilderRSI, SMA, RollingMin
+
+# Microbenchmark: custo por candle do caminho pandas/ta atual (recalcula tudo
+# sobre 100 candles) contra os indicadores incrementais. Também confere que os
+# valores batem com o ta.
+#
+#   python benchmarks/bench_indicators.py [candles]
+
+WINDOW = 100
+
+
+def synthetic_closes(n, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    low = close * (1 - np.abs(rng.normal(0, 0.001, n)))
+    return close, low
+
+
+def pandas_path(close, low):
+    out = []
+    for i in range(WINDOW, len(close)):
+        df = pd.DataFrame({'close': close[i - WINDOW:i], 'low': low[i - WINDOW:i]})
+        rsi = ta.momentum.RSIIndicator(df['close'], window=14).rsi().iloc[-1]
+        ma9 = df['close'].rolling(window=9).mean().iloc[-1]
+        ma21 = df['close'].rolling(window=21).mean().iloc[-1]
+        stop = df['low'].iloc[-20:].min()
+        out.append((rsi, ma9, ma21, stop))
+    return out
+
+
+def incremental_path(close, low):
+    rsi, ma9, ma21, stop = WilderRSI(14), SMA(9), SMA(21), RollingMin(20)
+    out = []
+    for i in range(len(close)):
+        rsi.update(close[i])
+        ma9.update(close[i])
+        ma21.update(close[i])
+        stop.update(low[i])
+        if i + 1 >= WINDOW:
+            out.append((rsi.value, ma9.value, ma21.value, stop.value))
+    return out
+
+
+def check_against_ta(close):
+    expected = ta.momentum.RSIIndicator(pd.Series(close), window=14).rsi().to_numpy()
+    rsi = WilderRSI(14)
+    got = []
+    for x in close:
+        rsi.update(x)
+        got.append(rsi.value)
+    return float(np.nanmax(np.abs(np.array(got) - expected)))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    close, low = synthetic_closes(n)
+
+    start = time.perf_counter()
+    pandas_out = pandas_path(close, low)
+    pandas_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    incremental_out = incremental_path(close, low)
+    incremental_time = time.perf_counter() - start
+
+    steps = len(pandas_out)
+    ma_diff = max(abs(a[1] - b[1]) + abs(a[2] - b[2]) + abs(a[3] - b[3]) for a, b in zip(pandas_out, incremental_out))
+    print(f"candles: {steps}")
+    print(f"pandas/ta:    {pandas_time / steps * 1e6:10.1f} µs/candle")
+    print(f"incremental:  {incremental_time / steps * 1e6:10.1f} µs/candle")
+    print(f"speedup:      {pandas_time / incremental_time:10.1f}x")
+    print(f"diff RSI vs ta (série completa): {check_against_ta(close):.2e}")
+    print(f"diff MA/stop vs pandas:          {ma_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
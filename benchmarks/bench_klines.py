@@ -0,0 +1,99 @@
+import sys
+import os
+import time
+import subprocess
+import tracemalloc
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.klines import parse_klines
+
+# Microbenchmark da leitura de klines do caminho ao vivo: o get_klines original
+# (DataFrame de 12 colunas de strings, com conversão de close/low/high) contra o
+# container Klines (array estruturado parseado direto da resposta da API) e o
+# custo de .to_frame() para quem ainda precisa do DataFrame. Mede tempo e
+# alocação por chamada e o custo de importação do pandas.
+#
+#   python benchmarks/bench_klines.py [candles]
+
+REPEAT = 500
+
+
+def synthetic_response(n):
+    # Mesmo formato da resposta de futures_klines: 12 campos, preços como string
+    start = 1_700_000_000_000
+    out = []
+    price = 100.0
+    for i in range(n):
+        open_time = start + i * 180_000
+        out.append([
+            open_time, f"{price:.4f}", f"{price * 1.002:.4f}", f"{price * 0.998:.4f}", f"{price * 1.001:.4f}",
+            "12345.678", open_time + 179_999, "1234567.8", 321, "6000.1", "600000.2", "0",
+        ])
+        price *= 1.0005
+    return out
+
+
+def legacy_path(raw):
+    df = pd.DataFrame(raw, columns=[
+        'timestamp', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_asset_volume', 'number_of_trades',
+        'taker_buy_base_volume', 'taker_buy_quote_volume', 'ignore'
+    ])
+    df['close'] = pd.to_numeric(df['close'])
+    df['low'] = pd.to_numeric(df['low'])
+    df['high'] = pd.to_numeric(df['high'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df['close'].iloc[-1], df['low'].iloc[-20:].min()
+
+
+def klines_path(raw):
+    rows = parse_klines(raw)
+    return float(rows['close'][-1]), float(rows['low'][-20:].min())
+
+
+def to_frame_path(raw):
+    df = parse_klines(raw).to_frame()
+    return df['close'].iloc[-1], df['low'].iloc[-20:].min()
+
+
+def measure(fn, raw):
+    fn(raw)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(raw)
+    per_call = (time.perf_counter() - start) / REPEAT
+    tracemalloc.start()
+    result = fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak, result
+
+
+def import_time(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    raw = synthetic_response(n)
+    results = {name: measure(fn, raw) for name, fn in (
+        ('legacy DataFrame', legacy_path),
+        ('Klines', klines_path),
+        ('Klines.to_frame', to_frame_path),
+    )}
+    legacy = results['legacy DataFrame']
+    for name, (per_call, peak, result) in results.items():
+        assert abs(result[0] - legacy[2][0]) < 1e-9 and abs(result[1] - legacy[2][1]) < 1e-9
+        print(f"{name:<18} {per_call * 1e6:10.1f} µs/chamada  pico {peak / 1024:8.1f} KiB"
+              f"  ({legacy[0] / per_call:5.1f}x)")
+    print(f"import pandas:       {import_time('pandas') * 1000:8.1f} ms")
+    print(f"import utils.klines: {import_time('utils.klines') * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
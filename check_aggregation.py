@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+from utils import kline_store
+from utils.klines import INTERVAL_MS
+from utils.aggregate import BASE_INTERVAL, BASE_MS, VOLUME_DECIMALS, Aggregator, aggregate
+
+load_dotenv()
+
+# Confere a agregação local contra os candles montados pela exchange. Usa o
+# histórico gravado por sync_klines.py: os candles de 1m são agregados em lote
+# e também minuto a minuto (como no caminho ao vivo), e os dois resultados são
+# comparados campo a campo com os candles do intervalo gravados da exchange.
+#
+#   python check_aggregation.py --sync --days 7
+#   python check_aggregation.py --symbols BTCUSDT --intervals 5m 1h
+#
+# Sai com código 1 se algum candle divergir.
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume', 'close_time')
+VOLUME_TOLERANCE = 0.5 * 10 ** -VOLUME_DECIMALS
+
+
+def incremental(rows, interval, seed=0):
+    # Entrega os minutos em blocos de tamanho aleatório, como chegam do REST/stream
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_MS[interval]
+    first = int(rows['open_time'][0])
+    aggregator = Aggregator(interval, -(-first // step) * step - BASE_MS)
+    out = []
+    i = 0
+    while i < len(rows):
+        n = int(rng.integers(1, 10))
+        out.append(aggregator.add_closed(rows[i:i + n]))
+        if i + n < len(rows):
+            aggregator.live(rows[i + n])
+        i += n
+    return np.concatenate(out) if out else rows[:0]
+
+
+def compare(ours, exchange):
+    common, a, b = np.intersect1d(ours['open_time'], exchange['open_time'], return_indices=True)
+    ours, exchange = ours[a], exchange[b]
+    bad = np.zeros(len(common), dtype=bool)
+    fields = {}
+    for field in FIELDS:
+        if field == 'volume':
+            diff = np.abs(ours[field] - exchange[field]) > VOLUME_TOLERANCE
+        else:
+            diff = ours[field] != exchange[field]
+        if diff.any():
+            fields[field] = int(diff.sum())
+        bad |= diff
+    return len(common), fields, common[bad]
+
+
+def check(symbol, interval, start_ms, end_ms):
+    base = kline_store.read(symbol, BASE_INTERVAL, start_ms, end_ms)
+    exchange = kline_store.read(symbol, interval, start_ms, end_ms)
+    if len(base) == 0 or len(exchange) == 0:
+        return None
+    base = np.array(base)
+    step = INTERVAL_MS[interval]
+    # Só buckets cobertos do início ao fim pelos minutos gravados
+    first = -(-int(base['open_time'][0]) // step) * step
+    last = (int(base['open_time'][-1]) + BASE_MS) // step * step - step
+    exchange = np.array(exchange)
+    exchange = exchange[(exchange['open_time'] >= first) & (exchange['open_time'] <= last)]
+
+    result = {}
+    for mode, ours in (('lote', aggregate(base, interval)), ('incremental', incremental(base, interval))):
+        compared, fields, bad = compare(ours, exchange)
+        result[mode] = {'compared': compared, 'mismatches': fields, 'first_bad': [int(t) for t in bad[:3]]}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere candles agregados de 1m contra os da exchange")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--intervals", nargs="*", default=['3m', '5m', '15m', '1h', '4h'])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--sync", action="store_true", help="baixa da exchange o que faltar antes de conferir")
+    args = parser.parse_args()
+
+    configs = json.loads(os.getenv("COIN_CONFIGS", "{}"))
+    symbols = args.symbols or list(configs.keys())
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - args.days * 24 * 3600 * 1000
+
+    if args.sync:
+        from utils.rate_limit import GovernedClient
+        client = GovernedClient(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+        for symbol in symbols:
+            for interval in [BASE_INTERVAL] + args.intervals:
+                kline_store.sync(client, symbol, interval, start_ms, end_ms)
+
+    failed = False
+    for symbol in symbols:
+        for interval in args.intervals:
+            result = check(symbol, interval, start_ms, end_ms)
+            if result is None:
+                print(f"⚠️ {symbol} {interval}: sem histórico de {BASE_INTERVAL} ou {interval} gravado")
+                continue
+            for mode, r in result.items():
+                ok = not r['mismatches'] and r['compared'] > 0
+                failed |= not ok
+                detail = "" if ok else f" divergências {r['mismatches']} (ex.: {r['first_bad']})"
+                print(f"{'✅' if ok else '❌'} {symbol} {interval} {mode}: {r['compared']} candles{detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import os
 
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")  # opcional
+API_PORT = int(os.getenv("API_PORT", 8080))  # mesma porta do bot (utils/api.py)
 
 def start(update: Update, context: CallbackContext):
     keyboard = [[InlineKeyboardButton("Verificar Status do Bot", callback_data='check_status')]]
@@ -16,9 +17,12 @@ def button(update: Update, context: CallbackContext):
     query.answer()
 
     try:
-        resp = requests.get("http://localhost:8080/health", timeout=2)
+        resp = requests.get(f"http://localhost:{API_PORT}/health", timeout=2)
         if resp.status_code == 200 and resp.text == "ok":
             query.edit_message_text("✅ Bot está rodando corretamente!")
+        elif resp.text.startswith("degraded"):
+            problems = resp.text.split(":", 1)[1].strip().replace("; ", "\n• ")
+            query.edit_message_text(f"⚠️ Bot rodando com problemas:\n• {problems}")
         else:
             query.edit_message_text("⚠️ Bot respondeu, mas com status inesperado.")
     except Exception as e:
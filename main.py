@@ -1,7 +1,7 @@
 import os
 import json
-import time
-import schedule
+import queue
+import socket
 from dotenv import load_dotenv
 
 from utils.core import (
@@ -10,8 +10,12 @@ from utils.core import (
     place_order,
     update_stop_loss,
     monitor_position,
+    reconcile_positions,
+    new_position_state,
     cancel_all_open_orders,
-    cancel_orders_if_no_position,
+    reconcile_orders,
+    add_symbols,
+    set_margin_allocator,
     get_klines,
     get_available_margin,
     rsi_trigger_flags,
@@ -19,40 +23,111 @@ from utils.core import (
     get_usdt_balance,
     LEVERAGE,
     RISK_PERCENT,
+    TAKE_PROFIT,
     DECIMALS,
     send_telegram,
     log,
-    get_available_margin
+    get_available_margin,
+    start_market_data_stream,
+    start_user_data_stream,
 )
 
 from utils.strategies import check_signals_scalper, check_signals_turtle
+from utils.executor import run_per_symbol
+from utils.rate_limit import weight_metrics
+from utils.orders import latency_stats
+from utils.scheduler import Scheduler, HIGH, NORMAL, LOW
+from utils.metrics import register_collector, register_health_check
+from utils.account import account_stats
+from utils.stream import stream_age
+from utils.notifier import notifier_stats
+from utils.order_sync import order_sync_stats
+from utils.util import log_queue_depth, log_dropped
+from utils.api import run_api
+from utils.shard import ShardClient
+from utils.scanner import scan
+from utils import core
 
 load_dotenv()
 
 # Carrega configuração de moedas do .env
-CONFIGS = json.loads(os.getenv("COIN_CONFIGS"))
+ALL_CONFIGS = json.loads(os.getenv("COIN_CONFIGS"))
+
+# Modo shard (shard.py): este processo opera só as moedas que o coordenador entregar
+SHARD_COORDINATOR = os.getenv("SHARD_COORDINATOR")  # host:porta
+SHARD_WORKER_ID = os.getenv("SHARD_WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+shard = None
+if SHARD_COORDINATOR:
+    shard = ShardClient(SHARD_COORDINATOR, SHARD_WORKER_ID)
+    CONFIGS = {symbol: ALL_CONFIGS[symbol] for symbol in shard.symbols if symbol in ALL_CONFIGS}
+else:
+    CONFIGS = ALL_CONFIGS
 initialize_configs(CONFIGS)
 
 SYMBOLS = list(CONFIGS.keys())
 
+# Modo streaming: klines e preços via WebSocket, sinais avaliados no fechamento do candle
+STREAM_MODE = os.getenv("STREAM_MODE", "false").lower() == "true"
+# User data stream: fechamentos detectados pelas execuções, polling vira só reconciliação
+USER_STREAM = os.getenv("USER_STREAM", "false").lower() == "true"
+SIGNAL_INTERVALS = {'scalper': '3m', 'turtle': '1h'}  # candle que dispara a avaliação
+HEALTH_STREAM_STALE = float(os.getenv("HEALTH_STREAM_STALE", 30))  # segundos sem mensagens do stream
+# Scanner: as SCAN_TOP melhores moedas do ranking entram no conjunto ativo, além
+# das de COIN_CONFIGS (0 desativa). SCAN_CONFIG completa a configuração delas.
+SCAN_TOP = int(os.getenv("SCAN_TOP", 0))
+SCAN_EVERY = float(os.getenv("SCAN_EVERY", 3600))  # segundos entre varreduras
+SCAN_CONFIG = json.loads(os.getenv("SCAN_CONFIG", "{}"))
+scanned_symbols = set()
+configured_symbols = set(ALL_CONFIGS)  # CONFIGS também recebe as moedas do scanner
+
+candle_close_queue = queue.Queue()
+
+def check_symbol(symbol):
+    config = CONFIGS[symbol]
+    strategy = config.get('strategy', 'scalper')  # padrão scalper
+
+    if symbol not in positions_state:
+        positions_state[symbol] = new_position_state()
+    if symbol not in rsi_trigger_flags:
+        rsi_trigger_flags[symbol] = {'LONG': False, 'SHORT': False}
+
+    if positions_state[symbol]['open']:
+        log(f"⚠️ Posição já aberta para {symbol}.")
+        return
+
+    if strategy == 'scalper':
+        check_signals_scalper(symbol)
+    elif strategy == 'turtle':
+        check_signals_turtle(symbol)
+
 def task_check_signals():
-    for symbol in SYMBOLS:
-        config = CONFIGS[symbol]
-        strategy = config.get('strategy', 'scalper')  # padrão scalper
+    run_per_symbol('signals', check_symbol, SYMBOLS)
 
-        if symbol not in positions_state:
-            positions_state[symbol] = {'open': False, 'side': None, 'stop_loss': None, 'qty': 0.0}
-        if symbol not in rsi_trigger_flags:
-            rsi_trigger_flags[symbol] = {'LONG': False, 'SHORT': False}
+def task_check_interval_signals(interval):
+    # Só as moedas cuja estratégia avalia no fechamento deste intervalo
+    symbols = [s for s in SYMBOLS if SIGNAL_INTERVALS.get(CONFIGS[s].get('strategy', 'scalper')) == interval]
+    if symbols:
+        run_per_symbol(f'signals {interval}', check_symbol, symbols)
 
-        if positions_state[symbol]['open']:
-            log(f"⚠️ Posição já aberta para {symbol}.")
-            continue
+def on_candle_close(symbol, interval):
+    # Chamado na thread do stream: só enfileira, a avaliação roda no loop principal
+    if symbol not in SYMBOLS:
+        return  # saiu do conjunto ativo (scanner), mas o stream continua inscrito
+    strategy = CONFIGS.get(symbol, {}).get('strategy', 'scalper')
+    if SIGNAL_INTERVALS.get(strategy) == interval:
+        candle_close_queue.put(symbol)
 
-        if strategy == 'scalper':
-            check_signals_scalper(symbol)
-        elif strategy == 'turtle':
-            check_signals_turtle(symbol)
+def task_process_candle_closes():
+    pending = []
+    while True:
+        try:
+            symbol = candle_close_queue.get_nowait()
+        except queue.Empty:
+            break
+        if symbol not in pending:
+            pending.append(symbol)
+    if pending:
+        run_per_symbol('signals', check_symbol, pending)
 
 
 def task_update_stop_loss():
@@ -60,8 +135,115 @@ def task_update_stop_loss():
         update_stop_loss(symbol)
 
 def task_monitor_positions():
-    for symbol in SYMBOLS:
-        monitor_position(symbol)
+    # Uma chamada em lote para todos os símbolos
+    reconcile_positions()
+
+def task_report_weight():
+    m = weight_metrics()
+    log(
+        f"⚖️ Peso API: {m['used_weight_1m']}/{m['limit']} (estimado {m['estimated_used']})"
+        f" | requisições: {m['requests']} | atrasadas: {sum(m['delayed'].values())} ({m['delay_seconds']}s)"
+        f" | bloqueios: {m['bans']}"
+    )
+    latency = latency_stats()
+    if latency['count']:
+        log(f"⚡ Sinal → posição protegida: p50 {latency['p50_ms']} ms | p99 {latency['p99_ms']} ms ({latency['count']} ordens)")
+
+def adopt_symbols(symbols):
+    # Moedas de um worker que morreu, redistribuídas pelo coordenador
+    configs = {s: ALL_CONFIGS[s] for s in symbols if s in ALL_CONFIGS and s not in CONFIGS}
+    if not configs:
+        return
+    add_symbols(configs)
+    SYMBOLS.extend(configs)
+    if STREAM_MODE:
+        start_market_data_stream(symbols=list(configs))
+
+def apply_scan(ranked):
+    # Moedas do scanner: entram as melhores do ranking até SCAN_TOP e só saem
+    # quando caem abaixo de 2*SCAN_TOP (evita trocar a cada varredura). As de
+    # COIN_CONFIGS e as que têm posição aberta ficam.
+    candidates = [r for r in ranked if r['symbol'] not in configured_symbols]
+    keep = {r['symbol'] for r in candidates[:2 * SCAN_TOP]}
+    dropped = [s for s in scanned_symbols if s not in keep and not positions_state[s]['open']]
+    for symbol in dropped:
+        SYMBOLS.remove(symbol)
+        scanned_symbols.discard(symbol)
+    added = [r for r in candidates if r['symbol'] not in SYMBOLS][:max(0, SCAN_TOP - len(scanned_symbols))]
+    fresh = {}
+    for r in added:
+        config = {
+            'leverage': LEVERAGE, 'risk_percent': RISK_PERCENT, 'take_profit_percent': TAKE_PROFIT,
+            'direction': 'BOTH', **SCAN_CONFIG, 'strategy': r['strategy'],
+        }
+        if r['symbol'] in CONFIGS:
+            CONFIGS[r['symbol']].update(config)  # já passou pelo scanner antes
+        else:
+            fresh[r['symbol']] = config
+    if fresh:
+        add_symbols(fresh)
+        if STREAM_MODE:
+            start_market_data_stream(symbols=list(fresh))
+    SYMBOLS.extend(r['symbol'] for r in added)
+    scanned_symbols.update(r['symbol'] for r in added)
+    if added or dropped:
+        log(f"🔭 Scanner: +{len(added)} -{len(dropped)} moedas ({', '.join(r['symbol'] for r in added) or '-'})")
+
+def task_scan_market():
+    apply_scan(scan(core.client))
+
+def start_shard_worker():
+    set_margin_allocator(shard)
+    shard.on_assign = adopt_symbols
+    shard.open_symbols = lambda: [s for s, state in positions_state.items() if state['open']]
+    shard.start()
+    log(f"🧩 Worker {SHARD_WORKER_ID}: {len(SYMBOLS)} moedas ({SHARD_COORDINATOR})")
+
+def collect_metrics():
+    # Gauges lidos na hora da coleta do /metrics
+    weight = weight_metrics()
+    latency = latency_stats()
+    account = account_stats()
+    notifiers = notifier_stats()
+    samples = [
+        ('bot_symbols', {}, len(SYMBOLS)),
+        ('bot_open_positions', {}, sum(1 for state in positions_state.values() if state['open'])),
+        ('binance_weight_limit', {}, weight['limit']),
+        ('binance_weight_used_1m', {}, weight['used_weight_1m']),
+        ('binance_weight_estimated', {}, weight['estimated_used']),
+        ('binance_weight_spent', {}, weight['weight_spent']),
+        ('binance_weight_delay_seconds', {}, weight['delay_seconds']),
+        ('binance_weight_bans', {}, weight['bans']),
+        ('binance_weight_blocked', {}, weight['blocked']),
+    ]
+    samples += [('binance_weight_delayed', {'priority': p}, n) for p, n in weight['delayed'].items()]
+    samples += [
+        ('queue_depth', {'queue': 'candle_close'}, candle_close_queue.qsize()),
+        ('queue_depth', {'queue': 'log'}, log_queue_depth()),
+        ('log_dropped', {}, log_dropped()),
+    ]
+    samples += [('queue_depth', {'queue': f'notify_{name}'}, n['pending']) for name, n in notifiers.items()]
+    samples += [('notify_dropped', {'channel': name}, n['dropped']) for name, n in notifiers.items()]
+    samples += [('notify_failed', {'channel': name}, n['failed']) for name, n in notifiers.items()]
+    samples += [
+        ('account_snapshot_version', {}, account['version']),
+        ('account_snapshot_age_seconds', {}, account['age']),
+        ('market_stream_age_seconds', {}, stream_age()),
+        ('order_latency_count', {}, latency['count']),
+        ('order_latency_p50_ms', {}, latency.get('p50_ms')),
+        ('order_latency_p99_ms', {}, latency.get('p99_ms')),
+    ]
+    samples += [(f'order_sync_{name}', {}, value) for name, value in order_sync_stats().items()]
+    return samples
+
+def data_health():
+    problems = []
+    age = stream_age()
+    if STREAM_MODE and age is not None and age > HEALTH_STREAM_STALE:
+        problems.append(f"stream de mercado sem mensagens há {age:.0f}s")
+    if weight_metrics()['blocked']:
+        problems.append("API bloqueada pela Binance (429/418)")
+    return problems
 
 def startup_checks():
     total_margin_used = 0.0
@@ -119,20 +301,48 @@ def startup_checks():
 
 
 
+def build_scheduler():
+    # Agenda as tarefas: sinais no fechamento do candle, stops e monitoramento
+    # com prioridade alta em pool próprio (também usado pelo replay, paper.py)
+    scheduler = Scheduler()
+    if STREAM_MODE:
+        start_market_data_stream(on_candle_close=on_candle_close)
+        scheduler.every(1, task_process_candle_closes, priority=LOW)
+    else:
+        for interval in sorted(set(SIGNAL_INTERVALS.values())):
+            scheduler.on_candle_close(
+                interval, lambda i=interval: task_check_interval_signals(i), name=f"signals[{interval}]", priority=LOW
+            )
+    if USER_STREAM:
+        start_user_data_stream()
+        scheduler.every(300, task_monitor_positions, priority=HIGH)
+    else:
+        scheduler.every(60, task_monitor_positions, priority=HIGH)
+    scheduler.on_candle_close('5m', task_update_stop_loss, priority=HIGH)
+    scheduler.every(60, reconcile_orders, priority=NORMAL)
+    scheduler.every(300, task_report_weight, priority=LOW)
+    # No modo shard o coordenador decide as moedas de cada worker
+    if SCAN_TOP and shard is None:
+        scheduler.every(SCAN_EVERY, task_scan_market, priority=LOW)
+    return scheduler
+
+
 if __name__ == "__main__":
+    if shard is not None:
+        start_shard_worker()
     startup_checks()
 
     # Detectar posições abertas no startup
     detect_open_positions()
 
-    # Agenda as tarefas periódicas
-    schedule.every(3).minutes.do(task_check_signals)
-    schedule.every(5).minutes.do(task_update_stop_loss)
-    schedule.every(60).seconds.do(task_monitor_positions)
-    schedule.every(5).minutes.do(detect_open_positions)
-    schedule.every(1).minutes.do(cancel_orders_if_no_position)
+    scheduler = build_scheduler()
+
+    # /health e /metrics na porta da API
+    register_collector(scheduler.samples)
+    register_collector(collect_metrics)
+    register_health_check('scheduler', scheduler.health)
+    register_health_check('dados', data_health)
+    run_api()
 
     log("🟢 Iniciando loop principal...")
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    scheduler.run_forever()
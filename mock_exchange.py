@@ -0,0 +1,1016 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+from utils import clock
+from utils.klines import INTERVAL_MS
+from utils.rate_limit import endpoint_weight
+from utils.ws_server import ws_handshake, ws_send, ws_drain, ThreadingWSServer
+
+# Substituto local da API de futuros da Binance (REST + WebSocket) para rodar
+# o bot sem conta real e medir ciclo/carga com muitas moedas:
+#
+#   python mock_exchange.py --count 200 --latency 20 --error-rate 0.01
+#   BINANCE_FUTURES_URL=http://127.0.0.1:8088 BINANCE_STREAM_URL=ws://127.0.0.1:9443 \
+#   BINANCE_API_KEY=mock BINANCE_API_SECRET=mock python main.py
+#
+# Preços vêm de um passeio aleatório de 1m por moeda (ou de candles de 1m do
+# armazenamento local com --from-store); candles maiores são agregados dos de
+# 1m. Ordens a mercado executam no preço atual, STOP_MARKET/TAKE_PROFIT_MARKET
+# ficam no livro de algo orders (como na Binance) até o preço cruzar o gatilho.
+#
+# O replay (paper.py) usa a mesma exchange dentro do processo, sem HTTP
+# (serve_in_process), no relógio virtual e com os candles gravados nos
+# horários reais; as condicionais disparam pela máxima/mínima de cada minuto.
+
+load_dotenv()
+
+BASE_MS = 60_000
+TAKER_FEE = 0.0004
+DEFAULT_LEVERAGE = 20
+GENERATE_CHUNK = 1440  # minutos gerados por vez no passeio aleatório
+ENGINE_INTERVAL = 0.2  # segundos entre verificações de gatilho
+
+
+class PricePath:
+    # Candles de 1m a partir de `origin`; qualquer intervalo é agregado deles
+    def __init__(self, origin_ms):
+        self.origin = origin_ms
+        self.o = self.h = self.l = self.c = self.v = np.zeros(0)
+        self.lock = threading.Lock()
+
+    def _ensure(self, idx):
+        pass
+
+    def index(self, t_ms):
+        return int((t_ms - self.origin) // BASE_MS)
+
+    def price(self, t_ms):
+        i = self.index(t_ms)
+        with self.lock:
+            self._ensure(i)
+            i = max(0, min(i, len(self.c) - 1))
+            frac = min(1.0, ((t_ms - self.origin) - i * BASE_MS) / BASE_MS)
+            return float(self.o[i] + (self.c[i] - self.o[i]) * frac)
+
+    def minutes(self, start_ms, end_ms):
+        # Início, abertura, máxima e mínima dos minutos em [start, end)
+        a, b = self.index(start_ms), self.index(end_ms)
+        with self.lock:
+            self._ensure(b)
+            a, b = max(a, 0), min(b, len(self.c))
+            return self.origin + a * BASE_MS, self.o[a:b], self.h[a:b], self.l[a:b]
+
+    def klines(self, interval, now_ms, start_ms=None, end_ms=None, limit=500):
+        step = INTERVAL_MS[interval]
+        k = step // BASE_MS
+        current = now_ms // step * step
+        if start_ms is not None:
+            first = -(-int(start_ms) // step) * step
+            last = min(current, first + (limit - 1) * step)
+            if end_ms is not None:
+                last = min(last, int(end_ms) // step * step)
+        else:
+            last = current if end_ms is None else min(current, int(end_ms) // step * step)
+            first = last - (limit - 1) * step
+        first = max(first, -(-self.origin // step) * step)
+        if first > last:
+            return np.zeros((0, 7))
+
+        now_idx = self.index(now_ms)
+        a, b = self.index(first), min(self.index(last + step), now_idx + 1)
+        with self.lock:
+            self._ensure(now_idx)
+            b = min(b, len(self.c))
+            if a >= b:
+                return np.zeros((0, 7))
+            o, h, l, c, v = (x[a:b].copy() for x in (self.o, self.h, self.l, self.c, self.v))
+        if a <= now_idx < a + len(c):
+            # Minuto em formação: fecha no preço atual
+            j = now_idx - a
+            p = self.price(now_ms)
+            frac = ((now_ms - self.origin) - now_idx * BASE_MS) / BASE_MS
+            c[j], h[j], l[j], v[j] = p, max(o[j], p), min(o[j], p), v[j] * frac
+
+        starts = np.arange(0, len(c), k)
+        out = np.empty((len(starts), 7))
+        out[:, 0] = first + np.arange(len(starts)) * step
+        out[:, 1] = o[starts]
+        out[:, 2] = np.maximum.reduceat(h, starts)
+        out[:, 3] = np.minimum.reduceat(l, starts)
+        out[:, 4] = c[np.r_[starts[1:], len(c)] - 1]
+        out[:, 5] = np.add.reduceat(v, starts)
+        out[:, 6] = out[:, 0] + step - 1
+        return out
+
+
+class SyntheticPath(PricePath):
+    def __init__(self, origin_ms, price, volatility, seed):
+        super().__init__(origin_ms)
+        self.rng = np.random.default_rng(seed)
+        self.last = price
+        self.volatility = volatility
+        self.base_volume = 1e5 / price
+
+    def _ensure(self, idx):
+        while idx >= len(self.c):
+            n = GENERATE_CHUNK
+            r = self.rng.normal(0.0, self.volatility, n)
+            c = self.last * np.exp(np.cumsum(r))
+            o = np.r_[self.last, c[:-1]]
+            wick = np.abs(self.rng.normal(0.0, self.volatility * 0.5, (2, n)))
+            h = np.maximum(o, c) * (1 + wick[0])
+            l = np.minimum(o, c) * (1 - wick[1])
+            # Volume em lotes de 0.001, como na exchange: a soma dos minutos bate com os intervalos maiores
+            v = np.round(self.rng.gamma(2.0, self.base_volume, n), 3)
+            self.o, self.h, self.l, self.c, self.v = (
+                np.r_[old, new] for old, new in zip((self.o, self.h, self.l, self.c, self.v), (o, h, l, c, v))
+            )
+            self.last = float(c[-1])
+
+
+class RecordedPath(PricePath):
+    # Candles de 1m gravados (sync_klines.py --intervals 1m), deslocados no tempo
+    def __init__(self, origin_ms, rows):
+        super().__init__(origin_ms)
+        # Minutos sem candle gravado viram candles parados no último fechamento
+        idx = (rows['open_time'] - rows['open_time'][0]) // BASE_MS
+        n = int(idx[-1]) + 1
+        filled = np.zeros(n, dtype=bool)
+        filled[idx] = True
+        last = np.maximum.accumulate(np.where(filled, np.arange(n), 0))
+        close = np.empty(n)
+        close[idx] = rows['close']
+        close = close[last]
+        self.o, self.h, self.l, self.c = (close.copy() for _ in range(4))
+        self.v = np.zeros(n)
+        for name, arr in (('open', self.o), ('high', self.h), ('low', self.l), ('close', self.c), ('volume', self.v)):
+            arr[idx] = rows[name]
+
+
+def _symbol_spec(price):
+    tick = 10 ** (math.floor(math.log10(price)) - 4)
+    step = min(1.0, 10 ** math.floor(math.log10(100 / price)))
+    return {
+        'tick': tick,
+        'step': step,
+        'price_decimals': max(0, -int(round(math.log10(tick)))),
+        'qty_decimals': max(0, -int(round(math.log10(step)))),
+    }
+
+
+class ExchangeError(Exception):
+    def __init__(self, code, msg, status=400):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+        self.status = status
+
+
+class MockExchange:
+    def __init__(self, symbols, balance=10000.0, volatility=0.002, history_hours=120,
+                 latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, weight_limit=2400,
+                 seed=0, from_store=False, replay=False):
+        self.started = clock.now_ms()
+        origin = (self.started // BASE_MS - history_hours * 60) * BASE_MS
+        rng = random.Random(seed)
+        self.paths = {}
+        self.specs = {}
+        for i, symbol in enumerate(symbols):
+            path = None
+            if from_store:
+                from utils import kline_store
+                rows = kline_store.read(symbol, '1m')
+                if len(rows):
+                    # No replay os candles ficam nos horários em que foram gravados
+                    path = RecordedPath(int(rows['open_time'][0]) if replay else origin, rows)
+            if path is None:
+                path = SyntheticPath(origin, 10 ** rng.uniform(-1, 4), volatility, seed * 100_003 + i)
+            self.paths[symbol] = path
+            self.specs[symbol] = _symbol_spec(path.price(origin))
+
+        self.wallet = balance
+        self.positions = {}  # símbolo -> {'amt', 'entry'}
+        self.leverage = {s: DEFAULT_LEVERAGE for s in symbols}
+        self.orders = {}  # orderId -> ordem limite aberta
+        self.algo_orders = {}  # algoId -> ordem condicional aberta
+        self.next_id = 1
+        self.lock = threading.RLock()
+        self.fills = []  # (ms, símbolo, lado, qtd, preço, tipo, pnl realizado, taxa)
+        self.matched_until = None  # replay: minutos já conferidos por match_minutes
+
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.weight_limit = weight_limit
+        self.weight_minute = 0
+        self.weight_used = 0
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+        self.user_sockets = []
+        self.listen_keys = set()
+        self.routes = {
+            ('get', 'ping'): lambda p: {},
+            ('get', 'time'): lambda p: {'serverTime': self.now()},
+            ('get', 'exchangeInfo'): self.exchange_info,
+            ('get', 'klines'): self.get_klines,
+            ('get', 'ticker/price'): self.ticker_price,
+            ('get', 'ticker/24hr'): self.ticker_24hr,
+            ('get', 'premiumIndex'): self.premium_index,
+            ('get', 'account'): self.account,
+            ('get', 'balance'): self.balance,
+            ('get', 'positionRisk'): self.position_risk,
+            ('get', 'symbolConfig'): self.symbol_config,
+            ('get', 'openOrders'): self.open_orders,
+            ('get', 'openAlgoOrders'): self.open_algo_orders,
+            ('post', 'order'): self.create_order,
+            ('post', 'algoOrder'): self.create_algo_order,
+            ('post', 'batchOrders'): self.batch_orders,
+            ('post', 'leverage'): self.change_leverage,
+            ('post', 'marginType'): lambda p: {'code': 200, 'msg': 'success'},
+            ('delete', 'order'): self.cancel_order,
+            ('delete', 'algoOrder'): self.cancel_algo_order,
+            ('delete', 'batchOrders'): self.cancel_batch,
+            ('delete', 'allOpenOrders'): self.cancel_all,
+            ('delete', 'algoOpenOrders'): self.cancel_all_algo,
+            ('post', 'listenKey'): self.new_listen_key,
+            ('put', 'listenKey'): lambda p: {},
+            ('delete', 'listenKey'): lambda p: {},
+        }
+
+    # --- utilidades -----------------------------------------------------
+
+    def now(self):
+        return clock.now_ms()
+
+    def price(self, symbol, now_ms=None):
+        return self.paths[symbol].price(now_ms or self.now())
+
+    def _path(self, params):
+        symbol = params.get('symbol')
+        if symbol not in self.paths:
+            raise ExchangeError(-1121, "Invalid symbol.")
+        return symbol, self.paths[symbol]
+
+    def _fmt_price(self, symbol, price):
+        return f"{price:.{self.specs[symbol]['price_decimals']}f}"
+
+    def _new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    # --- mercado --------------------------------------------------------
+
+    def exchange_info(self, params):
+        symbols = []
+        for symbol, spec in self.specs.items():
+            symbols.append({
+                'symbol': symbol,
+                'status': 'TRADING',
+                'contractType': 'PERPETUAL',
+                'quoteAsset': 'USDT',
+                'pricePrecision': spec['price_decimals'],
+                'quantityPrecision': spec['qty_decimals'],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'tickSize': str(spec['tick'])},
+                    {'filterType': 'LOT_SIZE', 'stepSize': str(spec['step']), 'minQty': str(spec['step'])},
+                    {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+                ],
+            })
+        return {'timezone': 'UTC', 'serverTime': self.now(), 'symbols': symbols}
+
+    def get_klines(self, params):
+        symbol, path = self._path(params)
+        if params.get('interval') not in INTERVAL_MS:
+            raise ExchangeError(-1120, "Invalid interval.")
+        rows = path.klines(
+            params['interval'], self.now(),
+            start_ms=int(params['startTime']) if 'startTime' in params else None,
+            end_ms=int(params['endTime']) if 'endTime' in params else None,
+            limit=min(int(params.get('limit', 500)), 1500),
+        )
+        fmt = lambda x: self._fmt_price(symbol, x)
+        return [
+            [int(r[0]), fmt(r[1]), fmt(r[2]), fmt(r[3]), fmt(r[4]), f"{r[5]:.3f}", int(r[6]),
+             f"{r[5] * r[4]:.2f}", 100, "0", "0", "0"]
+            for r in rows
+        ]
+
+    def _each_symbol(self, params, fn):
+        if 'symbol' in params:
+            symbol, _ = self._path(params)
+            return fn(symbol)
+        return [fn(symbol) for symbol in self.paths]
+
+    def ticker_price(self, params):
+        now = self.now()
+        return self._each_symbol(params, lambda s: {
+            'symbol': s, 'price': self._fmt_price(s, self.price(s, now)), 'time': now,
+        })
+
+    def ticker_24hr(self, params):
+        now = self.now()
+
+        def ticker(symbol):
+            rows = self.paths[symbol].klines('1h', now, limit=24)
+            last, first = rows[-1, 4], rows[0, 1]
+            return {
+                'symbol': symbol,
+                'priceChange': self._fmt_price(symbol, last - first),
+                'priceChangePercent': f"{(last / first - 1) * 100:.3f}",
+                'lastPrice': self._fmt_price(symbol, last),
+                'highPrice': self._fmt_price(symbol, rows[:, 2].max()),
+                'lowPrice': self._fmt_price(symbol, rows[:, 3].min()),
+                'volume': f"{rows[:, 5].sum():.3f}",
+                'quoteVolume': f"{(rows[:, 5] * rows[:, 4]).sum():.2f}",
+                'openTime': int(rows[0, 0]),
+                'closeTime': now,
+                'count': 1000,
+            }
+        return self._each_symbol(params, ticker)
+
+    def premium_index(self, params):
+        now = self.now()
+        return self._each_symbol(params, lambda s: {
+            'symbol': s, 'markPrice': self._fmt_price(s, self.price(s, now)),
+            'indexPrice': self._fmt_price(s, self.price(s, now)),
+            'lastFundingRate': '0.0001', 'nextFundingTime': (now // 28_800_000 + 1) * 28_800_000, 'time': now,
+        })
+
+    # --- conta ----------------------------------------------------------
+
+    def _margin(self, now=None):
+        now = now or self.now()
+        upnl = 0.0
+        initial = 0.0
+        for symbol, pos in self.positions.items():
+            price = self.price(symbol, now)
+            upnl += (price - pos['entry']) * pos['amt']
+            initial += abs(pos['amt']) * price / self.leverage[symbol]
+        return upnl, initial
+
+    def account(self, params):
+        with self.lock:
+            now = self.now()
+            upnl, initial = self._margin(now)
+            available = self.wallet + upnl - initial
+            positions = [self._position_row(s, now) for s in self.positions]
+        return {
+            'totalWalletBalance': f"{self.wallet:.8f}",
+            'totalUnrealizedProfit': f"{upnl:.8f}",
+            'totalMarginBalance': f"{self.wallet + upnl:.8f}",
+            'totalInitialMargin': f"{initial:.8f}",
+            'availableBalance': f"{available:.8f}",
+            'maxWithdrawAmount': f"{max(available, 0):.8f}",
+            'assets': [{
+                'asset': 'USDT',
+                'walletBalance': f"{self.wallet:.8f}",
+                'unrealizedProfit': f"{upnl:.8f}",
+                'marginBalance': f"{self.wallet + upnl:.8f}",
+                'initialMargin': f"{initial:.8f}",
+                'availableBalance': f"{available:.8f}",
+                'maxWithdrawAmount': f"{max(available, 0):.8f}",
+            }],
+            'positions': positions,
+        }
+
+    def balance(self, params):
+        with self.lock:
+            upnl, initial = self._margin()
+            return [{
+                'accountAlias': 'mock',
+                'asset': 'USDT',
+                'balance': f"{self.wallet:.8f}",
+                'crossWalletBalance': f"{self.wallet:.8f}",
+                'crossUnPnl': f"{upnl:.8f}",
+                'availableBalance': f"{self.wallet + upnl - initial:.8f}",
+                'maxWithdrawAmount': f"{max(self.wallet + upnl - initial, 0):.8f}",
+                'updateTime': self.now(),
+            }]
+
+    def _position_row(self, symbol, now):
+        pos = self.positions.get(symbol, {'amt': 0.0, 'entry': 0.0})
+        price = self.price(symbol, now)
+        notional = pos['amt'] * price
+        return {
+            'symbol': symbol,
+            'positionSide': 'BOTH',
+            'positionAmt': f"{pos['amt']:.{self.specs[symbol]['qty_decimals']}f}",
+            'entryPrice': f"{pos['entry']:.8f}",
+            'markPrice': self._fmt_price(symbol, price),
+            'unRealizedProfit': f"{(price - pos['entry']) * pos['amt']:.8f}",
+            'unrealizedProfit': f"{(price - pos['entry']) * pos['amt']:.8f}",
+            'notional': f"{notional:.8f}",
+            'leverage': str(self.leverage[symbol]),
+            'initialMargin': f"{abs(notional) / self.leverage[symbol]:.8f}",
+            'updateTime': now,
+        }
+
+    def position_risk(self, params):
+        with self.lock:
+            now = self.now()
+            if 'symbol' in params:
+                symbol, _ = self._path(params)
+                return [self._position_row(symbol, now)]
+            return [self._position_row(s, now) for s in self.positions]
+
+    def symbol_config(self, params):
+        return self._each_symbol(params, lambda s: {
+            'symbol': s, 'marginType': 'CROSSED', 'isAutoAddMargin': False,
+            'leverage': self.leverage[s], 'maxNotionalValue': '1000000',
+        })
+
+    def change_leverage(self, params):
+        symbol, _ = self._path(params)
+        leverage = int(params['leverage'])
+        if not 1 <= leverage <= 125:
+            raise ExchangeError(-4028, "Leverage is not valid.")
+        self.leverage[symbol] = leverage
+        return {'symbol': symbol, 'leverage': leverage, 'maxNotionalValue': '1000000'}
+
+    # --- ordens ---------------------------------------------------------
+
+    def _fill(self, symbol, side, qty, price, order_type, order_id, reduce_only=False, close_position=False, at=None):
+        # Executa contra a posição (modo one-way); devolve o PnL realizado
+        with self.lock:
+            pos = self.positions.get(symbol, {'amt': 0.0, 'entry': 0.0})
+            signed = qty if side == 'BUY' else -qty
+            amt = pos['amt']
+            realized = 0.0
+            if amt == 0 or (amt > 0) == (signed > 0):
+                if reduce_only or close_position:
+                    raise ExchangeError(-2022, "ReduceOnly Order is rejected.")
+                new_amt = amt + signed
+                pos['entry'] = (pos['entry'] * abs(amt) + price * qty) / abs(new_amt)
+            else:
+                closing = min(abs(signed), abs(amt))
+                realized = (price - pos['entry']) * closing * (1 if amt > 0 else -1)
+                new_amt = amt + signed
+                if (reduce_only or close_position) and abs(signed) > abs(amt):
+                    new_amt = 0.0
+                if new_amt != 0 and (new_amt > 0) != (amt > 0):
+                    pos['entry'] = price
+            step = self.specs[symbol]['step']
+            new_amt = round(new_amt / step) * step
+            fee = price * qty * TAKER_FEE
+            self.wallet += realized - fee
+            if abs(new_amt) < step / 2:
+                self.positions.pop(symbol, None)
+                new_amt = 0.0
+                pos['entry'] = 0.0
+            else:
+                pos['amt'] = new_amt
+                self.positions[symbol] = pos
+            entry = pos['entry']
+            now = at or self.now()
+            self.fills.append((now, symbol, side, qty, price, order_type, realized, fee))
+        self._emit({
+            'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now,
+            'o': {
+                's': symbol, 'i': order_id, 'S': side, 'o': 'MARKET', 'ot': order_type,
+                'x': 'TRADE', 'X': 'FILLED', 'L': str(price), 'l': str(qty), 'ap': str(price), 'z': str(qty),
+                'rp': f"{realized:.8f}", 'R': reduce_only, 'cp': close_position, 'n': f"{fee:.8f}", 'N': 'USDT',
+            },
+        })
+        self._emit({
+            'e': 'ACCOUNT_UPDATE', 'E': now, 'T': now,
+            'a': {
+                'm': 'ORDER',
+                'B': [{'a': 'USDT', 'wb': f"{self.wallet:.8f}", 'cw': f"{self.wallet:.8f}"}],
+                'P': [{'s': symbol, 'pa': str(new_amt), 'ep': str(entry), 'ps': 'BOTH'}],
+            },
+        })
+        return realized
+
+    def create_order(self, params):
+        symbol, _ = self._path(params)
+        side = params.get('side')
+        order_type = params.get('type', 'MARKET')
+        if side not in ('BUY', 'SELL'):
+            raise ExchangeError(-1117, "Invalid side.")
+        if order_type in ('STOP_MARKET', 'TAKE_PROFIT_MARKET', 'STOP', 'TAKE_PROFIT', 'TRAILING_STOP_MARKET'):
+            raise ExchangeError(-4120, "Order type not supported for this endpoint. Please use the Algo Order API endpoints instead.")
+        reduce_only = params.get('reduceOnly') in ('true', 'True', True)
+        qty = float(params.get('quantity', 0))
+        spec = self.specs[symbol]
+        if qty < spec['step']:
+            raise ExchangeError(-4003, "Quantity less than or equal to zero.")
+        order_id = self._new_id()
+        now = self.now()
+        base = {
+            'orderId': order_id, 'symbol': symbol, 'clientOrderId': params.get('newClientOrderId', ''),
+            'type': order_type, 'origType': order_type, 'side': side, 'origQty': str(qty),
+            'reduceOnly': reduce_only, 'closePosition': False, 'positionSide': 'BOTH',
+            'timeInForce': params.get('timeInForce', 'GTC'), 'updateTime': now,
+        }
+        if order_type == 'MARKET':
+            price = self.price(symbol, now)
+            if not reduce_only:
+                with self.lock:
+                    upnl, initial = self._margin(now)
+                    if qty * price / self.leverage[symbol] > self.wallet + upnl - initial:
+                        raise ExchangeError(-2019, "Margin is insufficient.")
+            self._fill(symbol, side, qty, price, 'MARKET', order_id, reduce_only=reduce_only)
+            return {**base, 'status': 'FILLED', 'price': '0', 'avgPrice': self._fmt_price(symbol, price),
+                    'executedQty': str(qty), 'cumQuote': f"{qty * price:.8f}"}
+        if order_type == 'LIMIT':
+            order = {**base, 'status': 'NEW', 'price': params['price'], 'avgPrice': '0', 'executedQty': '0', 'cumQuote': '0'}
+            with self.lock:
+                self.orders[order_id] = order
+            return order
+        raise ExchangeError(-1116, "Invalid orderType.")
+
+    def create_algo_order(self, params):
+        symbol, _ = self._path(params)
+        order_type = params.get('type')
+        side = params.get('side')
+        if order_type not in ('STOP_MARKET', 'TAKE_PROFIT_MARKET'):
+            raise ExchangeError(-1116, "Invalid orderType.")
+        trigger = float(params.get('triggerPrice', params.get('stopPrice', 0)))
+        if self._triggered(symbol, side, order_type, trigger, self.price(symbol)):
+            raise ExchangeError(-2021, "Order would immediately trigger.")
+        close_position = params.get('closePosition') in ('true', 'True', True)
+        with self.lock:
+            if close_position and any(
+                o['symbol'] == symbol and o['side'] == side and o['orderType'] == order_type and o['closePosition']
+                for o in self.algo_orders.values()
+            ):
+                raise ExchangeError(-4130, "An open stop or take profit order with GTE and closePosition in the direction is existing.")
+        algo_id = self._new_id()
+        order = {
+            'algoId': algo_id, 'clientAlgoId': params.get('clientAlgoId', ''), 'algoType': 'CONDITIONAL',
+            'orderType': order_type, 'symbol': symbol, 'side': side, 'positionSide': 'BOTH',
+            'timeInForce': params.get('timeInForce', 'GTC'), 'quantity': params.get('quantity', '0'),
+            'algoStatus': 'NEW', 'triggerPrice': self._fmt_price(symbol, trigger), 'price': '0',
+            'workingType': params.get('workingType', 'CONTRACT_PRICE'),
+            'closePosition': close_position,
+            'reduceOnly': params.get('reduceOnly') in ('true', 'True', True),
+            'createTime': self.now(), 'updateTime': self.now(),
+        }
+        with self.lock:
+            self.algo_orders[algo_id] = order
+        return order
+
+    def batch_orders(self, params):
+        results = []
+        for order in json.loads(params['batchOrders']):
+            try:
+                results.append(self.create_order({k: str(v) if not isinstance(v, str) else v for k, v in order.items()}))
+            except ExchangeError as e:
+                results.append({'code': e.code, 'msg': e.msg})
+        return results
+
+    def open_orders(self, params):
+        with self.lock:
+            return [o for o in self.orders.values() if params.get('symbol') in (None, o['symbol'])]
+
+    def open_algo_orders(self, params):
+        with self.lock:
+            return [o for o in self.algo_orders.values() if params.get('symbol') in (None, o['symbol'])]
+
+    def cancel_order(self, params):
+        symbol, _ = self._path(params)
+        with self.lock:
+            order = self.orders.pop(int(params.get('orderId', 0)), None)
+        if order is None or order['symbol'] != symbol:
+            raise ExchangeError(-2011, "Unknown order sent.")
+        return {**order, 'status': 'CANCELED'}
+
+    def cancel_algo_order(self, params):
+        with self.lock:
+            order = self.algo_orders.pop(int(params.get('algoId', 0)), None)
+        if order is None:
+            raise ExchangeError(-2011, "Unknown order sent.")
+        return {'algoId': order['algoId'], 'clientAlgoId': order['clientAlgoId'], 'code': '200', 'msg': 'success'}
+
+    def cancel_batch(self, params):
+        ids = json.loads(params.get('orderIdList', params.get('orderidlist', '[]')))
+        results = []
+        for order_id in ids:
+            try:
+                results.append(self.cancel_order({'symbol': params.get('symbol'), 'orderId': order_id}))
+            except ExchangeError as e:
+                results.append({'code': e.code, 'msg': e.msg})
+        return results
+
+    def cancel_all(self, params):
+        symbol, _ = self._path(params)
+        with self.lock:
+            for order_id in [i for i, o in self.orders.items() if o['symbol'] == symbol]:
+                del self.orders[order_id]
+        return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+
+    def cancel_all_algo(self, params):
+        symbol, _ = self._path(params)
+        with self.lock:
+            for algo_id in [i for i, o in self.algo_orders.items() if o['symbol'] == symbol]:
+                del self.algo_orders[algo_id]
+        return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+
+    @staticmethod
+    def _triggered(symbol, side, order_type, trigger, price):
+        # Stop de venda (fecha LONG) dispara abaixo; take profit de venda, acima
+        if order_type == 'STOP_MARKET':
+            return price <= trigger if side == 'SELL' else price >= trigger
+        return price >= trigger if side == 'SELL' else price <= trigger
+
+    def _trigger(self, order, price, at=None):
+        # Executa uma condicional disparada; False se ela já saiu do livro
+        symbol = order['symbol']
+        with self.lock:
+            if self.algo_orders.pop(order['algoId'], None) is None:
+                return False
+            pos = self.positions.get(symbol)
+            if order['closePosition']:
+                if pos is None or (pos['amt'] > 0) != (order['side'] == 'SELL'):
+                    return True
+                qty = abs(pos['amt'])
+            else:
+                qty = float(order['quantity'])
+            try:
+                self._fill(symbol, order['side'], qty, price, order['orderType'], self._new_id(),
+                           reduce_only=order['reduceOnly'], close_position=order['closePosition'], at=at)
+            except ExchangeError:
+                pass
+        return True
+
+    def match(self):
+        # Dispara ordens condicionais e executa ordens limite que cruzaram
+        now = self.now()
+        with self.lock:
+            algo = list(self.algo_orders.values())
+            limits = list(self.orders.values())
+        for order in algo:
+            price = self.price(order['symbol'], now)
+            if self._triggered(order['symbol'], order['side'], order['orderType'], float(order['triggerPrice']), price):
+                self._trigger(order, price)
+        for order in limits:
+            symbol = order['symbol']
+            price = self.price(symbol, now)
+            limit = float(order['price'])
+            if (order['side'] == 'BUY' and price <= limit) or (order['side'] == 'SELL' and price >= limit):
+                with self.lock:
+                    if self.orders.pop(order['orderId'], None) is None:
+                        continue
+                    try:
+                        self._fill(symbol, order['side'], float(order['origQty']), limit, 'LIMIT', order['orderId'],
+                                   reduce_only=order['reduceOnly'])
+                    except ExchangeError:
+                        pass
+
+    def match_minutes(self, now_ms):
+        # Replay: confere cada minuto fechado desde a última chamada pela máxima
+        # e mínima, não só pelo preço do instante. Executa no gatilho, ou na
+        # abertura se o minuto já abriu além dele. No mesmo minuto, o stop
+        # executa antes do take profit.
+        end = int(now_ms) // BASE_MS * BASE_MS
+        start = self.matched_until if self.matched_until is not None else end
+        self.matched_until = max(start, end)
+        if end <= start:
+            return
+        with self.lock:
+            algo = list(self.algo_orders.values())
+        hits = []
+        for order in algo:
+            t0, o, h, l = self.paths[order['symbol']].minutes(max(start, order['createTime'] // BASE_MS * BASE_MS), end)
+            trigger = float(order['triggerPrice'])
+            below = (order['orderType'] == 'STOP_MARKET') == (order['side'] == 'SELL')
+            crossed = np.flatnonzero(l <= trigger if below else h >= trigger)
+            if len(crossed) == 0:
+                continue
+            i = int(crossed[0])
+            gapped = o[i] <= trigger if below else o[i] >= trigger
+            price = float(o[i]) if gapped else trigger
+            hits.append((t0 + i * BASE_MS, order['orderType'] != 'STOP_MARKET', order['algoId'], order, price))
+        for at, _, _, order, price in sorted(hits, key=lambda hit: hit[:3]):
+            self._trigger(order, price, at=at + BASE_MS - 1)
+
+    def run_engine(self):
+        while True:
+            try:
+                self.match()
+            except Exception as e:
+                print(f"Erro no motor de ordens: {e}")
+            time.sleep(ENGINE_INTERVAL)
+
+    # --- user data stream -----------------------------------------------
+
+    def new_listen_key(self, params):
+        key = f"mock{self._new_id():010d}"
+        self.listen_keys.add(key)
+        return {'listenKey': key}
+
+    def _emit(self, event):
+        raw = json.dumps(event)
+        for entry in list(self.user_sockets):
+            sock, lock = entry
+            try:
+                with lock:
+                    ws_send(sock, raw)
+            except OSError:
+                if entry in self.user_sockets:
+                    self.user_sockets.remove(entry)
+
+    # --- REST -----------------------------------------------------------
+
+    def _count(self, key, weight):
+        with self.stats_lock:
+            minute = self.now() // 60_000
+            if minute != self.weight_minute:
+                self.weight_minute = minute
+                self.weight_used = 0
+            self.weight_used += weight
+            entry = self.stats.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += weight
+            return self.weight_used
+
+    def handle(self, method, endpoint, params):
+        # Devolve (status HTTP, corpo, headers extras)
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        weight = endpoint_weight(endpoint, params)
+        used = self._count(f"{method.upper()} {endpoint}", weight)
+        headers = {'X-MBX-USED-WEIGHT-1M': str(used)}
+        if used > self.weight_limit:
+            headers['Retry-After'] = str(60 - self.now() // 1000 % 60)
+            return 429, {'code': -1003, 'msg': "Too many requests; current limit is exceeded."}, headers
+        if self.error_rate and random.random() < self.error_rate:
+            return 503, {'code': -1001, 'msg': "Internal error; unable to process your request. Please try again."}, headers
+        route = self.routes.get((method, endpoint))
+        if route is None:
+            return 404, {'code': -5000, 'msg': f"Path {endpoint} not supported by mock."}, headers
+        try:
+            return 200, route(params), headers
+        except ExchangeError as e:
+            return e.status, {'code': e.code, 'msg': e.msg}, headers
+        except (KeyError, ValueError) as e:
+            return 400, {'code': -1102, 'msg': f"Mandatory parameter missing or malformed: {e}"}, headers
+
+    def stats_snapshot(self):
+        with self.stats_lock:
+            calls = {k: {'count': v[0], 'weight': v[1]} for k, v in sorted(self.stats.items())}
+        with self.lock:
+            return {
+                'requests': sum(v['count'] for v in calls.values()),
+                'weight': sum(v['weight'] for v in calls.values()),
+                'endpoints': calls,
+                'wallet': self.wallet,
+                'positions': len(self.positions),
+                'open_orders': len(self.orders),
+                'open_algo_orders': len(self.algo_orders),
+            }
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats.clear()
+
+
+def _request_params(path, body=None):
+    url = urlparse(path)
+    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    if body:
+        params.update({k: v[-1] for k, v in parse_qs(body).items()})
+    params.pop('signature', None)
+    params.pop('timestamp', None)
+    params.pop('recvWindow', None)
+    return url.path, params
+
+
+def _route(exchange, method, path, params):
+    m = re.match(r'^/(?:fapi|api)/v\d+/(.+)$', path)
+    if m is None:
+        return 404, {'code': -5000, 'msg': f"Path {path} not found."}, {}
+    return exchange.handle(method, m.group(1), params)
+
+
+class InProcessAdapter(requests.adapters.BaseAdapter):
+    # Transporte do replay: a requisição vai direto para a exchange, sem socket
+    def __init__(self, exchange):
+        super().__init__()
+        self.exchange = exchange
+
+    def send(self, request, **kwargs):
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body
+        path, params = _request_params(request.url, body)
+        status, data, headers = _route(self.exchange, request.method.lower(), path, params)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(data).encode()
+        response.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json', **headers})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+IN_PROCESS_URL = "http://mock.in-process"
+
+
+# Toda sessão do requests passa a entregar as chamadas para base_url à
+# exchange deste processo (use com BINANCE_FUTURES_URL=base_url)
+def serve_in_process(exchange, base_url=IN_PROCESS_URL):
+    adapter = InProcessAdapter(exchange)
+    get_adapter = requests.Session.get_adapter
+
+    def routed(session, url):
+        if url.startswith(base_url):
+            return adapter
+        return get_adapter(session, url)
+
+    requests.Session.get_adapter = routed
+    return adapter
+
+
+def make_rest_handler(exchange):
+    class RestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers e corpo saem em writes separados
+
+        def log_message(self, *args):
+            pass
+
+        def _params(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return _request_params(self.path, self.rfile.read(length).decode() if length else None)
+
+        def _reply(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, method):
+            path, params = self._params()
+            if path == '/mock/stats':
+                return self._reply(200, exchange.stats_snapshot())
+            if path == '/mock/reset':
+                exchange.reset_stats()
+                return self._reply(200, {})
+            self._reply(*_route(exchange, method, path, params))
+
+        def do_GET(self):
+            self._dispatch('get')
+
+        def do_POST(self):
+            self._dispatch('post')
+
+        def do_PUT(self):
+            self._dispatch('put')
+
+        def do_DELETE(self):
+            self._dispatch('delete')
+
+    return RestHandler
+
+
+def _kline_frame(exchange, symbol, interval, row, closed):
+    # Preços no tick da moeda, iguais aos do REST
+    fmt = lambda x: exchange._fmt_price(symbol, x)
+    return {
+        'e': 'kline', 'E': int(time.time() * 1000), 's': symbol,
+        'k': {
+            't': int(row[0]), 'T': int(row[6]), 's': symbol, 'i': interval,
+            'o': fmt(row[1]), 'h': fmt(row[2]), 'l': fmt(row[3]), 'c': fmt(row[4]), 'v': f"{row[5]:.3f}",
+            'x': closed,
+        },
+    }
+
+
+def make_ws_handler(exchange, ws_interval):
+    names = {s.lower(): s for s in exchange.paths}
+
+    class MockWSHandler(socketserver.BaseRequestHandler):
+        def handle(self):
+            path = ws_handshake(self.request)
+            if path is None:
+                return
+            closed = threading.Event()
+            threading.Thread(target=ws_drain, args=(self.request, closed), daemon=True).start()
+            if path.startswith('/ws/'):
+                entry = (self.request, threading.Lock())
+                exchange.user_sockets.append(entry)
+                closed.wait()
+                if entry in exchange.user_sockets:
+                    exchange.user_sockets.remove(entry)
+                return
+            self._market(path, closed)
+
+        def _market(self, path, closed):
+            query = parse_qs(urlparse(path).query)
+            streams = []
+            for name in query.get('streams', [''])[0].split('/'):
+                parts = name.split('@')
+                symbol = names.get(parts[0])
+                if symbol is None or len(parts) < 2:
+                    continue
+                if parts[1].startswith('kline_'):
+                    streams.append((name, symbol, parts[1][len('kline_'):]))
+                elif parts[1] == 'markPrice':
+                    streams.append((name, symbol, None))
+            last_open = {}
+            lock = threading.Lock()
+            while not closed.is_set():
+                now = exchange.now()
+                for name, symbol, interval in streams:
+                    if interval is None:
+                        data = {'e': 'markPriceUpdate', 'E': now, 's': symbol,
+                                'p': str(exchange.price(symbol, now))}
+                        frames = [data]
+                    else:
+                        rows = exchange.paths[symbol].klines(interval, now, limit=2)
+                        frames = []
+                        if len(rows) == 0:
+                            continue
+                        current = int(rows[-1][0])
+                        if name in last_open and current > last_open[name] and len(rows) > 1:
+                            frames.append(_kline_frame(exchange, symbol, interval, rows[-2], True))
+                        last_open[name] = current
+                        frames.append(_kline_frame(exchange, symbol, interval, rows[-1], False))
+                    try:
+                        with lock:
+                            for data in frames:
+                                ws_send(self.request, json.dumps({'stream': name, 'data': data}))
+                    except OSError:
+                        return
+                closed.wait(ws_interval)
+
+    return MockWSHandler
+
+
+def start_mock_exchange(symbols, host="127.0.0.1", port=8088, ws_port=9443, ws_interval=1.0, **kwargs):
+    # Sobe REST, WebSocket e motor de ordens em threads; devolve (exchange, servidores)
+    exchange = MockExchange(symbols, **kwargs)
+    rest = ThreadingHTTPServer((host, port), make_rest_handler(exchange))
+    rest.daemon_threads = True
+    servers = [rest]
+    if ws_port:
+        servers.append(ThreadingWSServer((host, ws_port), make_ws_handler(exchange, ws_interval)))
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=exchange.run_engine, daemon=True).start()
+    return exchange, servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exchange local que simula a API de futuros da Binance")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--count", type=int, default=0, help="moedas sintéticas extras (MOCK0001USDT, ...)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088, help="porta REST")
+    parser.add_argument("--ws-port", type=int, default=9443, help="porta WebSocket (0 desativa)")
+    parser.add_argument("--ws-interval", type=float, default=1.0, help="segundos entre atualizações do stream")
+    parser.add_argument("--balance", type=float, default=10000.0, help="saldo inicial em USDT")
+    parser.add_argument("--volatility", type=float, default=0.002, help="desvio do retorno por minuto")
+    parser.add_argument("--history-hours", type=int, default=120, help="histórico disponível antes do início")
+    parser.add_argument("--from-store", action="store_true", help="usa candles de 1m do armazenamento local")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência por requisição (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação da latência (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de requisições que falham com 503")
+    parser.add_argument("--weight-limit", type=int, default=2400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    symbols = args.symbols or list(json.loads(os.getenv("COIN_CONFIGS", "{}")).keys())
+    symbols += [f"MOCK{i:04d}USDT" for i in range(1, args.count + 1)]
+    if not symbols:
+        parser.error("nenhuma moeda: use --symbols, --count ou COIN_CONFIGS")
+
+    exchange, _ = start_mock_exchange(
+        symbols, host=args.host, port=args.port, ws_port=args.ws_port, ws_interval=args.ws_interval,
+        balance=args.balance, volatility=args.volatility, history_hours=args.history_hours,
+        latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+        weight_limit=args.weight_limit, seed=args.seed, from_store=args.from_store,
+    )
+    print(f"🧪 Mock da Binance com {len(symbols)} moedas: REST http://{args.host}:{args.port}"
+          + (f" | WS ws://{args.host}:{args.ws_port}" if args.ws_port else ""))
+    while True:
+        time.sleep(60)
+        stats = exchange.stats_snapshot()
+        print(f"📊 {stats['requests']} requisições | peso {stats['weight']} | saldo {stats['wallet']:.2f}"
+              f" | posições {stats['positions']}")
+
+
+if __name__ == "__main__":
+    main()
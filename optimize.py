@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+from utils.rate_limit import GovernedClient
+
+from utils.backtest import sync_history
+from utils.optimizer import DEFAULT_SPACE, METRICS, grid, random_search, optimize, rank, best_configs
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Otimização de parâmetros das estratégias")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--capital", type=float, default=1000.0)
+    parser.add_argument("--search", choices=["grid", "random"], default="random")
+    parser.add_argument("--samples", type=int, default=500, help="combinações na busca aleatória")
+    parser.add_argument("--space", help="arquivo JSON com o espaço de busca (padrão: DEFAULT_SPACE)")
+    parser.add_argument("--metric", choices=list(METRICS), default="return_dd")
+    parser.add_argument("--min-trades", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--output", help="salva o ranking completo em JSON")
+    args = parser.parse_args()
+
+    configs = json.loads(os.getenv("COIN_CONFIGS", "{}"))
+    symbols = args.symbols or list(configs.keys())
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - args.days * 24 * 3600 * 1000
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    combos = grid(space) if args.search == "grid" else random_search(space, args.samples)
+
+    client = GovernedClient(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+    sync_history(client, symbols, start_ms, end_ms)
+
+    print(f"🔎 {len(combos)} combinações x {len(symbols)} moedas")
+    started = time.time()
+    results = optimize(
+        symbols, combos, start_ms, end_ms, capital=args.capital, workers=args.workers,
+        progress=lambda done, total: print(f"\r{done}/{total} lotes", end="", flush=True),
+    )
+    print(f"\n⏱️ {len(results)} backtests em {time.time() - started:.1f}s")
+
+    ranked = rank(results, args.metric, args.min_trades)
+    for symbol, rows in ranked.items():
+        print(f"\n🏆 {symbol}")
+        for r in rows[:args.top]:
+            print(
+                f"  score {r['score']:8.2f} | retorno {r['return_pct']:7.2f}% | dd {r['max_drawdown_pct']:6.2f}% "
+                f"| trades {r['trades']:4d} | {json.dumps(r['params'])}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(ranked, f, indent=2)
+
+    print("\n📋 COIN_CONFIGS sugerido:")
+    print(json.dumps(best_configs(ranked), separators=(',', ':')))
+
+
+if __name__ == "__main__":
+    main()
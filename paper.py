@@ -0,0 +1,232 @@
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Replay acelerado (paper trading) do bot: o fluxo real do main.py (sinais,
+# place_order, stops, monitoramento e reconciliação, com positions_state e
+# rsi_trigger_flags) roda contra os candles de 1m gravados, num relógio
+# virtual que pula direto para a próxima tarefa agendada. A exchange é o
+# mock_exchange.py dentro do processo: ordens a mercado executam no preço do
+# instante e stops/take profits pela máxima/mínima de cada minuto.
+#
+#   python sync_klines.py --intervals 1m --days 120
+#   python paper.py --days 90
+#   python paper.py --synthetic --days 30 --symbols BTCUSDT ETHUSDT
+#
+# Saídas: lista de trades (CSV) e perfil de tempo por tarefa e por endpoint (JSON).
+
+# O bot lê a configuração no import: tudo que aponta para fora é desligado antes
+os.environ.update({
+    'BINANCE_API_KEY': 'paper',
+    'BINANCE_API_SECRET': 'paper',
+    'STATE_DB': '',
+    'STREAM_MODE': 'false',
+    'USER_STREAM': 'false',
+    'TELEGRAM_BOT_TOKEN': '',
+    'DISCORD_WEBHOOK_URL': '',
+    'LOG_CONSOLE': 'false',
+})
+os.environ.setdefault('LOG_FILE', 'logs-paper.txt')
+
+from utils import clock, kline_store
+from utils.util import flush_log
+from mock_exchange import MockExchange, IN_PROCESS_URL, BASE_MS, serve_in_process
+
+os.environ['BINANCE_FUTURES_URL'] = IN_PROCESS_URL
+
+from utils.core import LEVERAGE, RISK_PERCENT, TAKE_PROFIT
+
+DAY = 86_400
+WARMUP_HOURS = 120     # histórico antes do início do replay (indicadores de 1h)
+PROGRESS_EVERY = 7 * DAY
+
+
+def replay_window(symbols, days, warmup_hours):
+    # Trecho em que todas as moedas têm candles de 1m gravados
+    firsts, lasts = [], []
+    for symbol in symbols:
+        rows = kline_store.read(symbol, '1m')
+        if len(rows) == 0:
+            raise SystemExit(f"Sem candles de 1m gravados para {symbol}: rode sync_klines.py --intervals 1m")
+        firsts.append(int(rows['open_time'][0]))
+        lasts.append(int(rows['open_time'][-1]) + BASE_MS)
+    start = max(firsts) / 1000 + warmup_hours * 3600
+    end = min(lasts) / 1000
+    if days:
+        start = max(start, end - days * DAY)
+    if start >= end:
+        raise SystemExit("Histórico gravado curto demais para o aquecimento dos indicadores")
+    return start, end
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def pair_trades(fills):
+    # Uma trade vai da execução que abre a posição até a que a zera
+    trades = []
+    open_trades = {}
+    for at, symbol, side, qty, price, kind, realized, fee in fills:
+        signed = qty if side == 'BUY' else -qty
+        trade = open_trades.get(symbol)
+        if trade is None:
+            trade = open_trades[symbol] = {
+                'symbol': symbol, 'side': 'LONG' if signed > 0 else 'SHORT', 'qty': 0.0, 'amt': 0.0,
+                'entry_time': at, 'entry_price': 0.0, 'pnl': 0.0, 'fees': 0.0,
+            }
+        if (signed > 0) == (trade['side'] == 'LONG'):
+            trade['entry_price'] = (trade['entry_price'] * trade['qty'] + price * qty) / (trade['qty'] + qty)
+            trade['qty'] += qty
+        trade['amt'] += signed
+        trade['pnl'] += realized - fee
+        trade['fees'] += fee
+        if abs(trade['amt']) < trade['qty'] * 1e-9:
+            del open_trades[symbol]
+            trades.append({
+                'symbol': symbol,
+                'side': trade['side'],
+                'qty': round(trade['qty'], 8),
+                'entry_time': _iso(trade['entry_time']),
+                'entry_price': round(trade['entry_price'], 8),
+                'exit_time': _iso(at),
+                'exit_price': price,
+                'exit_type': kind,
+                'minutes': round((at - trade['entry_time']) / 60_000, 1),
+                'pnl': round(trade['pnl'], 4),
+                'fees': round(trade['fees'], 4),
+            })
+    return trades, list(open_trades.values())
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def timed(durations, name, fn):
+    # Tempo real de cada execução da tarefa
+    samples = durations.setdefault(name, [])
+
+    def run():
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            samples.append(time.perf_counter() - started)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay acelerado do bot contra candles gravados")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--days", type=int, default=0, help="últimos N dias gravados (padrão: tudo)")
+    parser.add_argument("--balance", type=float, default=10000.0, help="saldo inicial em USDT")
+    parser.add_argument("--synthetic", action="store_true", help="preços sintéticos em vez dos candles gravados")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trades", default="paper-trades.csv", help="arquivo CSV com as trades")
+    parser.add_argument("--profile", default="paper-profile.json", help="arquivo JSON com o perfil de tempo")
+    args = parser.parse_args()
+
+    configs = json.loads(os.getenv("COIN_CONFIGS", "{}"))
+    symbols = args.symbols or list(configs.keys())
+    # Moedas fora de COIN_CONFIGS entram com os padrões do bot
+    defaults = {'leverage': LEVERAGE, 'risk_percent': RISK_PERCENT, 'take_profit_percent': TAKE_PROFIT}
+    os.environ['COIN_CONFIGS'] = json.dumps({s: {**defaults, **configs.get(s, {})} for s in symbols})
+
+    if args.synthetic:
+        end = time.time() // 60 * 60
+        start = end - (args.days or 30) * DAY
+    else:
+        start, end = replay_window(symbols, args.days, WARMUP_HOURS)
+    virtual = clock.set_clock(clock.VirtualClock(start))
+    exchange = MockExchange(symbols, balance=args.balance, history_hours=WARMUP_HOURS,
+                            seed=args.seed, from_store=not args.synthetic, replay=True)
+    serve_in_process(exchange)
+    print(f"⏪ Replay de {len(symbols)} moedas: {_iso(start * 1000)} → {_iso(end * 1000)} UTC")
+
+    import main as bot  # import tardio: o bot inicializa (e chama a exchange) no import
+    bot.detect_open_positions()
+    scheduler = bot.build_scheduler()
+    durations = {}
+    for job in scheduler.jobs:
+        job.fn = timed(durations, job.name, job.fn)
+
+    progress = {'next': start + PROGRESS_EVERY}
+    real_started = time.perf_counter()
+
+    def advance(t):
+        # A exchange executa os minutos que fecharam antes de o relógio chegar em t
+        exchange.match_minutes(max(t, virtual.now) * 1000)
+        virtual.set(t)
+        if virtual.now >= progress['next']:
+            progress['next'] += PROGRESS_EVERY
+            elapsed = time.perf_counter() - real_started
+            print(f"   {_iso(virtual.now * 1000)} | {elapsed:.0f}s | {len(exchange.fills)} execuções"
+                  f" | saldo {exchange.wallet:.2f}")
+
+    scheduler.run_virtual(end, advance)
+    elapsed = time.perf_counter() - real_started
+    flush_log()
+
+    trades, still_open = pair_trades(exchange.fills)
+    if trades:
+        with open(args.trades, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(trades[0].keys()))
+            writer.writeheader()
+            writer.writerows(trades)
+
+    jobs = {}
+    for name, samples in sorted(durations.items()):
+        if not samples:
+            continue
+        jobs[name] = {
+            'runs': len(samples),
+            'total_s': round(sum(samples), 3),
+            'p50_ms': round(_percentile(samples, 0.5) * 1000, 3),
+            'p99_ms': round(_percentile(samples, 0.99) * 1000, 3),
+            'max_ms': round(max(samples) * 1000, 3),
+        }
+    stats = exchange.stats_snapshot()
+    profile = {
+        'symbols': len(symbols),
+        'virtual_days': round((end - start) / DAY, 2),
+        'real_seconds': round(elapsed, 2),
+        'speedup': round((end - start) / elapsed, 1),
+        'jobs': jobs,
+        'requests': stats['requests'],
+        'weight': stats['weight'],
+        'endpoints': stats['endpoints'],
+    }
+    with open(args.profile, "w") as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"\n⏱️ {profile['virtual_days']} dias em {elapsed:.1f}s ({profile['speedup']:.0f}x tempo real)")
+    for name, job in jobs.items():
+        print(f"   {name:28} {job['runs']:>7} execuções | total {job['total_s']:>8.2f}s"
+              f" | p50 {job['p50_ms']:>8.2f} ms | p99 {job['p99_ms']:>8.2f} ms")
+    print(f"   {stats['requests']} requisições REST (peso {stats['weight']})")
+
+    pnl = sum(t['pnl'] for t in trades)
+    wins = sum(1 for t in trades if t['pnl'] > 0)
+    print(f"\n📒 {len(trades)} trades | acerto {wins / len(trades) * 100 if trades else 0:.1f}%"
+          f" | PnL {pnl:.2f} USDT | saldo final {exchange.wallet:.2f} USDT")
+    for symbol in symbols:
+        own = [t for t in trades if t['symbol'] == symbol]
+        if own:
+            print(f"   {symbol:12} {len(own):>5} trades | PnL {sum(t['pnl'] for t in own):>10.2f}")
+    if still_open:
+        print(f"   {len(still_open)} posições ainda abertas no fim do replay")
+    if trades:
+        print(f"💾 Trades em {args.trades}")
+    print(f"💾 Perfil em {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import json
+import argparse
+from dotenv import load_dotenv
+
+from utils.rate_limit import GovernedClient
+from utils.core import LEVERAGE, RISK_PERCENT, TAKE_PROFIT
+from utils.scanner import scan, SCAN_MIN_QUOTE_VOLUME, SCAN_MAX_SYMBOLS, SCAN_WORKERS
+
+load_dotenv()
+
+# Ranking das perpétuas USDT-M pelas pré-condições do scalper e do turtle
+# (gatilho RSI 1h, distância ao rompimento de 20 candles de 1h e spread MA9/MA21
+# no 3m). Veja utils/scanner.py.
+#
+#   python scanner.py --top 30
+#   python scanner.py --min-volume 50000000 --output scan.json --configs 10
+
+
+def scan_configs(ranked, n):
+    # COIN_CONFIGS para as n primeiras, com os padrões do bot
+    return {
+        r['symbol']: {
+            'leverage': LEVERAGE,
+            'risk_percent': RISK_PERCENT,
+            'take_profit_percent': TAKE_PROFIT,
+            'direction': 'BOTH',
+            'strategy': r['strategy'],
+        }
+        for r in ranked[:n]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking das perpétuas USDT-M para as estratégias do bot")
+    parser.add_argument("--min-volume", type=float, default=SCAN_MIN_QUOTE_VOLUME, help="volume 24h mínimo em USDT")
+    parser.add_argument("--max-symbols", type=int, default=SCAN_MAX_SYMBOLS, help="moedas mais líquidas analisadas")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="buscas de klines em paralelo")
+    parser.add_argument("--top", type=int, default=30, help="linhas impressas")
+    parser.add_argument("--output", help="salva o ranking completo em JSON")
+    parser.add_argument("--configs", type=int, default=0, help="imprime um COIN_CONFIGS com as N primeiras")
+    args = parser.parse_args()
+
+    client = GovernedClient(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+    ranked = scan(client, args.min_volume, args.max_symbols, args.workers)
+
+    print(f"{'moeda':14} {'lado':5} {'estratégia':10} {'score':>6} {'RSI 1h':>7} {'rompimento':>11} {'MA9-MA21':>9} {'vol 24h (M)':>12}")
+    for r in ranked[:args.top]:
+        flags = ('🎯' if r['rsi_armed'] else '  ') + ('✂️' if r['crossed'] else '')
+        print(
+            f"{r['symbol']:14} {r['side']:5} {r['strategy']:10} {r['score']:6.2f} {r['rsi']:7.2f}"
+            f" {r['breakout_pct']:10.2f}% {r['ma_spread_pct']:8.3f}% {r['quote_volume'] / 1e6:12.1f} {flags}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(ranked, f, indent=2)
+        print(f"💾 Ranking em {args.output}")
+
+    if args.configs:
+        print("\n📋 COIN_CONFIGS sugerido:")
+        print(json.dumps(scan_configs(ranked, args.configs), separators=(',', ':')))
+
+
+if __name__ == "__main__":
+    main()
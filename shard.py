@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import time
+import argparse
+import secrets
+import subprocess
+from dotenv import load_dotenv
+from utils.shard import Coordinator, SHARD_AUTHKEY, parse_address
+from utils.util import log
+
+load_dotenv()
+
+# Roda o bot em modo shard: sobe o coordenador e N processos do main.py, cada
+# um com uma parte das moedas de COIN_CONFIGS. Só com workers locais e
+# endereço de loopback, sem SHARD_AUTHKEY, a chave é gerada na hora e passada
+# aos workers. Workers em outras máquinas entram com --no-spawn e a mesma
+# SHARD_AUTHKEY, com o coordenador num endereço da rede privada (nunca exposto
+# à internet: as mensagens são pickle):
+#
+#   SHARD_AUTHKEY=<chave> SHARD_COORDINATOR=<host>:7070 SHARD_WORKER_ID=w2 python main.py
+#
+#   python shard.py --workers 4
+#   SHARD_AUTHKEY=<chave> python shard.py --workers 2 --address 10.0.0.5:7070 --no-spawn
+
+REPORT_EVERY = 60
+LOOPBACK = ('127.0.0.1', 'localhost', '::1')
+
+
+def spawn_worker(worker, address, api_port):
+    env = dict(os.environ)
+    env.update({
+        'SHARD_COORDINATOR': f"{address[0]}:{address[1]}",
+        'SHARD_WORKER_ID': worker,
+        'API_PORT': str(api_port),
+        'LOG_FILE': f"logs-{worker}.txt",
+    })
+    return subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')], env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordenador do bot em vários processos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--address", default="127.0.0.1:7070", help="host:porta do coordenador")
+    parser.add_argument("--no-spawn", action="store_true", help="só coordena; os workers são iniciados à parte")
+    parser.add_argument("--api-port", type=int, default=int(os.getenv("API_PORT", 8080)), help="workers usam as portas seguintes")
+    args = parser.parse_args()
+
+    address = parse_address(args.address)
+    authkey = SHARD_AUTHKEY
+    if not authkey:
+        if args.no_spawn or address[0] not in LOOPBACK:
+            parser.error("SHARD_AUTHKEY é obrigatória com workers remotos (--no-spawn ou endereço fora do loopback)")
+        # Chave descartável: só os workers iniciados aqui a recebem (pelo ambiente)
+        os.environ['SHARD_AUTHKEY'] = secrets.token_hex(32)
+        authkey = os.environ['SHARD_AUTHKEY'].encode()
+
+    symbols = list(json.loads(os.getenv("COIN_CONFIGS", "{}")).keys())
+    workers = max(1, min(args.workers, len(symbols)))
+    try:
+        coordinator = Coordinator(symbols, workers, address, authkey=authkey)
+    except ValueError as e:
+        parser.error(str(e))
+    coordinator.start()
+    log(f"🧩 Coordenador em {args.address}: {len(symbols)} moedas em {workers} workers")
+
+    procs = {}
+    if not args.no_spawn:
+        for i, worker in enumerate(coordinator.plan):
+            procs[worker] = spawn_worker(worker, coordinator.address, args.api_port + 1 + i)
+
+    last_report = time.time()
+    try:
+        while True:
+            time.sleep(1)
+            for worker, proc in list(procs.items()):
+                code = proc.poll()
+                if code is not None:
+                    del procs[worker]
+                    coordinator.mark_dead(worker, f"processo saiu com código {code}")
+            if time.time() - last_report > REPORT_EVERY:
+                log(f"🧩 {json.dumps(coordinator.snapshot())}")
+                last_report = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs.values():
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
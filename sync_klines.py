@@ -0,0 +1,35 @@
+import os
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+from utils.rate_limit import GovernedClient
+
+from utils import kline_store
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza o histórico local de klines")
+    parser.add_argument("--symbols", nargs="*", help="padrão: moedas de COIN_CONFIGS")
+    parser.add_argument("--intervals", nargs="*", default=['3m', '5m', '1h'])
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    configs = json.loads(os.getenv("COIN_CONFIGS", "{}"))
+    symbols = args.symbols or list(configs.keys())
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - args.days * 24 * 3600 * 1000
+
+    client = GovernedClient(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+    started = time.time()
+    total = 0
+    for symbol in symbols:
+        for interval in args.intervals:
+            total += kline_store.sync(client, symbol, interval, start_ms, end_ms)
+    print(f"✅ {total} candles novos em {time.time() - started:.1f}s ({kline_store.KLINE_STORE_DIR})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import namedtuple
+from utils.util import log
+from utils import clock
+
+# Foto coerente da conta: saldo, margem disponível e todas as posições vindas
+# de uma única chamada a futures_account. Todos os consumidores do ciclo leem a
+# mesma foto enquanto ela tiver menos de ACCOUNT_MAX_AGE segundos. Cada foto
+# nova recebe um número de versão. Eventos do user data stream invalidam a foto
+# e a próxima leitura busca outra.
+
+AccountSnapshot = namedtuple('AccountSnapshot', [
+    'version', 'fetched_at', 'wallet_balance', 'available_balance', 'positions',
+])
+
+ACCOUNT_MAX_AGE = float(os.getenv("ACCOUNT_MAX_AGE", 5))  # segundos até a foto ser considerada velha
+# Idade máxima da última foto usada quando a busca falha; além disso o erro sobe
+# (e ninguém calcula tamanho de posição com saldo velho)
+ACCOUNT_FALLBACK_AGE = float(os.getenv("ACCOUNT_FALLBACK_AGE", ACCOUNT_MAX_AGE * 6))
+
+_snapshot = None
+_version = 0
+_stale = True
+_invalidations = 0
+_lock = threading.Lock()        # troca da foto
+_fetch_lock = threading.Lock()  # só uma busca por vez; as outras threads reaproveitam o resultado
+_fetches = 0
+_errors = 0
+
+
+def parse_account(data, version):
+    wallet = available = 0.0
+    for asset in data.get('assets', []):
+        if asset['asset'] == 'USDT':
+            wallet = float(asset['walletBalance'])
+            available = float(asset['availableBalance'])
+    # símbolo -> (quantidade com sinal, preço de entrada), só posições abertas
+    positions = {}
+    for p in data.get('positions', []):
+        amt = float(p['positionAmt'])
+        if amt != 0.0:
+            positions[p['symbol']] = (amt, float(p.get('entryPrice', 0.0)))
+    return AccountSnapshot(version, clock.now(), wallet, available, positions)
+
+
+def _fresh(max_age):
+    return (
+        _snapshot is not None
+        and not _stale
+        and clock.now() - _snapshot.fetched_at <= max_age
+    )
+
+
+def refresh_account(client):
+    global _snapshot, _version, _stale, _fetches, _errors
+    # Um evento que chegue durante a chamada deixa a foto marcada como velha
+    invalidations = _invalidations
+    try:
+        data = client.futures_account()
+    except Exception:
+        _errors += 1
+        raise
+    with _lock:
+        _version += 1
+        _snapshot = parse_account(data, _version)
+        _stale = _invalidations != invalidations
+        _fetches += 1
+    return _snapshot
+
+
+# Foto com no máximo max_age segundos; se a busca falhar, devolve a última
+# foto conhecida enquanto ela tiver até ACCOUNT_FALLBACK_AGE segundos (senão
+# propaga o erro)
+def get_account(client, max_age=None):
+    max_age = ACCOUNT_MAX_AGE if max_age is None else max_age
+    if _fresh(max_age):
+        return _snapshot
+    with _fetch_lock:
+        # Outra thread pode ter atualizado enquanto esperávamos
+        if _fresh(max_age):
+            return _snapshot
+        try:
+            return refresh_account(client)
+        except Exception as e:
+            if _snapshot is None or account_age() > max(max_age, ACCOUNT_FALLBACK_AGE):
+                raise
+            log(f"Erro ao atualizar conta, usando foto v{_snapshot.version} ({account_age():.0f}s): {e}", level="ERROR")
+            return _snapshot
+
+
+def invalidate_account():
+    global _stale, _invalidations
+    _invalidations += 1
+    _stale = True
+
+
+def account_age():
+    return clock.now() - _snapshot.fetched_at if _snapshot else None
+
+
+def account_stats():
+    return {
+        'version': _snapshot.version if _snapshot else 0,
+        'age': round(account_age(), 3) if _snapshot else None,
+        'stale': _stale,
+        'fetches': _fetches,
+        'errors': _errors,
+    }
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+from utils.klines import INTERVAL_MS, MAX_FETCH, empty_klines
+
+# Candles de intervalos maiores montados a partir dos candles de 1m, do mesmo
+# jeito que a exchange monta: buckets alinhados ao epoch (UTC), abertura do
+# primeiro minuto, máxima e mínima do bucket, fechamento do último minuto e
+# soma dos volumes. Abertura, máxima, mínima e fechamento são copiados dos
+# candles de 1m, então saem idênticos. O volume é somado em float e
+# arredondado para VOLUME_DECIMALS casas, o que desfaz o erro da soma.
+
+AGGREGATE_KLINES = os.getenv("AGGREGATE_KLINES", "true").lower() == "true"
+BASE_INTERVAL = '1m'
+BASE_MS = INTERVAL_MS[BASE_INTERVAL]
+VOLUME_DECIMALS = 8
+
+
+def ratio(interval):
+    return INTERVAL_MS[interval] // BASE_MS
+
+
+# Intervalos montados localmente: cabem (duas vezes) numa única busca de 1m,
+# para que o bucket em formação sempre esteja no buffer de 1m
+def derivable(interval):
+    return interval != BASE_INTERVAL and interval in INTERVAL_MS and ratio(interval) * 2 <= MAX_FETCH
+
+
+def _reduce(rows, step):
+    # Um candle por bucket
+    buckets = rows['open_time'] // step * step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    out = empty_klines(len(starts))
+    out['open_time'] = buckets[starts]
+    out['open'] = rows['open'][starts]
+    out['high'] = np.maximum.reduceat(rows['high'], starts)
+    out['low'] = np.minimum.reduceat(rows['low'], starts)
+    out['close'] = rows['close'][ends - 1]
+    out['volume'] = np.add.reduceat(rows['volume'], starts)
+    out['close_time'] = out['open_time'] + step - 1
+    return out
+
+
+def _merge(a, b):
+    # Junta dois pedaços consecutivos do mesmo bucket (a antes de b)
+    out = a.copy()
+    out['high'] = max(a['high'], b['high'])
+    out['low'] = min(a['low'], b['low'])
+    out['close'] = b['close']
+    out['volume'] = a['volume'] + b['volume']
+    return out
+
+
+def _rounded(rows):
+    rows['volume'] = np.round(rows['volume'], VOLUME_DECIMALS)
+    return rows
+
+
+# Agregação em lote de candles de 1m ordenados (backtest, conferência)
+def aggregate(rows, interval):
+    if len(rows) == 0:
+        return empty_klines()
+    return _rounded(_reduce(rows, INTERVAL_MS[interval]))
+
+
+# Agregação incremental: recebe os candles de 1m fechados conforme chegam e
+# devolve os candles do intervalo que fecharam. O bucket em formação fica em
+# `partial`, então cada minuto é somado uma única vez.
+class Aggregator:
+    def __init__(self, interval, last_base=None):
+        self.interval = interval
+        self.step = INTERVAL_MS[interval]
+        self.partial = None         # soma dos minutos fechados do bucket atual
+        self.last_base = last_base  # open_time do último minuto consumido
+
+    # Próximo minuto que a agregação precisa receber
+    @property
+    def next_base(self):
+        return None if self.last_base is None else self.last_base + BASE_MS
+
+    def add_closed(self, rows):
+        if self.last_base is not None:
+            rows = rows[rows['open_time'] > self.last_base]
+        if len(rows) == 0:
+            return empty_klines()
+        self.last_base = int(rows['open_time'][-1])
+        out = _reduce(rows, self.step)
+        if self.partial is not None:
+            if out['open_time'][0] == self.partial['open_time']:
+                out[0] = _merge(self.partial, out[0])
+            else:
+                out = np.concatenate([self.partial.reshape(1), out]).view(type(out))
+        # O último bucket só fecha com o último minuto; senão continua em formação
+        if self.last_base + BASE_MS < int(out['open_time'][-1]) + self.step:
+            self.partial = out[-1].copy()
+            out = out[:-1]
+        else:
+            self.partial = None
+        return _rounded(out.copy())
+
+    # Candle em formação: minutos fechados do bucket + o minuto em formação
+    def live(self, base_live=None):
+        row = self.partial
+        if base_live is not None:
+            piece = base_live.copy()
+            piece['open_time'] = int(base_live['open_time']) // self.step * self.step
+            piece['close_time'] = piece['open_time'] + self.step - 1
+            if row is not None and row['open_time'] == piece['open_time']:
+                row = _merge(row, piece)
+            else:
+                row = piece
+        if row is None:
+            return None
+        row = row.copy()
+        row['volume'] = round(float(row['volume']), VOLUME_DECIMALS)
+        return row
@@ -1,14 +1,28 @@
+import os
+import logging
 from threading import Thread
-from flask import Flask
+from flask import Flask, Response
+from utils.metrics import health, render
+
+API_PORT = int(os.getenv("API_PORT", 8080))
 
 app = Flask(__name__)
+logging.getLogger('werkzeug').setLevel(logging.ERROR)  # sem uma linha de log por requisição
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    # "ok" só quando nenhuma tarefa está atrasada e os dados estão em dia
+    problems = health()
+    if problems:
+        return "degraded: " + "; ".join(problems), 503
     return "ok", 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
 def start_api():
-    app.run(host="0.0.0.0", port=8080, debug=False, use_reloader=False)
+    app.run(host="0.0.0.0", port=API_PORT, debug=False, use_reloader=False)
 
 def run_api():
     # Inicia a API em segundo plano
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+import ta
+from utils.core import STOP_LOOKBACK, LEVERAGE, RISK_PERCENT, TAKE_PROFIT
+from utils import kline_store
+
+# Backtest vetorizado das estratégias de utils/strategies.py.
+# Indicadores, sinais e stops móveis são calculados de uma vez com NumPy/pandas
+# sobre a grade de candles de 3m; o único laço em Python é por trade (não por
+# candle), porque abrir uma posição depende do estado (flags RSI, posição aberta).
+
+DEFAULT_PARAMS = {
+    'strategy': 'scalper',
+    'direction': 'BOTH',
+    'leverage': LEVERAGE,
+    'risk_percent': RISK_PERCENT,
+    'take_profit_percent': TAKE_PROFIT,
+    'stop_lookback': STOP_LOOKBACK,
+    'breakout_lookback': 20,
+    'ma_fast': 9,
+    'ma_slow': 21,
+    'rsi_window': 14,
+    'rsi_low': 30,
+    'rsi_high': 70,
+    'fee': 0.0004,  # taxa taker por lado
+}
+
+BACKTEST_INTERVALS = ['3m', '5m', '1h']
+WARMUP_MS = 5 * 24 * 3600 * 1000  # histórico extra para aquecer RSI/médias
+
+STOP_BUFFER = 0.001  # place_order/update_stop_loss colocam o stop 0,1% além do extremo
+
+
+# Baixa só o que falta no armazenamento local
+def sync_history(client, symbols, start_ms, end_ms):
+    for symbol in symbols:
+        for interval in BACKTEST_INTERVALS:
+            kline_store.sync(client, symbol, interval, start_ms - WARMUP_MS, end_ms)
+
+
+# Leitura via memmap: os arrays não são copiados
+def load_history(symbol, start_ms, end_ms):
+    return {
+        interval: kline_store.read(symbol, interval, start_ms - WARMUP_MS, end_ms)
+        for interval in BACKTEST_INTERVALS
+    }
+
+
+def rsi(close, window=14):
+    return ta.momentum.RSIIndicator(pd.Series(close), window=window).rsi().to_numpy()
+
+
+def rolling_mean(values, window):
+    return pd.Series(values).rolling(window=window).mean().to_numpy()
+
+
+def rolling_min(values, window):
+    return pd.Series(values).rolling(window=window).min().to_numpy()
+
+
+def rolling_max(values, window):
+    return pd.Series(values).rolling(window=window).max().to_numpy()
+
+
+# Valor do último candle fechado de outro intervalo em cada instante da grade
+def asof(src_close_time, values, grid_time):
+    idx = np.searchsorted(src_close_time, grid_time, side='right') - 1
+    out = np.full(len(grid_time), np.nan)
+    ok = idx >= 0
+    out[ok] = values[idx[ok]]
+    return out
+
+
+def _next_index(sorted_idx, start):
+    k = np.searchsorted(sorted_idx, start)
+    return sorted_idx[k] if k < len(sorted_idx) else None
+
+
+def compute_signals(data, params, cache=None, start_time=None):
+    k3 = data['3m']
+    grid_time = k3['close_time']
+    close = k3['close']
+    cache = cache if cache is not None else {}
+
+    def cached(key, fn):
+        if key not in cache:
+            cache[key] = fn()
+        return cache[key]
+
+    k1h = data['1h']
+    rsi_1h = cached(('rsi', params['rsi_window']), lambda: asof(
+        k1h['close_time'], rsi(k1h['close'], params['rsi_window']), grid_time
+    ))
+    with np.errstate(invalid='ignore'):
+        trig_long = rsi_1h <= params['rsi_low']
+        trig_short = rsi_1h >= params['rsi_high']
+
+    lookback = params['stop_lookback']
+    stop_long = cached(('min3m', lookback), lambda: rolling_min(k3['low'], lookback))
+    stop_short = cached(('max3m', lookback), lambda: rolling_max(k3['high'], lookback))
+
+    if params['strategy'] == 'turtle':
+        n = params['breakout_lookback']
+        high_n = cached(('hh1h', n), lambda: asof(k1h['close_time'], rolling_max(k1h['high'], n), grid_time))
+        low_n = cached(('ll1h', n), lambda: asof(k1h['close_time'], rolling_min(k1h['low'], n), grid_time))
+        with np.errstate(invalid='ignore'):
+            enter_long = close > high_n
+            enter_short = close < low_n
+        trail_long = cached(('trail_min1h', lookback), lambda: asof(
+            k1h['close_time'], rolling_min(k1h['low'], lookback), grid_time
+        ))
+        trail_short = cached(('trail_max1h', lookback), lambda: asof(
+            k1h['close_time'], rolling_max(k1h['high'], lookback), grid_time
+        ))
+    else:
+        fast = cached(('ma', params['ma_fast']), lambda: rolling_mean(close, params['ma_fast']))
+        slow = cached(('ma', params['ma_slow']), lambda: rolling_mean(close, params['ma_slow']))
+        with np.errstate(invalid='ignore'):
+            enter_long = np.zeros(len(close), dtype=bool)
+            enter_short = np.zeros(len(close), dtype=bool)
+            enter_long[1:] = (fast[:-1] < slow[:-1]) & (fast[1:] > slow[1:])
+            enter_short[1:] = (fast[:-1] > slow[:-1]) & (fast[1:] < slow[1:])
+        k5 = data['5m']
+        trail_long = cached(('trail_min5m', lookback), lambda: asof(
+            k5['close_time'], rolling_min(k5['low'], lookback), grid_time
+        ))
+        trail_short = cached(('trail_max5m', lookback), lambda: asof(
+            k5['close_time'], rolling_max(k5['high'], lookback), grid_time
+        ))
+
+    valid = ~np.isnan(rsi_1h) & ~np.isnan(stop_long)
+    if start_time is not None:
+        valid &= grid_time >= start_time
+    if params['direction'] == 'SHORT':
+        enter_long = np.zeros(len(close), dtype=bool)
+    if params['direction'] == 'LONG':
+        enter_short = np.zeros(len(close), dtype=bool)
+
+    return {
+        'trigger': {
+            'LONG': np.flatnonzero(trig_long & valid),
+            'SHORT': np.flatnonzero(trig_short & valid),
+        },
+        'entry': {
+            'LONG': np.flatnonzero(enter_long & valid),
+            'SHORT': np.flatnonzero(enter_short & valid),
+        },
+        'stop': {'LONG': stop_long, 'SHORT': stop_short},
+        'trail': {'LONG': trail_long, 'SHORT': trail_short},
+    }
+
+
+# Procura o primeiro candle após a entrada que aciona o stop (com trailing) ou o
+# take profit. A busca é feita em blocos crescentes para não varrer a série toda.
+def simulate_exit(k3, side, entry_idx, init_stop, tp_price, trail):
+    o, h, l = k3['open'], k3['high'], k3['low']
+    n = len(l)
+    pos = entry_idx + 1
+    best = init_stop
+    chunk = 256
+    while pos < n:
+        end = min(n, pos + chunk)
+        # O stop válido no candle j só conhece o trailing até o candle j-1
+        prev = trail[pos - 1:end - 1]
+        if side == 'LONG':
+            raw = np.maximum.accumulate(np.maximum(np.nan_to_num(prev, nan=-np.inf), best))
+            level = raw * (1 - STOP_BUFFER)
+            hit_stop = l[pos:end] <= level
+            hit_tp = h[pos:end] >= tp_price if tp_price else np.zeros(end - pos, dtype=bool)
+        else:
+            raw = np.minimum.accumulate(np.minimum(np.nan_to_num(prev, nan=np.inf), best))
+            level = raw * (1 + STOP_BUFFER)
+            hit_stop = h[pos:end] >= level
+            hit_tp = l[pos:end] <= tp_price if tp_price else np.zeros(end - pos, dtype=bool)
+        hits = hit_stop | hit_tp
+        if hits.any():
+            k = int(np.argmax(hits))
+            j = pos + k
+            # Stop e TP no mesmo candle: assume o stop (conservador)
+            if hit_stop[k]:
+                price = min(o[j], level[k]) if side == 'LONG' else max(o[j], level[k])
+                return j, price, 'stop'
+            price = max(o[j], tp_price) if side == 'LONG' else min(o[j], tp_price)
+            return j, price, 'take_profit'
+        best = raw[-1]
+        pos = end
+        chunk *= 2
+    return n - 1, k3['close'][-1], 'end'
+
+
+def run_symbol(symbol, data, params=None, capital=1000.0, cache=None, start_time=None):
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    k3 = data['3m']
+    signals = compute_signals(data, params, cache, start_time)
+    close = k3['close']
+    tp_percent = params['take_profit_percent'] if params['strategy'] != 'turtle' else None
+
+    trades = []
+    equity = capital
+    armed = {'LONG': False, 'SHORT': False}
+    i = 0
+    while True:
+        # Próxima entrada de cada lado: primeiro o RSI precisa armar, depois o gatilho
+        candidates = {}
+        for side in ('LONG', 'SHORT'):
+            arm_at = i if armed[side] else _next_index(signals['trigger'][side], i)
+            if arm_at is None:
+                continue
+            entry = _next_index(signals['entry'][side], arm_at)
+            if entry is not None:
+                candidates[side] = entry
+        if not candidates:
+            break
+        side = min(candidates, key=lambda s: (candidates[s], s != 'LONG'))
+        entry_idx = candidates[side]
+
+        # RSI do outro lado que disparou enquanto estava sem posição continua armado
+        other = 'SHORT' if side == 'LONG' else 'LONG'
+        other_arm = _next_index(signals['trigger'][other], i)
+        armed[other] = armed[other] or (other_arm is not None and other_arm <= entry_idx)
+        armed[side] = False
+
+        entry_price = close[entry_idx]
+        init_stop = signals['stop'][side][entry_idx]
+        tp_price = None
+        if tp_percent:
+            tp_price = entry_price * (1 + tp_percent) if side == 'LONG' else entry_price * (1 - tp_percent)
+        exit_idx, exit_price, reason = simulate_exit(
+            k3, side, entry_idx, init_stop, tp_price, signals['trail'][side]
+        )
+
+        notional = equity * params['risk_percent'] * params['leverage']
+        qty = notional / entry_price
+        direction = 1 if side == 'LONG' else -1
+        fees = params['fee'] * qty * (entry_price + exit_price)
+        pnl = direction * (exit_price - entry_price) * qty - fees
+        equity += pnl
+        trades.append({
+            'symbol': symbol,
+            'side': side,
+            'entry_time': int(k3['close_time'][entry_idx]),
+            'exit_time': int(k3['close_time'][exit_idx]),
+            'entry_price': float(entry_price),
+            'exit_price': float(exit_price),
+            'reason': reason,
+            'qty': qty,
+            'pnl': pnl,
+            'return_pct': direction * (exit_price - entry_price) / entry_price * 100,
+            'equity': equity,
+        })
+        if reason == 'end':
+            break
+        i = exit_idx + 1
+
+    return trades
+
+
+def summarize(symbol, trades, capital):
+    if not trades:
+        return {'symbol': symbol, 'trades': 0, 'win_rate': 0.0, 'pnl': 0.0, 'return_pct': 0.0, 'max_drawdown_pct': 0.0}
+    equity = np.array([capital] + [t['equity'] for t in trades])
+    peak = np.maximum.accumulate(equity)
+    drawdown = ((peak - equity) / peak).max() * 100
+    pnl = np.array([t['pnl'] for t in trades])
+    return {
+        'symbol': symbol,
+        'trades': len(trades),
+        'win_rate': float((pnl > 0).mean() * 100),
+        'pnl': float(pnl.sum()),
+        'return_pct': float((equity[-1] / capital - 1) * 100),
+        'max_drawdown_pct': float(drawdown),
+    }
+
+
+# data_by_symbol: {symbol: {'3m': klines, '5m': klines, '1h': klines}}
+def run_backtest(data_by_symbol, configs, capital=1000.0, fee=None, start_time=None):
+    all_trades = []
+    summary = []
+    for symbol, data in data_by_symbol.items():
+        params = dict(configs.get(symbol, {}))
+        if fee is not None:
+            params['fee'] = fee
+        trades = run_symbol(symbol, data, params, capital, start_time=start_time)
+        all_trades.extend(trades)
+        summary.append(summarize(symbol, trades, capital))
+    trades_df = pd.DataFrame(all_trades)
+    if not trades_df.empty:
+        trades_df['entry_time'] = pd.to_datetime(trades_df['entry_time'], unit='ms')
+        trades_df['exit_time'] = pd.to_datetime(trades_df['exit_time'], unit='ms')
+    return pd.DataFrame(summary), trades_df
@@ -0,0 +1,85 @@
+import time
+import threading
+
+# Relógio do bot. Em produção é o relógio do sistema. No replay (paper.py) é
+# um relógio virtual que só anda quando o replay manda, então meses de candles
+# passam em minutos sem mudar o código das tarefas. Só os módulos que decidem
+# com base no horário de mercado (klines, conta, agendador, limite de peso,
+# log) leem daqui; medições de latência continuam no relógio real.
+
+
+class SystemClock:
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, cond, timeout):
+        # cond.wait com o lock de cond já adquirido
+        return cond.wait(timeout)
+
+
+class VirtualClock:
+    virtual = True
+
+    def __init__(self, start):
+        self.now = float(start)
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def set(self, t):
+        # Nunca volta: uma tarefa que "dormiu" já adiantou o relógio
+        with self.lock:
+            self.now = max(self.now, float(t))
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.now += max(0.0, seconds)
+
+    def wait(self, cond, timeout):
+        self.sleep(timeout)
+        return False
+
+
+_clock = SystemClock()
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+    return clock
+
+
+def get_clock():
+    return _clock
+
+
+def now():
+    return _clock.time()
+
+
+def now_ms():
+    return int(_clock.time() * 1000)
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def wait(cond, timeout):
+    return _clock.wait(cond, timeout)
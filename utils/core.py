@@ -1,9 +1,18 @@
 import os
-import math
-import pandas as pd
-from binance.client import Client
+import time
+import threading
 from utils.telegram import send_telegram
 from utils.util import log
+from utils.symbols import load_symbols, get_symbol, start_symbols_refresher
+from utils.klines import get_kline_view, empty_klines
+from utils.stream import start_market_stream, get_last_price
+from utils.user_stream import start_user_stream
+from utils.indicators import live_values, RollingMin, RollingMax
+from utils.rate_limit import GovernedClient, high_priority
+from utils.account import get_account, refresh_account, invalidate_account
+from utils.order_sync import entry_guard, track, replace_stop, resize, cancel_symbol, reconcile, changed_since
+from utils.state_store import open_store, load_state, save_position, save_rsi_flags, POSITION, RSI_FLAGS
+from utils.orders import init_order_client, ensure_leverage, place_entry, place_protection, order_id, record_latency
 
 # Variáveis globais (serão inicializadas por initialize_configs)
 CONFIGS = {}
@@ -19,8 +28,19 @@ RISK_PERCENT = 0.05 # risco padrão 5%
 DECIMALS = 3        # casas decimais para quantidade, ajustar conforme símbolo
 STRATEGY = 'BOTH'
 TAKE_PROFIT = 0.015
+INDICATOR_HISTORY = 100  # candles usados para aquecer os indicadores incrementais
+
+CLOSE_CONFIRM_DELAY = 1.0  # segundos aguardando a execução que zerou a posição
 
 client = None  # será inicializado em initialize_configs
+margin_allocator = None  # orçamento de margem compartilhado entre processos (modo shard)
+
+positions_lock = threading.RLock()
+last_fills = {}  # última execução de saída por símbolo (user data stream)
+close_counts = {}  # fechamentos por símbolo, evita confirmar um fechamento já tratado
+
+def new_position_state():
+    return {'open': False, 'side': None, 'stop_loss': None, 'qty': 0.0, 'entry_price': None}
 
 def initialize_configs(configs):
     global CONFIGS, positions_state, rsi_trigger_flags, client
@@ -28,65 +48,114 @@ def initialize_configs(configs):
     positions_state.clear()
     rsi_trigger_flags.clear()
     for symbol in CONFIGS.keys():
-        positions_state[symbol] = {'open': False, 'side': None, 'stop_loss': None, 'qty': 0.0}
+        positions_state[symbol] = new_position_state()
         rsi_trigger_flags[symbol] = {'LONG': False, 'SHORT': False}
-    client = Client(API_KEY, API_SECRET)
-
-def get_klines(symbol, interval='1h', limit=100):
+    # Conexão única com o estado persistente; restore_state só lê
+    try:
+        open_store()
+    except Exception as e:
+        log(f"Erro ao abrir estado persistente: {e}", level="ERROR")
+    restore_state()
+    client = GovernedClient(API_KEY, API_SECRET)
+    init_order_client(API_KEY, API_SECRET)
+    # Exchange info é carregado uma vez e atualizado em segundo plano
+    load_symbols(client)
+    start_symbols_refresher(client)
+
+def set_margin_allocator(allocator):
+    global margin_allocator
+    margin_allocator = allocator
+
+def add_symbols(configs):
+    # Moedas assumidas em tempo de execução (redistribuídas no modo shard)
+    for symbol, config in configs.items():
+        CONFIGS[symbol] = config
+        positions_state.setdefault(symbol, new_position_state())
+        rsi_trigger_flags.setdefault(symbol, {'LONG': False, 'SHORT': False})
+    restore_state(list(configs))
+    detect_open_positions(list(configs))
+
+def restore_state(symbols=None):
+    # Último estado gravado; detect_open_positions confere com a exchange depois
+    try:
+        stored = load_state(symbols)
+    except Exception as e:
+        log(f"Erro ao ler estado persistente: {e}", level="ERROR")
+        return
+    defaults = new_position_state()
+    for symbol, data in stored[POSITION].items():
+        if symbol in positions_state:
+            positions_state[symbol].update({k: v for k, v in data.items() if k in defaults})
+    for symbol, data in stored[RSI_FLAGS].items():
+        if symbol in rsi_trigger_flags:
+            rsi_trigger_flags[symbol].update(data)
+    opened = sum(1 for state in positions_state.values() if state['open'])
+    if stored[POSITION] or stored[RSI_FLAGS]:
+        log(f"♻️ Estado restaurado: {opened} posições abertas, {len(stored[RSI_FLAGS])} triggers RSI")
+
+def persist_position(symbol):
+    save_position(symbol, dict(positions_state[symbol]))
+
+def set_rsi_trigger(symbol, side, value):
+    # Só grava quando o valor muda
+    flags = rsi_trigger_flags.setdefault(symbol, {'LONG': False, 'SHORT': False})
+    if flags.get(side) != value:
+        flags[side] = value
+        save_rsi_flags(symbol, dict(flags))
+
+def get_kline_array(symbol, interval='1h', limit=100):
     try:
-        klines = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_asset_volume', 'number_of_trades',
-            'taker_buy_base_volume', 'taker_buy_quote_volume', 'ignore'
-        ])
-        df['close'] = pd.to_numeric(df['close'])
-        df['low'] = pd.to_numeric(df['low'])
-        df['high'] = pd.to_numeric(df['high'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        return get_kline_view(client, symbol, interval, limit)
     except Exception as e:
-        log(f"Erro ao obter klines {symbol} {interval}: {e}")
-        return pd.DataFrame()
+        log(f"Erro ao obter klines {symbol} {interval}: {e}", level="ERROR")
+        return None
+
+def get_klines(symbol, interval='1h', limit=100):
+    # DataFrame só para compatibilidade; o caminho ao vivo usa get_kline_array
+    rows = get_kline_array(symbol, interval, limit)
+    if rows is None:
+        rows = empty_klines()
+    return rows.to_frame()
+
+def get_current_price(symbol):
+    # Preço do stream quando disponível; senão consulta o ticker via REST
+    price = get_last_price(symbol)
+    if price is not None:
+        return price
+    return float(client.futures_symbol_ticker(symbol=symbol)['price'])
+
+def start_market_data_stream(on_candle_close=None, symbols=None):
+    start_market_stream(client, symbols or list(CONFIGS.keys()), on_candle_close=on_candle_close)
 
 def get_usdt_balance():
     try:
-        balance = client.futures_account_balance()
-        for asset in balance:
-            if asset['asset'] == 'USDT':
-                return float(asset['balance'])
+        return get_account(client).wallet_balance
     except Exception as e:
-        log(f"Erro ao obter saldo USDT: {e}")
+        log(f"Erro ao obter saldo USDT: {e}", level="ERROR")
     return 0.0
 
 def get_available_margin():
     try:
-        data = client.futures_account()
-        for asset in data['assets']:
-            if asset['asset'] == 'USDT':
-                return float(asset['availableBalance'])
+        return get_account(client).available_balance
     except Exception as e:
-        log(f"Erro ao obter margem disponível: {e}")
+        log(f"Erro ao obter margem disponível: {e}", level="ERROR")
     return 0.0
 
+def get_positions(max_age=None):
+    # símbolo -> (quantidade com sinal, preço de entrada) da foto da conta
+    return get_account(client, max_age).positions
+
 def get_symbol_info(symbol):
-    try:
-        info = client.futures_exchange_info()
-        for s in info['symbols']:
-            if s['symbol'] == symbol:
-                return s
-    except Exception as e:
-        log(f"Erro ao obter info do símbolo {symbol}: {e}")
-    return None
+    info = get_symbol(symbol)
+    if info is None:
+        log(f"Info do símbolo {symbol} não encontrada no cache")
+    return info
 
 def get_min_qty(symbol):
     info = get_symbol_info(symbol)
     if not info:
         return 0.001
-    for filt in info['filters']:
-        if filt['filterType'] == 'LOT_SIZE':
-            return float(filt['minQty'])
-    return 0.001
+    return info.min_qty
 
 def round_qty(qty, symbol):
     min_qty = get_min_qty(symbol)
@@ -103,77 +172,94 @@ def get_price_decimals(symbol):
     info = get_symbol_info(symbol)
     if not info:
         return 2
-    for filt in info['filters']:
-        if filt['filterType'] == 'PRICE_FILTER':
-            tick_size = float(filt['tickSize'])
-            decimals = abs(int(round(math.log10(tick_size))))
-            return decimals
-    return 2
-
-def place_order(symbol, side, risk_usdt):
-    global positions_state
+    return info.price_decimals
+
+def get_stop_lookback(symbol):
+    return CONFIGS.get(symbol, {}).get('stop_lookback', STOP_LOOKBACK)
+
+def stop_lookback_extreme(symbol, interval, rows, side):
+    # Mínimo (LONG) ou máximo (SHORT) dos últimos candles de lookback, incluindo o atual
+    lookback = get_stop_lookback(symbol)
+    if side == 'LONG':
+        return live_values(symbol, interval, rows, f'low{lookback}', lambda: RollingMin(lookback), field='low')[1]
+    return live_values(symbol, interval, rows, f'high{lookback}', lambda: RollingMax(lookback), field='high')[1]
+
+@high_priority
+def place_order(symbol, side, risk_usdt=None, signal_time=None):
+    # O tamanho vem de risk_percent/leverage em CONFIGS; risk_usdt é mantido por compatibilidade.
+    # A reconciliação de ordens ignora o símbolo até a proteção estar registrada.
+    with entry_guard(symbol):
+        return _open_position(symbol, side, signal_time)
+
+def _open_position(symbol, side, signal_time):
+    started = signal_time or time.time()
     try:
         leverage = CONFIGS.get(symbol, {}).get('leverage', LEVERAGE)
-        client.futures_change_leverage(symbol=symbol, leverage=leverage)
+        ensure_leverage(symbol, leverage)
     except Exception as e:
-        log(f"Erro ao alterar alavancagem para {symbol}: {e}")
+        log(f"Erro ao alterar alavancagem para {symbol}: {e}", level="ERROR")
 
     try:
-        entry_price = float(client.futures_symbol_ticker(symbol=symbol)['price'])
+        entry_price = get_current_price(symbol)
     except Exception as e:
-        log(f"Erro ao obter preço atual {symbol}: {e}")
+        log(f"Erro ao obter preço atual {symbol}: {e}", level="ERROR")
         return False
 
-    df = get_klines(symbol, interval='3m', limit=STOP_LOOKBACK)
-    if df.empty or len(df) < STOP_LOOKBACK:
+    rows = get_kline_array(symbol, interval='3m', limit=INDICATOR_HISTORY)
+    if rows is None or len(rows) < get_stop_lookback(symbol):
         log(f"Dados insuficientes para stop loss {symbol}")
         return False
 
-    stop_loss_price = df['low'].min() if side == 'LONG' else df['high'].max()
+    stop_loss_price = float(stop_lookback_extreme(symbol, '3m', rows, side))
 
-    margin_available = get_available_margin()
+    try:
+        # Sem foto recente da conta (ver ACCOUNT_FALLBACK_AGE) não há como dimensionar
+        snapshot = get_account(client)
+    except Exception as e:
+        log(f"⛔ Entrada cancelada para {symbol}: saldo indisponível ({e})", level="ERROR", symbol=symbol)
+        return False
     risk_percent = CONFIGS[symbol]['risk_percent']
     leverage = CONFIGS[symbol]['leverage']
-    position_usdt = margin_available * risk_percent * leverage
+    margin = snapshot.available_balance * risk_percent
+    if margin_allocator is not None:
+        # Outros workers podem estar usando a mesma margem
+        margin = margin_allocator.reserve(symbol, margin, snapshot.available_balance, snapshot.fetched_at)
+        if margin <= 0:
+            log(f"⛔ Sem margem no orçamento global para {symbol}", level="WARNING", symbol=symbol)
+            return False
+    position_usdt = margin * leverage
 
     qty = round_qty(position_usdt / entry_price, symbol)
     if qty <= 0:
         log(f"Quantidade calculada inválida para {symbol}: {qty}")
+        _release_margin(symbol)
         return False
 
     try:
-        order_entry = client.futures_create_order(
-            symbol=symbol,
-            side='BUY' if side == 'LONG' else 'SELL',
-            type='MARKET',
-            quantity=qty
-        )
-        if 'orderId' not in order_entry:
-            log(f"Falha na ordem de entrada {symbol}: {order_entry}")
+        order_entry = place_entry(symbol, side, qty)
+        if order_id(order_entry) is None:
+            log(f"Falha na ordem de entrada {symbol}: {order_entry}", level="ERROR")
+            _release_margin(symbol)
             return False
     except Exception as e:
-        log(f"Erro ao criar ordem de entrada {symbol}: {e}")
+        log(f"Erro ao criar ordem de entrada {symbol}: {e}", level="ERROR")
+        _release_margin(symbol)
         return False
+    entry_done = time.time()
+    if margin_allocator is not None:
+        margin_allocator.commit(symbol)
+    # Margem e posições mudaram: o próximo leitor busca uma foto nova
+    invalidate_account()
 
-    stop_price = round(stop_loss_price * (0.999 if side == 'LONG' else 1.001), 2)
+    # Preço médio real da execução, quando a resposta traz
+    fill_price = float(order_entry.get('avgPrice') or 0)
+    if fill_price > 0:
+        entry_price = fill_price
 
-    try:
-        order_stop = client.futures_create_order(
-            symbol=symbol,
-            side='SELL' if side == 'LONG' else 'BUY',
-            type='STOP_MARKET',
-            stopPrice=str(stop_price),
-            closePosition=True,
-            timeInForce='GTC'
-        )
-        if 'orderId' not in order_stop:
-            log(f"Falha na ordem de stop loss {symbol}: {order_stop}")
-            return False
-    except Exception as e:
-        log(f"Erro ao criar ordem de stop loss {symbol}: {e}")
-        return False
+    stop_price = round(stop_loss_price * (0.999 if side == 'LONG' else 1.001), 2)
 
     strategy = CONFIGS.get(symbol, {}).get('strategy', STRATEGY)
+    take_profit_price = None
     if strategy != 'turtle':
         tp_percent = CONFIGS.get(symbol, {}).get('take_profit_percent', TAKE_PROFIT)
         if side == 'LONG':
@@ -181,64 +267,79 @@ def place_order(symbol, side, risk_usdt):
         else:
             take_profit_price = round(entry_price * (1 - tp_percent), get_price_decimals(symbol))
 
-        try:
-            order_tp = client.futures_create_order(
-                symbol=symbol,
-                side='SELL' if side == 'LONG' else 'BUY',
-                type='TAKE_PROFIT_MARKET',
-                stopPrice=str(take_profit_price),
-                closePosition=True,
-                timeInForce='GTC'
-            )
-            if 'orderId' not in order_tp:
-                log(f"Falha na ordem de take profit {symbol}: {order_tp}")
-                return False
-        except Exception as e:
-            log(f"Erro ao criar ordem de take profit {symbol}: {e}")
+    results = place_protection(symbol, side, stop_price, take_profit_price)
+    protected = time.time()
+    for kind, result in zip(['stop loss', 'take profit'], results):
+        if isinstance(result, Exception):
+            log(f"Erro ao criar ordem de {kind} {symbol}: {result}", level="ERROR")
             return False
-
-    positions_state[symbol] = {
-        'open': True,
-        'side': side,
-        'stop_loss': stop_loss_price,
-        'qty': qty,
-    }
+        if order_id(result) is None:
+            log(f"Falha na ordem de {kind} {symbol}: {result}", level="ERROR")
+            return False
+    for kind, trigger, result in zip(['STOP_MARKET', 'TAKE_PROFIT_MARKET'], [stop_price, take_profit_price], results):
+        track(symbol, kind, trigger, order_id(result))
+    record_latency(symbol, started, entry_done, protected)
+
+    with positions_lock:
+        state = positions_state.setdefault(symbol, new_position_state())
+        # O user data stream pode já ter registrado o preço médio real da entrada
+        if not (state['open'] and state['side'] == side and state['entry_price']):
+            state['entry_price'] = entry_price
+        state.update({
+            'open': True,
+            'side': side,
+            'stop_loss': stop_loss_price,
+            'qty': qty,
+        })
+        persist_position(symbol)
 
     if strategy == 'turtle':
-        log(f"🟢 {symbol} {side} aberto | Entrada: {entry_price} | Qtd: {qty} | SL: {stop_price}")
+        log(f"🟢 {symbol} {side} aberto | Entrada: {entry_price} | Qtd: {qty} | SL: {stop_price}", symbol=symbol, event="open")
         send_telegram(f"🚀 {symbol} {side} aberto em {entry_price}\nSL: {stop_price}")
     else:
-        log(f"🟢 {symbol} {side} aberto | Entrada: {entry_price} | Qtd: {qty} | SL: {stop_price} | TP: {take_profit_price}")
+        log(f"🟢 {symbol} {side} aberto | Entrada: {entry_price} | Qtd: {qty} | SL: {stop_price} | TP: {take_profit_price}", symbol=symbol, event="open")
         send_telegram(f"🚀 {symbol} {side} aberto em {entry_price}\nSL: {stop_price} | TP: {take_profit_price}")
 
 
 
     return True
 
-def cancel_open_stop_orders(symbol):
-    try:
-        open_orders = client.futures_get_open_orders(symbol=symbol)
-        for order in open_orders:
-            if order['type'] == 'STOP_MARKET':
-                client.futures_cancel_order(symbol=symbol, orderId=order['orderId'])
-                log(f"🗑️ Ordem STOP_MARKET cancelada para {symbol}: ID {order['orderId']}")
-    except Exception as e:
-        log(f"Erro ao cancelar ordens stop {symbol}: {e}")
+def _release_margin(symbol):
+    if margin_allocator is not None:
+        margin_allocator.release(symbol)
 
 def cancel_all_open_orders(symbol):
     try:
-        open_orders = client.futures_get_open_orders(symbol=symbol)
-        for order in open_orders:
-            client.futures_cancel_order(symbol=symbol, orderId=order['orderId'])
-            log(f"🗑️ Ordem cancelada para {symbol}: ID {order['orderId']}")
+        cancel_symbol(client, symbol)
+        log(f"🗑️ Ordens canceladas para {symbol}")
     except Exception as e:
-        log(f"Erro ao cancelar ordens para {symbol}: {e}")
+        log(f"Erro ao cancelar ordens para {symbol}: {e}", level="ERROR")
 
-def cancel_orders_if_no_position():
-    for symbol in CONFIGS.keys():
-        if not positions_state.get(symbol, {}).get('open', False):
-            cancel_all_open_orders(symbol)
+def _stop_trigger(symbol, side, stop_loss):
+    if side == 'LONG':
+        return round(stop_loss * 0.999, get_price_decimals(symbol))
+    return round(stop_loss * 1.001, get_price_decimals(symbol))
+
+def _order_positions():
+    with positions_lock:
+        return {
+            symbol: {
+                'open': state['open'],
+                'side': state['side'],
+                'qty': state['qty'],
+                'stop': _stop_trigger(symbol, state['side'], state['stop_loss']) if state['open'] and state['stop_loss'] else None,
+            }
+            for symbol, state in ((s, positions_state.get(s, new_position_state())) for s in CONFIGS)
+        }
+
+def reconcile_orders():
+    # Ordens abertas pela busca de menor peso; só a diferença é corrigida
+    try:
+        reconcile(client, _order_positions)
+    except Exception as e:
+        log(f"Erro ao reconciliar ordens: {e}", level="ERROR")
 
+@high_priority
 def update_stop_loss(symbol):
     if symbol not in positions_state or not positions_state[symbol]['open']:
         return
@@ -252,103 +353,193 @@ def update_stop_loss(symbol):
     # Estratégia Turtle → usa gráfico de 1h e 20 candles
     if strategy == "turtle":
         interval = '1h'
-        lookback = STOP_LOOKBACK
+        lookback = get_stop_lookback(symbol)
     else:
         interval = '5m'
-        lookback = STOP_LOOKBACK  # Ex: 21 ou 30, já definido no topo do arquivo
+        lookback = get_stop_lookback(symbol)  # Ex: 21 ou 30, padrão STOP_LOOKBACK
 
-    df = get_klines(symbol, interval=interval, limit=lookback)
-    if df.empty or len(df) < lookback:
+    rows = get_kline_array(symbol, interval=interval, limit=INDICATOR_HISTORY)
+    if rows is None or len(rows) < lookback:
         return
 
     if side == 'LONG':
-        new_stop = df['low'].min()
+        new_stop = float(stop_lookback_extreme(symbol, interval, rows, side))
         if old_stop is None or new_stop > old_stop:
             try:
-                cancel_open_stop_orders(symbol)
+                # Novo stop criado antes de cancelar o antigo
                 stop_price = round(new_stop * 0.999, decimals)
-                client.futures_create_order(
-                    symbol=symbol,
-                    side='SELL',
-                    type='STOP_MARKET',
-                    stopPrice=str(stop_price),
-                    closePosition=True,
-                    timeInForce='GTC'
-                )
+                replace_stop(client, symbol, 'LONG', stop_price, positions_state[symbol]['qty'])
                 positions_state[symbol]['stop_loss'] = new_stop
+                persist_position(symbol)
                 log(f"🔄 Stop LONG atualizado ({strategy}) para {stop_price} em {symbol}")
             except Exception as e:
-                log(f"Erro ao atualizar stop LONG {symbol}: {e}")
+                log(f"Erro ao atualizar stop LONG {symbol}: {e}", level="ERROR")
     elif side == 'SHORT':
-        new_stop = df['high'].max()
+        new_stop = float(stop_lookback_extreme(symbol, interval, rows, side))
         if old_stop is None or new_stop < old_stop:
             try:
-                cancel_open_stop_orders(symbol)
+                # Novo stop criado antes de cancelar o antigo
                 stop_price = round(new_stop * 1.001, decimals)
-                client.futures_create_order(
-                    symbol=symbol,
-                    side='BUY',
-                    type='STOP_MARKET',
-                    stopPrice=str(stop_price),
-                    closePosition=True,
-                    timeInForce='GTC'
-                )
+                replace_stop(client, symbol, 'SHORT', stop_price, positions_state[symbol]['qty'])
                 positions_state[symbol]['stop_loss'] = new_stop
+                persist_position(symbol)
                 log(f"🔄 Stop SHORT atualizado ({strategy}) para {stop_price} em {symbol}")
             except Exception as e:
-                log(f"Erro ao atualizar stop SHORT {symbol}: {e}")
+                log(f"Erro ao atualizar stop SHORT {symbol}: {e}", level="ERROR")
+
+
+def close_position_state(symbol, exit_price, entry_price=None, since=None):
+    # since: instante (time.monotonic()) da busca que indicou o fechamento; uma
+    # entrada feita depois dela não é fechada
+    with positions_lock:
+        state = positions_state.get(symbol)
+        if state is None or not state['open']:
+            return False
+        if since is not None and changed_since(symbol, since):
+            return False
+        side = state['side']
+        qty = state['qty']
+        entry_price = state.get('entry_price') or entry_price
+        state.update(new_position_state())
+        persist_position(symbol)
+        last_fills.pop(symbol, None)
+        close_counts[symbol] = close_counts.get(symbol, 0) + 1
+    _release_margin(symbol)
+
+    if entry_price:
+        pnl = (exit_price - entry_price) * qty if side == 'LONG' else (entry_price - exit_price) * qty
+        pnl = round(pnl, 2)
+        percent = ((exit_price - entry_price) / entry_price * 100) if side == 'LONG' else ((entry_price - exit_price) / entry_price * 100)
+        percent = round(percent, 2)
+
+        msg = f"✅ Posição encerrada para {symbol}.\n💼 Resultado: {'lucro' if pnl > 0 else 'prejuízo'} de {pnl} USDT ({percent}%)"
+    else:
+        msg = f"✅ Posição encerrada para {symbol}."
+    log(msg, symbol=symbol, event="close")
+    send_telegram(msg)
+
+    cancel_all_open_orders(symbol)
+    return True
 
+def mark_position_open(symbol, amt, entry_price):
+    with positions_lock:
+        side = 'LONG' if amt > 0 else 'SHORT'
+        qty = abs(amt)
+        state = positions_state.setdefault(symbol, new_position_state())
+        # Posição restaurada do estado gravado: mantém o stop já colocado
+        restored = state['open'] and state['side'] == side
+        state.update({
+            'open': True,
+            'side': side,
+            'qty': qty,
+            'stop_loss': state['stop_loss'] if restored else None,
+            'entry_price': entry_price,
+        })
+        persist_position(symbol)
+    if restored:
+        log(f"♻️ Posição restaurada para {symbol} | {side} | Quantidade: {qty} | Stop: {state['stop_loss']}")
+        return
+    log(f"🔄 Posição aberta detectada para {symbol}!")
+    log(f"📌 Tipo: {side} | Quantidade: {qty} | Entrada: {entry_price}")
+
+def _exit_price(symbol):
+    fill = last_fills.get(symbol)
+    if fill is not None:
+        return fill['avg_price']
+    return get_current_price(symbol)
 
 def monitor_position(symbol):
     if symbol not in positions_state:
         return
     try:
-        pos = client.futures_position_information(symbol=symbol)
-        for p in pos:
-            amt = float(p['positionAmt'])
-            if amt == 0.0:
-                if positions_state[symbol]['open']:
-                    side = positions_state[symbol]['side']
-                    qty = positions_state[symbol]['qty']
-                    entry_price = float(p['entryPrice'])
-                    exit_price = float(client.futures_symbol_ticker(symbol=symbol)['price'])
-                    pnl = (exit_price - entry_price) * qty if side == 'LONG' else (entry_price - exit_price) * qty
-                    pnl = round(pnl, 2)
-                    percent = ((exit_price - entry_price) / entry_price * 100) if side == 'LONG' else ((entry_price - exit_price) / entry_price * 100)
-                    percent = round(percent, 2)
-
-                    msg = f"✅ Posição encerrada para {symbol}.\n💼 Resultado: {'lucro' if pnl > 0 else 'prejuízo'} de {pnl} USDT ({percent}%)"
-                    log(msg)
-                    send_telegram(msg)
-
-                positions_state[symbol]['open'] = False
-                positions_state[symbol]['side'] = None
-                positions_state[symbol]['stop_loss'] = None
-                positions_state[symbol]['qty'] = 0.0
-                cancel_all_open_orders(symbol)
+        if symbol not in get_positions() and positions_state[symbol]['open']:
+            close_position_state(symbol, _exit_price(symbol))
     except Exception as e:
-        log(f"Erro ao monitorar posição {symbol}: {e}")
+        log(f"Erro ao monitorar posição {symbol}: {e}", level="ERROR")
 
-def detect_open_positions():
+def _fetch_positions():
+    # Uma única chamada para todos os símbolos; a foto nova serve o resto do ciclo
+    return refresh_account(client).positions
+
+def reconcile_positions():
     try:
+        started = time.monotonic()
+        positions = _fetch_positions()
         for symbol in CONFIGS.keys():
+            if changed_since(symbol, started):
+                # Entrada em andamento ou feita depois da busca; fica para o próximo ciclo
+                continue
+            state = positions_state.setdefault(symbol, new_position_state())
+            if symbol in positions:
+                amt, entry_price = positions[symbol]
+                if not state['open']:
+                    mark_position_open(symbol, amt, entry_price)
+            elif state['open']:
+                close_position_state(symbol, _exit_price(symbol), since=started)
+    except Exception as e:
+        log(f"Erro ao reconciliar posições: {e}", level="ERROR")
+
+def detect_open_positions(symbols=None):
+    try:
+        positions = _fetch_positions()
+        for symbol in symbols or list(CONFIGS.keys()):
             if symbol not in positions_state:
-                positions_state[symbol] = {'open': False, 'side': None, 'stop_loss': None, 'qty': 0.0}
-            positions = client.futures_position_information(symbol=symbol)
-            for p in positions:
-                amt = float(p['positionAmt'])
-                if amt != 0.0:
-                    side = 'LONG' if amt > 0 else 'SHORT'
-                    qty = abs(amt)
-                    entry_price = float(p['entryPrice'])
-                    positions_state[symbol].update({
-                        'open': True,
-                        'side': side,
-                        'qty': qty,
-                        'stop_loss': None
-                    })
-                    log(f"🔄 Posição aberta detectada para {symbol}!")
-                    log(f"📌 Tipo: {side} | Quantidade: {qty} | Entrada: {entry_price}")
-                break
+                positions_state[symbol] = new_position_state()
+            if symbol in positions:
+                amt, entry_price = positions[symbol]
+                mark_position_open(symbol, amt, entry_price)
+            elif positions_state[symbol]['open']:
+                # Fechou enquanto o bot estava parado
+                close_position_state(symbol, _exit_price(symbol))
     except Exception as e:
-        log(f"Erro ao detectar posições abertas: {e}")
+        log(f"Erro ao detectar posições abertas: {e}", level="ERROR")
+
+def on_user_fill(symbol, fill):
+    closes = False
+    with positions_lock:
+        state = positions_state.get(symbol)
+        if state is None or not state['open']:
+            return
+        closing_side = 'SELL' if state['side'] == 'LONG' else 'BUY'
+        if fill['side'] == closing_side:
+            last_fills[symbol] = fill
+            closes = fill['status'] == 'FILLED' and (
+                fill['close_position'] or fill['filled_qty'] >= state['qty']
+            )
+    if closes:
+        close_position_state(symbol, fill['avg_price'])
+
+def _confirm_close(symbol, count):
+    if close_counts.get(symbol, 0) != count:
+        return
+    close_position_state(symbol, _exit_price(symbol))
+
+def on_user_position(symbol, amt, entry_price):
+    if symbol not in CONFIGS:
+        return
+    invalidate_account()
+    resized = None
+    with positions_lock:
+        state = positions_state.setdefault(symbol, new_position_state())
+        if amt == 0.0:
+            if state['open']:
+                # Aguarda o ORDER_TRADE_UPDATE com o preço de saída real
+                count = close_counts.get(symbol, 0)
+                threading.Timer(CLOSE_CONFIRM_DELAY, _confirm_close, args=(symbol, count)).start()
+        elif not state['open']:
+            mark_position_open(symbol, amt, entry_price)
+        else:
+            if state['qty'] != abs(amt):
+                resized = state['side']
+            state['qty'] = abs(amt)
+            state['entry_price'] = entry_price
+            persist_position(symbol)
+    if resized:
+        # Stop/take profit de quantidade fixa acompanham o novo tamanho
+        try:
+            resize(client, symbol, resized, abs(amt))
+        except Exception as e:
+            log(f"Erro ao ajustar proteção de {symbol}: {e}", level="ERROR")
+
+def start_user_data_stream():
+    start_user_stream(client, on_user_fill, on_user_position, on_reconnect=reconcile_positions)
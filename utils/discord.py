@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
-from utils.util import log
-import requests
+from utils.notifier import Notifier
 
 
 load_dotenv()
@@ -11,10 +10,17 @@ DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 
 ENABLE_DISCORD_ALERTS = False    # Ajuste aqui para ativar/desativar Discord
 
+DISCORD_MAX_CHARS = 2000
+
+
+def _post_discord(session, text):
+    return session.post(DISCORD_WEBHOOK_URL, json={"content": text}, timeout=5)
+
+
+discord_notifier = Notifier("discord", _post_discord, DISCORD_MAX_CHARS)
+
 
 def send_discord(msg):
+    # Só enfileira: o envio acontece na thread do notifier
     if ENABLE_DISCORD_ALERTS and DISCORD_WEBHOOK_URL:
-        try:
-            requests.post(DISCORD_WEBHOOK_URL, json={"content": msg}, timeout=5)
-        except Exception as e:
-            log(f"Erro ao enviar Discord: {e}")
\ No newline at end of file
+        discord_notifier.enqueue(msg)
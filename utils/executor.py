@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.util import log
+
+SIGNALS_MAX_WORKERS = int(os.getenv("SIGNALS_MAX_WORKERS", 8))  # símbolos avaliados em paralelo
+SIGNALS_TIMEOUT = float(os.getenv("SIGNALS_TIMEOUT", 30))       # segundos por símbolo
+
+_pools = {}
+_pools_lock = threading.Lock()
+_running = {}  # (tarefa, símbolo) -> future ainda em execução
+
+
+def _get_pool(name, max_workers):
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _pools[name] = pool
+    return pool
+
+
+def _timed(fn, symbol, started):
+    started[symbol] = time.time()
+    return fn(symbol)
+
+
+# Executa fn(symbol) para cada símbolo em paralelo. Cada símbolo roda isolado:
+# um símbolo lento só estoura o próprio timeout e não atrasa os demais. Um
+# símbolo que ainda não terminou o ciclo anterior é pulado.
+def run_per_symbol(name, fn, symbols, max_workers=SIGNALS_MAX_WORKERS, timeout=SIGNALS_TIMEOUT):
+    pool = _get_pool(name, max_workers)
+    start = time.time()
+    started = {}
+    pending = {}
+    skipped = 0
+
+    for symbol in symbols:
+        previous = _running.get((name, symbol))
+        if previous is not None and not previous.done():
+            log(f"⏳ {symbol} ainda em execução ({name}), pulando", level="WARNING", symbol=symbol)
+            skipped += 1
+            continue
+        future = pool.submit(_timed, fn, symbol, started)
+        _running[(name, symbol)] = future
+        pending[future] = symbol
+
+    done_count = 0
+    timed_out = []
+    while pending:
+        done, _ = wait(list(pending), timeout=0.5, return_when=FIRST_COMPLETED)
+        for future in done:
+            symbol = pending.pop(future)
+            done_count += 1
+            error = future.exception()
+            if error is not None:
+                log(f"Erro ao processar {symbol} ({name}): {error}", level="ERROR")
+        now = time.time()
+        for future, symbol in list(pending.items()):
+            if symbol in started and now - started[symbol] > timeout:
+                # A thread continua rodando, mas o ciclo não espera mais por ela
+                log(f"⌛ Timeout de {timeout:.0f}s em {symbol} ({name})", level="WARNING", symbol=symbol)
+                timed_out.append(symbol)
+                del pending[future]
+
+    elapsed = time.time() - start
+    log(
+        f"⏱️ {name}: {done_count}/{len(symbols)} símbolos em {elapsed:.2f}s"
+        f" | timeout: {len(timed_out)} | pulados: {skipped}"
+    )
+    return elapsed
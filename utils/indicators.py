@@ -0,0 +1,239 @@
+import math
+import threading
+from collections import deque
+from utils.klines import INTERVAL_MS
+from utils import clock
+
+# Indicadores incrementais: cada candle fechado custa O(1). `value` considera só
+# candles fechados; `peek(x)` devolve o valor como se x fosse o próximo candle
+# (o candle em formação), sem alterar o estado.
+
+
+class WilderRSI:
+    # Mesmo cálculo de ta.momentum.RSIIndicator: médias exponenciais com
+    # alpha = 1/window (adjust=False) a partir do primeiro candle
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.reset()
+
+    def reset(self):
+        self.prev = None
+        self.avg_up = 0.0
+        self.avg_dn = 0.0
+        self.count = 0
+
+    def _next(self, x):
+        if self.prev is None:
+            return 0.0, 0.0
+        d = x - self.prev
+        up = d if d > 0 else 0.0
+        dn = -d if d < 0 else 0.0
+        return self.avg_up + self.alpha * (up - self.avg_up), self.avg_dn + self.alpha * (dn - self.avg_dn)
+
+    def update(self, x):
+        self.avg_up, self.avg_dn = self._next(x)
+        self.prev = x
+        self.count += 1
+
+    @staticmethod
+    def _rsi(avg_up, avg_dn):
+        if avg_dn == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_up / avg_dn)
+
+    @property
+    def value(self):
+        if self.count < self.window:
+            return math.nan
+        return self._rsi(self.avg_up, self.avg_dn)
+
+    def peek(self, x):
+        if self.count + 1 < self.window:
+            return math.nan
+        return self._rsi(*self._next(x))
+
+
+class SMA:
+    RESUM_EVERY = 10_000  # recalcula a soma de tempos em tempos para não acumular erro
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.values = deque()
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, x):
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        self.updates += 1
+        if self.updates % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.values)
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return math.nan
+        return self.total / self.window
+
+    def peek(self, x):
+        n = len(self.values)
+        if n + 1 < self.window:
+            return math.nan
+        total = self.total + x
+        if n + 1 > self.window:
+            total -= self.values[0]
+        return total / self.window
+
+
+class EMA:
+    # Igual a pandas ewm(span=window, adjust=False, min_periods=window)
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.reset()
+
+    def reset(self):
+        self.avg = None
+        self.count = 0
+
+    def _next(self, x):
+        return x if self.avg is None else self.avg + self.alpha * (x - self.avg)
+
+    def update(self, x):
+        self.avg = self._next(x)
+        self.count += 1
+
+    @property
+    def value(self):
+        return self.avg if self.count >= self.window else math.nan
+
+    def peek(self, x):
+        return self._next(x) if self.count + 1 >= self.window else math.nan
+
+
+class RollingExtreme:
+    # Máximo/mínimo móvel com deque monotônica (O(1) amortizado por candle)
+    def __init__(self, window, kind='max'):
+        self.window = window
+        self.better = (lambda a, b: a >= b) if kind == 'max' else (lambda a, b: a <= b)
+        self.reset()
+
+    def reset(self):
+        self.items = deque()  # (índice, valor), valores monotônicos
+        self.count = 0
+
+    def update(self, x):
+        while self.items and self.better(x, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((self.count, x))
+        self.count += 1
+        while self.items[0][0] <= self.count - 1 - self.window:
+            self.items.popleft()
+
+    @property
+    def value(self):
+        if self.count < self.window:
+            return math.nan
+        return self.items[0][1]
+
+    def peek(self, x):
+        if self.count + 1 < self.window:
+            return math.nan
+        # Ignora o candle que sairia da janela com a entrada de x
+        for idx, v in self.items:
+            if idx > self.count - self.window:
+                return v if self.better(v, x) else x
+        return x
+
+
+class RollingMax(RollingExtreme):
+    def __init__(self, window):
+        super().__init__(window, 'max')
+
+
+class RollingMin(RollingExtreme):
+    def __init__(self, window):
+        super().__init__(window, 'min')
+
+
+# Conjunto de indicadores de um símbolo/intervalo, alimentado pelos candles
+# fechados do cache de klines
+class IndicatorSet:
+    def __init__(self, interval):
+        self.interval = interval
+        self.indicators = {}  # nome -> (indicador, campo do candle)
+        self.previous = {}    # nome -> valor antes do último candle fechado
+        self.last_open = None
+        self.lock = threading.Lock()
+
+    def get(self, name, factory, field='close'):
+        entry = self.indicators.get(name)
+        if entry is None:
+            # Indicador novo: recomeça o conjunto para aquecer todos juntos
+            entry = (factory(), field)
+            self.indicators[name] = entry
+            self.reset()
+        return entry[0]
+
+    def reset(self):
+        self.last_open = None
+        self.previous.clear()
+        for indicator, _ in self.indicators.values():
+            indicator.reset()
+
+    def sync(self, rows, now_ms=None):
+        now_ms = now_ms if now_ms is not None else clock.now() * 1000
+        closed = rows[rows['close_time'] < now_ms]
+        if len(closed) == 0:
+            return
+        if self.last_open is not None:
+            new = closed[closed['open_time'] > self.last_open]
+            step = INTERVAL_MS.get(self.interval)
+            if len(new) and step and new['open_time'][0] != self.last_open + step:
+                # Buraco entre o estado e os candles disponíveis: recomeça
+                self.reset()
+            else:
+                closed = new
+        if len(closed) == 0:
+            return
+        for name, (indicator, field) in self.indicators.items():
+            values = closed[field].tolist()
+            update = indicator.update
+            for x in values[:-1]:
+                update(x)
+            self.previous[name] = indicator.value
+            update(values[-1])
+        self.last_open = int(closed['open_time'][-1])
+
+
+_sets = {}
+_sets_lock = threading.Lock()
+
+
+def get_indicator_set(symbol, interval):
+    key = (symbol, interval)
+    with _sets_lock:
+        indicator_set = _sets.get(key)
+        if indicator_set is None:
+            indicator_set = IndicatorSet(interval)
+            _sets[key] = indicator_set
+    return indicator_set
+
+
+# (anterior, atual) do indicador para a view de klines, tratando o último candle
+# como em formação quando ainda não fechou (igual a df.iloc[-2], df.iloc[-1])
+def live_values(symbol, interval, rows, name, factory, field='close', now_ms=None):
+    now_ms = now_ms if now_ms is not None else clock.now() * 1000
+    indicator_set = get_indicator_set(symbol, interval)
+    with indicator_set.lock:
+        indicator = indicator_set.get(name, factory, field)
+        indicator_set.sync(rows, now_ms)
+        if rows['close_time'][-1] >= now_ms:
+            return indicator.value, indicator.peek(float(rows[field][-1]))
+        return indicator_set.previous.get(name, math.nan), indicator.value
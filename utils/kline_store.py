@@ -0,0 +1,232 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from utils.klines import KLINE_DTYPE, INTERVAL_MS, fetch_history
+from utils.util import log
+
+# Armazenamento local de candles fechados em colunas: por símbolo/intervalo,
+# um arquivo binário por campo de KLINE_DTYPE (open_time.bin, close.bin, ...),
+# todos com as mesmas linhas ordenadas por open_time. As linhas são divididas
+# em partições diárias contíguas (index.json guarda dia -> [linha inicial,
+# linha final]) que valem para todas as colunas; candles novos são anexados ao
+# final e a leitura é um memmap por coluna, então qualquer faixa de tempo sai
+# como slice sem cópia e rows['close'] é um array contíguo.
+
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", "data/klines")
+DAY_MS = 86_400_000
+
+_maps = {}
+_lock = threading.Lock()
+
+
+def _dir(symbol, interval):
+    return os.path.join(KLINE_STORE_DIR, symbol, interval)
+
+
+def _column_path(symbol, interval, field):
+    return os.path.join(_dir(symbol, interval), f"{field}.bin")
+
+
+def _index_path(symbol, interval):
+    return os.path.join(_dir(symbol, interval), "index.json")
+
+
+def _day(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class Columns:
+    # Faixa de candles do armazenamento: uma coluna (memmap) por campo. Campos
+    # saem como ndarray; fatias e máscaras continuam Columns; np.asarray monta
+    # o array estruturado KLINE_DTYPE (com cópia)
+    dtype = KLINE_DTYPE
+
+    def __init__(self, cols):
+        self._cols = cols
+
+    def __len__(self):
+        return len(self._cols['open_time'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._cols[key]
+        return Columns({field: col[key] for field, col in self._cols.items()})
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.empty(len(self), dtype=KLINE_DTYPE)
+        for field, col in self._cols.items():
+            out[field] = col
+        return out if dtype is None else out.astype(dtype)
+
+
+def _empty():
+    return Columns({field: np.zeros(0, dtype=KLINE_DTYPE[field]) for field in KLINE_DTYPE.names})
+
+
+def _build_index(open_times, offset=0, index=None):
+    index = index if index is not None else {}
+    if len(open_times) == 0:
+        return index
+    days = open_times // DAY_MS
+    # Início de cada dia dentro do bloco
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)]
+    for s, e in zip(starts, ends):
+        key = _day(int(open_times[s]))
+        first = index.get(key, [offset + int(s)])[0]
+        index[key] = [first, offset + int(e)]
+    return index
+
+
+def _load_index(symbol, interval):
+    path = _index_path(symbol, interval)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_index(symbol, interval, index):
+    path = _index_path(symbol, interval)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def _migrate(symbol, interval):
+    # Formato antigo (um data.bin de registros inteiros): separa em colunas
+    legacy = os.path.join(_dir(symbol, interval), "data.bin")
+    if os.path.exists(legacy) and not os.path.exists(_column_path(symbol, interval, 'open_time')):
+        _write_columns(symbol, interval, np.fromfile(legacy, dtype=KLINE_DTYPE))
+        os.remove(legacy)
+
+
+def _open_with_index(symbol, interval):
+    _migrate(symbol, interval)
+    path = _column_path(symbol, interval, 'open_time')
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return _empty(), {}
+    size = os.path.getsize(path)
+    key = (symbol, interval)
+    with _lock:
+        cached = _maps.get(key)
+        if cached is not None and cached[0] == size:
+            return cached[1], cached[2]
+        cols = {
+            field: np.memmap(_column_path(symbol, interval, field), dtype=KLINE_DTYPE[field], mode='r')
+            for field in KLINE_DTYPE.names
+        }
+        # Um anexo interrompido pode deixar colunas mais longas; vale o menor tamanho
+        n = min(len(col) for col in cols.values())
+        rows = Columns({field: col[:n] for field, col in cols.items()})
+        index = _load_index(symbol, interval)
+        _maps[key] = (size, rows, index)
+        return rows, index
+
+
+def _open(symbol, interval):
+    return _open_with_index(symbol, interval)[0]
+
+
+def read(symbol, interval, start_ms=None, end_ms=None):
+    rows, index = _open_with_index(symbol, interval)
+    if len(rows) == 0:
+        return rows
+    lo, hi = 0, len(rows)
+    # O índice diário reduz a busca binária a um único dia
+    if start_ms is not None:
+        part = index.get(_day(start_ms))
+        if part:
+            lo = part[0] + int(np.searchsorted(rows['open_time'][part[0]:part[1]], start_ms))
+        else:
+            lo = int(np.searchsorted(rows['open_time'], start_ms))
+    if end_ms is not None:
+        part = index.get(_day(end_ms))
+        if part:
+            hi = part[0] + int(np.searchsorted(rows['open_time'][part[0]:part[1]], end_ms, side='right'))
+        else:
+            hi = int(np.searchsorted(rows['open_time'], end_ms, side='right'))
+    return rows[lo:hi]
+
+
+def last_open_time(symbol, interval):
+    rows = _open(symbol, interval)
+    return int(rows['open_time'][-1]) if len(rows) else None
+
+
+def _write_columns(symbol, interval, rows):
+    # Reescreve todas as colunas (tmp + replace por arquivo)
+    os.makedirs(_dir(symbol, interval), exist_ok=True)
+    for field in KLINE_DTYPE.names:
+        path = _column_path(symbol, interval, field)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(np.ascontiguousarray(rows[field]).tobytes())
+        os.replace(tmp, path)
+
+
+def write(symbol, interval, rows):
+    if len(rows) == 0:
+        return 0
+    rows = np.sort(np.asarray(rows, dtype=KLINE_DTYPE), order='open_time')
+    os.makedirs(_dir(symbol, interval), exist_ok=True)
+    existing = _open(symbol, interval)
+
+    if len(existing) == 0 or rows['open_time'][0] > existing['open_time'][-1]:
+        # Caso comum: só candles novos, anexa ao final de cada coluna; open_time
+        # por último, já que o tamanho dele decide o cache dos memmaps
+        for field in KLINE_DTYPE.names[::-1]:
+            path = _column_path(symbol, interval, field)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                # Descarta a sobra de um anexo interrompido antes de anexar
+                f.truncate(len(existing) * KLINE_DTYPE[field].itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(rows[field]).tobytes())
+        index = _build_index(rows['open_time'], offset=len(existing), index=_load_index(symbol, interval))
+        added = len(rows)
+        with _lock:
+            _maps.pop((symbol, interval), None)
+    else:
+        # Preenchimento de buracos/histórico antigo: mescla e reescreve
+        merged = np.concatenate([np.asarray(existing), rows])
+        _, unique = np.unique(merged['open_time'], return_index=True)
+        merged = merged[unique]
+        added = len(merged) - len(existing)
+        with _lock:
+            _maps.pop((symbol, interval), None)
+        _write_columns(symbol, interval, merged)
+        index = _build_index(merged['open_time'])
+    _save_index(symbol, interval, index)
+    return added
+
+
+def find_gaps(symbol, interval, start_ms, end_ms):
+    step = INTERVAL_MS[interval]
+    start_ms = start_ms // step * step
+    rows = read(symbol, interval, start_ms, end_ms)
+    if len(rows) == 0:
+        return [(start_ms, end_ms)]
+    gaps = []
+    times = rows['open_time']
+    if times[0] > start_ms:
+        gaps.append((start_ms, int(times[0]) - 1))
+    holes = np.flatnonzero(np.diff(times) > step)
+    for h in holes:
+        gaps.append((int(times[h]) + step, int(times[h + 1]) - 1))
+    if times[-1] + step <= end_ms - step:
+        gaps.append((int(times[-1]) + step, end_ms))
+    return gaps
+
+
+# Baixa só o que falta no intervalo e grava no armazenamento local
+def sync(client, symbol, interval, start_ms, end_ms):
+    added = 0
+    for gap_start, gap_end in find_gaps(symbol, interval, start_ms, end_ms):
+        rows = fetch_history(client, symbol, interval, gap_start, gap_end)
+        added += write(symbol, interval, rows)
+    if added:
+        log(f"💾 {symbol} {interval}: {added} candles gravados")
+    return added
@@ -0,0 +1,360 @@
+import os
+import threading
+import numpy as np
+from utils import clock
+
+# Candle compacto: timestamps em ms (int64) e OHLCV em float64
+KLINE_DTYPE = np.dtype([
+    ('open_time', 'i8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+    ('close_time', 'i8'),
+])
+
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 180_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+    '2h': 7_200_000,
+    '4h': 14_400_000,
+    '6h': 21_600_000,
+    '8h': 28_800_000,
+    '12h': 43_200_000,
+    '1d': 86_400_000,
+}
+
+KLINES_CAPACITY = int(os.getenv("KLINES_CAPACITY", 500))   # candles fechados mantidos por símbolo/intervalo
+KLINES_MAX_AGE = float(os.getenv("KLINES_MAX_AGE", 2))     # segundos antes de pedir candles novos
+KLINES_MIN_FETCH = 100                                     # tamanho da carga inicial
+MAX_FETCH = 1500                                           # limite da API por requisição
+KLINES_FROM_STORE = os.getenv("KLINES_FROM_STORE", "false").lower() == "true"  # usa o armazenamento local
+
+
+# Container do caminho ao vivo: array estruturado KLINE_DTYPE (fatias e views
+# continuam Klines, sem cópia). Colunas saem como ndarray simples, e o pandas
+# só é importado se alguém pedir um DataFrame.
+class Klines(np.ndarray):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return np.ndarray.__getitem__(self, key).view(np.ndarray)
+        return np.ndarray.__getitem__(self, key)
+
+    # Formato antigo de get_klines, para código que ainda usa pandas
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(self['open_time'], unit='ms'),
+            'open': self['open'],
+            'high': self['high'],
+            'low': self['low'],
+            'close': self['close'],
+            'volume': self['volume'],
+            'close_time': self['close_time'],
+        })
+
+
+def empty_klines(n=0):
+    return np.zeros(n, dtype=KLINE_DTYPE).view(Klines)
+
+
+def parse_klines(raw):
+    return np.array(
+        [(k[0], float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]), k[6]) for k in raw],
+        dtype=KLINE_DTYPE,
+    ).view(Klines)
+
+
+# Ring buffer de candles fechados + o candle em formação. O buffer tem o dobro
+# da capacidade e só é realocado quando enche, então qualquer janela é contígua
+# e pode ser devolvida como view sem cópia. O candle em formação fica logo após
+# o último fechado.
+class KlineSeries:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = empty_klines(capacity * 2)
+        self.n = 0              # candles fechados no buffer
+        self.start = 0          # primeiro candle válido
+        self.has_live = False
+        self.complete = False   # exchange não tem mais histórico que isso
+        self.fetched_at = 0.0
+        self.stream_ok = False  # stream está alimentando a série sem buracos
+        self.aggregator = None  # intervalos montados a partir de 1m (utils/aggregate.py)
+        self.lock = threading.Lock()
+
+    @property
+    def closed_count(self):
+        return self.n - self.start
+
+    @property
+    def last_open_time(self):
+        if self.closed_count == 0:
+            return None
+        return int(self.buf['open_time'][self.n - 1])
+
+    def reset(self):
+        self.start = 0
+        self.n = 0
+        self.has_live = False
+        self.complete = False
+
+    def _ensure_room(self, extra):
+        if self.n + extra <= len(self.buf):
+            return
+        keep = min(self.closed_count, self.capacity)
+        size = max(self.capacity, keep + extra) * 2
+        # Novo buffer: views já entregues continuam apontando para o antigo
+        new_buf = empty_klines(size)
+        new_buf[:keep] = self.buf[self.n - keep:self.n]
+        self.buf = new_buf
+        self.start = 0
+        self.n = keep
+
+    def append_closed(self, rows):
+        if len(rows) == 0:
+            return
+        last = self.last_open_time
+        if last is not None:
+            rows = rows[rows['open_time'] > last]
+        if len(rows) > self.capacity:
+            rows = rows[-self.capacity:]
+        self._ensure_room(len(rows) + 1)
+        self.buf[self.n:self.n + len(rows)] = rows
+        self.n += len(rows)
+        if self.closed_count > self.capacity:
+            self.start = self.n - self.capacity
+        self.has_live = False
+
+    def set_live(self, row):
+        self._ensure_room(1)
+        self.buf[self.n] = row
+        self.has_live = True
+
+    def view(self, limit):
+        end = self.n + (1 if self.has_live else 0)
+        begin = max(self.start, end - limit)
+        v = self.buf[begin:end]
+        v.flags.writeable = False
+        return v
+
+
+_series = {}
+_series_lock = threading.Lock()
+_derived = {}  # símbolo -> intervalos montados a partir de 1m
+
+
+def _get_series(symbol, interval, limit):
+    key = (symbol, interval)
+    with _series_lock:
+        series = _series.get(key)
+        if series is None:
+            series = KlineSeries(max(KLINES_CAPACITY, limit))
+            _series[key] = series
+        elif series.capacity < limit:
+            series.capacity = limit
+    return series
+
+
+def _store(series, rows, now_ms):
+    if len(rows) == 0:
+        return
+    # Todos menos o último estão fechados; o último só se já passou do close_time
+    if rows['close_time'][-1] < now_ms:
+        series.append_closed(rows)
+    else:
+        series.append_closed(rows[:-1])
+        series.set_live(rows[-1])
+
+
+# Semeia a série com o armazenamento local quando ele está recente o bastante
+# para que só falte um delta pequeno
+def _seed_from_store(client, symbol, interval, series, limit):
+    if not KLINES_FROM_STORE or interval not in INTERVAL_MS:
+        return False
+    from utils import kline_store  # import tardio: kline_store depende deste módulo
+    step = INTERVAL_MS[interval]
+    last = kline_store.last_open_time(symbol, interval)
+    if last is None or (clock.now() * 1000 - last) / step > series.capacity:
+        return False
+    rows = kline_store.read(symbol, interval, start_ms=last - (series.capacity - 1) * step)
+    if len(rows) < limit - 1:
+        return False
+    series.reset()
+    series.append_closed(rows)
+    _delta_fetch(client, symbol, interval, series)
+    return True
+
+
+def _full_fetch(client, symbol, interval, series, limit):
+    if series.closed_count == 0 and _seed_from_store(client, symbol, interval, series, limit):
+        return
+    fetch = min(max(limit, KLINES_MIN_FETCH), MAX_FETCH)
+    rows = parse_klines(client.futures_klines(symbol=symbol, interval=interval, limit=fetch))
+    series.reset()
+    series.complete = len(rows) < fetch
+    _store(series, rows, clock.now() * 1000)
+
+
+def _delta_fetch(client, symbol, interval, series):
+    step = INTERVAL_MS[interval]
+    next_open = series.last_open_time + step
+    now_ms = clock.now() * 1000
+    missing = int((now_ms - next_open) // step) + 1
+    rows = parse_klines(client.futures_klines(
+        symbol=symbol, interval=interval, startTime=next_open, limit=min(max(missing, 1), MAX_FETCH)
+    ))
+    _store(series, rows, now_ms)
+
+
+# Últimos `limit` candles (incluindo o em formação) como view somente leitura
+def get_kline_view(client, symbol, interval='1h', limit=100):
+    from utils import aggregate  # import tardio: aggregate depende deste módulo
+    if aggregate.AGGREGATE_KLINES and aggregate.derivable(interval):
+        return _derived_view(client, symbol, interval, limit)
+    series = _get_series(symbol, interval, limit)
+    with series.lock:
+        now = clock.now()
+        need_history = series.closed_count < limit - 1 and not series.complete
+        gap_too_big = (
+            series.last_open_time is not None
+            and interval in INTERVAL_MS
+            and (now * 1000 - series.last_open_time) / INTERVAL_MS[interval] > series.capacity
+        )
+        if series.stream_ok and not need_history:
+            return series.view(limit)
+        if series.closed_count == 0 or need_history or gap_too_big or interval not in INTERVAL_MS:
+            _full_fetch(client, symbol, interval, series, limit)
+            series.fetched_at = now
+        elif now - series.fetched_at > KLINES_MAX_AGE:
+            _delta_fetch(client, symbol, interval, series)
+            series.fetched_at = now
+        return series.view(limit)
+
+
+# Candles de 1m fechados e o minuto em formação (ou None), já atualizados
+def _base_rows(client, symbol, limit):
+    from utils.aggregate import BASE_INTERVAL
+    get_kline_view(client, symbol, BASE_INTERVAL, limit)
+    base = _get_series(symbol, BASE_INTERVAL, limit)
+    with base.lock:
+        rows = base.view(limit + 1).copy()
+        if base.has_live:
+            return rows[:-1], rows[-1]
+        return rows, None
+
+
+# Intervalo montado a partir da série de 1m: o histórico vem da exchange uma
+# vez, e os candles novos saem da agregação dos minutos. Assim cada símbolo
+# tem uma única série atualizada via REST ou stream, em vez de uma por intervalo.
+def _derived_view(client, symbol, interval, limit):
+    from utils.aggregate import Aggregator, BASE_MS, ratio
+    series = _get_series(symbol, interval, limit)
+    step = INTERVAL_MS[interval]
+    with series.lock:
+        now = clock.now()
+        need_history = series.closed_count < limit - 1 and not series.complete
+        gap_too_big = (
+            series.last_open_time is not None
+            and (now * 1000 - series.last_open_time) / step > series.capacity
+        )
+        if series.closed_count == 0 or need_history or gap_too_big:
+            _full_fetch(client, symbol, interval, series, limit)
+            series.fetched_at = now
+            series.aggregator = None
+            _derived.setdefault(symbol, set()).add(interval)
+        if series.last_open_time is None:
+            return series.view(limit)
+        if series.aggregator is None:
+            series.aggregator = Aggregator(interval, series.last_open_time + step - BASE_MS)
+
+        closed, live = _base_rows(client, symbol, 2 * ratio(interval))
+        if len(closed) and closed['open_time'][0] > series.aggregator.next_base:
+            # Os minutos que faltam já saíram do buffer de 1m
+            _delta_fetch(client, symbol, interval, series)
+            series.fetched_at = now
+            series.aggregator = Aggregator(interval, series.last_open_time + step - BASE_MS)
+        series.append_closed(series.aggregator.add_closed(closed))
+        row = series.aggregator.live(live)
+        if row is not None:
+            series.set_live(row)
+        return series.view(limit)
+
+
+# Intervalos montados localmente que fecharam junto com o minuto que termina
+# em close_ms (stream de 1m)
+def close_derived(client, symbol, close_ms):
+    closed = []
+    for interval in sorted(_derived.get(symbol, ()), key=INTERVAL_MS.get):
+        if close_ms % INTERVAL_MS[interval] == 0:
+            get_kline_view(client, symbol, interval, 1)
+            closed.append(interval)
+    return closed
+
+
+# Aplica um evento de kline do WebSocket. Retorna True quando o candle fechou.
+def apply_stream_kline(symbol, interval, k):
+    series = _get_series(symbol, interval, 0)
+    row = np.array(
+        [(k['t'], float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v']), k['T'])],
+        dtype=KLINE_DTYPE,
+    )
+    with series.lock:
+        last = series.last_open_time
+        step = INTERVAL_MS.get(interval)
+        if last is None or step is None:
+            return False
+        if k['t'] <= last:
+            return False
+        if k['t'] != last + step:
+            # Buraco na série: a próxima leitura completa via REST
+            series.stream_ok = False
+            return False
+        if k['x']:
+            series.append_closed(row)
+        else:
+            series.set_live(row[0])
+        series.stream_ok = True
+        series.fetched_at = clock.now()
+        return bool(k['x'])
+
+
+def set_stream_state(keys, ok):
+    with _series_lock:
+        for key in keys:
+            series = _series.get(key)
+            if series is not None:
+                series.stream_ok = ok
+
+
+def clear_klines_cache():
+    with _series_lock:
+        _series.clear()
+        _derived.clear()
+
+
+# Histórico completo entre start_ms e end_ms, paginado em blocos de MAX_FETCH
+def fetch_history(client, symbol, interval, start_ms, end_ms=None):
+    chunks = []
+    cursor = int(start_ms)
+    end_ms = int(end_ms if end_ms is not None else clock.now() * 1000)
+    while cursor < end_ms:
+        raw = client.futures_klines(
+            symbol=symbol, interval=interval, startTime=cursor, endTime=end_ms, limit=MAX_FETCH
+        )
+        if not raw:
+            break
+        rows = parse_klines(raw)
+        chunks.append(rows)
+        cursor = int(rows['open_time'][-1]) + INTERVAL_MS[interval]
+        if len(raw) < MAX_FETCH:
+            break
+    if not chunks:
+        return np.zeros(0, dtype=KLINE_DTYPE)
+    rows = np.concatenate(chunks)
+    # Só candles fechados
+    return rows[rows['close_time'] < clock.now() * 1000]
@@ -0,0 +1,125 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Instrumentação leve para o endpoint /metrics (formato texto do Prometheus).
+# Contadores e histogramas são atualizados no caminho quente com um lock e
+# algumas somas. Os valores que já existem em outros módulos (peso da API,
+# filas, posições, tarefas do agendador) são lidos só na hora da coleta, por
+# funções registradas com register_collector. As verificações de saúde
+# registradas com register_health_check alimentam o /health.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}    # (nome, labels) -> valor
+_histograms = {}  # (nome, labels) -> [contagem por bucket, soma, total]
+_collectors = []  # funções que devolvem [(nome, labels, valor)] de gauges
+_health_checks = {}  # nome -> função que devolve uma lista de problemas
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    i = bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        hist[0][i] += 1
+        hist[1] += seconds
+        hist[2] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def register_collector(fn):
+    _collectors.append(fn)
+    return fn
+
+
+def register_health_check(name, fn):
+    _health_checks[name] = fn
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    items = labels.items() if isinstance(labels, dict) else labels
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render():
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in _histograms.items())
+
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    for (name, labels), (buckets, total, count) in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for le, n in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    for collect in _collectors:
+        try:
+            samples = collect()
+        except Exception as e:
+            lines.append(f"# erro na coleta {getattr(collect, '__name__', collect)}: {e}")
+            continue
+        for name, labels, value in samples:
+            if value is None:
+                continue
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Lista de problemas de todas as verificações; vazia quando tudo está ok
+def health():
+    problems = []
+    for name, check in _health_checks.items():
+        try:
+            problems.extend(check() or [])
+        except Exception as e:
+            problems.append(f"{name}: {e}")
+    return problems
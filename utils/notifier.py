@@ -0,0 +1,164 @@
+import os
+import atexit
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils.util import log
+
+# Fila de notificações em segundo plano: o código de trading só enfileira e
+# segue. Um worker por canal junta as mensagens de uma rajada numa só,
+# respeita o rate limit (429 + retry_after) e descarta as mais antigas se a
+# fila encher. Outros 4xx (token ou chat id errado) não são repetidos e contam
+# como falha.
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", 500))
+NOTIFY_BATCH_WINDOW = float(os.getenv("NOTIFY_BATCH_WINDOW", 1.0))  # segundos agrupando mensagens
+NOTIFY_MAX_RETRIES = 5
+FLUSH_TIMEOUT = 5
+
+_notifiers = []
+
+
+def _session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _retry_after(response):
+    try:
+        body = response.json()
+        value = body.get('parameters', {}).get('retry_after', body.get('retry_after'))
+        if value is not None:
+            return float(value)
+    except ValueError:
+        pass
+    header = response.headers.get('Retry-After')
+    return float(header) if header else 1.0
+
+
+class Notifier:
+    def __init__(self, name, post, max_chars):
+        self.name = name
+        self.post = post            # post(session, texto) -> requests.Response
+        self.max_chars = max_chars
+        self.queue = queue.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        self.session = _session()
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.thread = None
+        self.lock = threading.Lock()
+        _notifiers.append(self)
+
+    def enqueue(self, msg):
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(msg)
+        except queue.Full:
+            # Política de descarte: perde a mensagem mais antiga
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                log(f"⚠️ Fila de notificações {self.name} cheia, {self.dropped} descartadas")
+            try:
+                self.queue.put_nowait(msg)
+            except queue.Full:
+                pass
+
+    def _ensure_worker(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"notify-{self.name}", daemon=True)
+                self.thread.start()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        size = len(batch[0])
+        deadline = time.time() + NOTIFY_BATCH_WINDOW
+        while size < self.max_chars:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                msg = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(msg)
+            size += len(msg) + 2
+        return batch
+
+    def _chunks(self, batch):
+        chunk = ""
+        for msg in batch:
+            msg = msg[:self.max_chars]
+            if chunk and len(chunk) + 2 + len(msg) > self.max_chars:
+                yield chunk
+                chunk = msg
+            else:
+                chunk = f"{chunk}\n\n{msg}" if chunk else msg
+        if chunk:
+            yield chunk
+
+    def _send(self, text):
+        delay = 1.0
+        for _ in range(NOTIFY_MAX_RETRIES):
+            try:
+                response = self.post(self.session, text)
+                if response.status_code == 429:
+                    time.sleep(_retry_after(response))
+                    continue
+                if response.status_code < 400:
+                    self.sent += 1
+                    return True
+                if response.status_code < 500:
+                    # Erro de configuração: repetir não resolve
+                    self.failed += 1
+                    log(f"Erro ao enviar {self.name}: HTTP {response.status_code} {response.text[:200]}", level="ERROR")
+                    return False
+            except Exception as e:
+                log(f"Erro ao enviar {self.name}: {e}", level="ERROR")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+        self.failed += 1
+        log(f"Falha ao enviar {self.name} após {NOTIFY_MAX_RETRIES} tentativas", level="ERROR")
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            for chunk in self._chunks(batch):
+                self._send(chunk)
+            for _ in batch:
+                self.queue.task_done()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
+
+def notifier_stats():
+    return {n.name: {'pending': n.pending(), 'sent': n.sent, 'failed': n.failed, 'dropped': n.dropped} for n in _notifiers}
+
+
+def flush_all():
+    for notifier in _notifiers:
+        if notifier.thread is not None:
+            notifier.flush()
+
+
+atexit.register(flush_all)
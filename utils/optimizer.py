@@ -0,0 +1,124 @@
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import kline_store
+from utils.backtest import load_history, run_symbol, summarize
+from utils.core import LEVERAGE, RISK_PERCENT, TAKE_PROFIT
+
+# Busca de parâmetros (grid ou aleatória) distribuída em processos. Os workers
+# abrem os klines pelo memmap do armazenamento local (o SO compartilha as
+# páginas entre processos, nada é serializado) e reaproveitam os indicadores
+# entre combinações do mesmo símbolo.
+
+DEFAULT_SPACE = {
+    'strategy': ['scalper', 'turtle'],
+    'direction': ['LONG', 'SHORT', 'BOTH'],
+    'leverage': [5, 10],
+    'risk_percent': [0.05, 0.1],
+    'take_profit_percent': [0.01, 0.015, 0.02, 0.03],
+    'stop_lookback': [10, 20, 30],
+    'ma_fast': [5, 9, 12],
+    'ma_slow': [21, 30, 50],
+    'rsi_low': [25, 30, 35],
+    'rsi_high': [65, 70, 75],
+    'breakout_lookback': [10, 20, 40],
+}
+
+# Parâmetros que não afetam cada estratégia (evita combinações repetidas)
+IGNORED = {
+    'scalper': {'breakout_lookback'},
+    'turtle': {'ma_fast', 'ma_slow', 'take_profit_percent'},
+}
+
+METRICS = {
+    'return': lambda r: r['return_pct'],
+    'return_dd': lambda r: r['return_pct'] / max(r['max_drawdown_pct'], 1.0),
+}
+
+
+def _normalize(params):
+    ignored = IGNORED.get(params.get('strategy', 'scalper'), set())
+    return {k: v for k, v in params.items() if k not in ignored}
+
+
+def _valid(params):
+    return params.get('ma_fast', 0) < params.get('ma_slow', 1)
+
+
+def grid(space):
+    keys = list(space)
+    seen = set()
+    out = []
+    for values in itertools.product(*(space[k] for k in keys)):
+        params = _normalize(dict(zip(keys, values)))
+        key = tuple(sorted(params.items()))
+        if _valid(params) and key not in seen:
+            seen.add(key)
+            out.append(params)
+    return out
+
+
+def random_search(space, samples, seed=0):
+    combos = grid(space)
+    rng = random.Random(seed)
+    return rng.sample(combos, min(samples, len(combos)))
+
+
+# Estado de cada processo worker
+_data = {}
+_indicator_cache = {}
+
+
+def _init_worker(store_dir):
+    kline_store.KLINE_STORE_DIR = store_dir
+
+
+def _run_batch(symbol, start_ms, end_ms, capital, batch):
+    key = (symbol, start_ms, end_ms)
+    if key not in _data:
+        _data[key] = load_history(symbol, start_ms, end_ms)
+    cache = _indicator_cache.setdefault(key, {})
+    results = []
+    for params in batch:
+        trades = run_symbol(symbol, _data[key], params, capital, cache=cache, start_time=start_ms)
+        results.append({**summarize(symbol, trades, capital), 'params': params})
+    return results
+
+
+def optimize(symbols, combos, start_ms, end_ms, capital=1000.0, workers=None, batch_size=64, progress=None):
+    workers = workers or os.cpu_count()
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(kline_store.KLINE_STORE_DIR,)
+    ) as pool:
+        # Lotes por símbolo: o mesmo worker reaproveita dados e indicadores
+        futures = [
+            pool.submit(_run_batch, symbol, start_ms, end_ms, capital, combos[i:i + batch_size])
+            for symbol in symbols
+            for i in range(0, len(combos), batch_size)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.extend(future.result())
+            if progress:
+                progress(done, len(futures))
+    return results
+
+
+def rank(results, metric='return_dd', min_trades=5):
+    score = METRICS[metric]
+    ranked = {}
+    for r in results:
+        if r['trades'] < min_trades:
+            continue
+        ranked.setdefault(r['symbol'], []).append({**r, 'score': score(r)})
+    for symbol in ranked:
+        ranked[symbol].sort(key=lambda r: r['score'], reverse=True)
+    return ranked
+
+
+# Melhor configuração por símbolo, no formato de COIN_CONFIGS. Parâmetros fora
+# do espaço de busca ficam com os padrões do bot (place_order lê risk_percent)
+def best_configs(ranked):
+    defaults = {'leverage': LEVERAGE, 'risk_percent': RISK_PERCENT, 'take_profit_percent': TAKE_PROFIT}
+    return {symbol: {**defaults, **rows[0]['params']} for symbol, rows in ranked.items() if rows}
@@ -0,0 +1,295 @@
+import threading
+import time
+from contextlib import contextmanager
+from utils.util import log
+from utils.symbols import get_symbol
+from utils.orders import order_id
+from utils.rate_limit import ENDPOINT_WEIGHTS, ALL_SYMBOLS_WEIGHTS
+
+# Reconciliação das ordens de proteção. Para cada símbolo o bot guarda em
+# memória o stop e o take profit que deveriam existir. A cada ciclo,
+# reconcile_orders busca as ordens abertas (normais e condicionais) e só
+# corrige a diferença:
+# - símbolos sem posição têm as ordens canceladas em lote;
+# - ordens que faltam são criadas antes de cancelar as que sobram.
+# Trocar o stop segue a mesma ordem: o novo é criado antes de cancelar o
+# antigo, então a posição nunca fica sem stop.
+#
+# Ordens condicionais não entram no batchOrders, e a Binance recusa um segundo
+# stop com closePosition no mesmo sentido (-4130). Por isso os stops criados
+# aqui são reduceOnly com a quantidade da posição. Quando a posição muda de
+# tamanho, essas ordens são trocadas por outras com a quantidade nova (a nova
+# antes de cancelar a antiga), pelo resize ou pela reconciliação.
+#
+# Peso da busca: sem símbolo, openOrders e openAlgoOrders custam 40 cada (80
+# por ciclo, com qualquer número de moedas); com símbolo custam 1. Com poucas
+# moedas operadas (menos de 40) a busca é por símbolo, acima disso em duas
+# chamadas para todas.
+
+STOP = 'STOP_MARKET'
+TAKE_PROFIT = 'TAKE_PROFIT_MARKET'
+KINDS = (STOP, TAKE_PROFIT)
+
+_desired = {}  # símbolo -> {tipo: preço de gatilho}
+_live = {}     # símbolo -> {tipo: [algoId, ...]} ordens condicionais conhecidas
+_sizes = {}    # símbolo -> {tipo: quantidade da ordem viva; None = closePosition}
+_touched = {}  # símbolo -> instante da última alteração feita fora da reconciliação
+_busy = set()  # símbolos com entrada em andamento
+_locks = {}
+_locks_lock = threading.Lock()
+
+stats = {'reconciles': 0, 'rest_calls': 0, 'created': 0, 'cancelled': 0, 'skipped': 0}
+
+
+def _lock(symbol):
+    with _locks_lock:
+        lock = _locks.get(symbol)
+        if lock is None:
+            lock = _locks[symbol] = threading.RLock()
+        return lock
+
+
+def _touch(symbol):
+    _touched[symbol] = time.monotonic()
+
+
+# Entrada em andamento ou alteração depois de `started` (time.monotonic()):
+# uma foto buscada antes disso não vale para o símbolo
+def changed_since(symbol, started):
+    return symbol in _busy or _touched.get(symbol, 0) >= started
+
+
+def _exit_side(side):
+    return 'SELL' if side == 'LONG' else 'BUY'
+
+
+def _same_price(symbol, a, b):
+    info = get_symbol(symbol)
+    tick = info.tick_size if info else 1e-8
+    return abs(float(a) - float(b)) < tick / 2
+
+
+def _same_qty(symbol, a, b):
+    info = get_symbol(symbol)
+    step = info.step_size if info else 1e-8
+    return abs(float(a) - float(b)) < step / 2
+
+
+def _order_size(order):
+    # Quantidade fixa da ordem condicional; None quando fecha a posição inteira
+    return None if order.get('closePosition') in (True, 'true') else float(order['quantity'])
+
+
+@contextmanager
+def entry_guard(symbol):
+    # A reconciliação ignora o símbolo enquanto a entrada e a proteção saem
+    _busy.add(symbol)
+    try:
+        yield
+    finally:
+        _touch(symbol)
+        _busy.discard(symbol)
+
+
+def track(symbol, kind, trigger, algo_id):
+    # Registra uma ordem de proteção criada fora daqui (place_protection)
+    with _lock(symbol):
+        _desired.setdefault(symbol, {})[kind] = float(trigger)
+        _live.setdefault(symbol, {})[kind] = [algo_id]
+        _sizes.setdefault(symbol, {})[kind] = None  # place_protection usa closePosition
+        _touch(symbol)
+
+
+def forget(symbol):
+    with _lock(symbol):
+        _desired.pop(symbol, None)
+        _live.pop(symbol, None)
+        _sizes.pop(symbol, None)
+
+
+def _create(client, symbol, kind, side, trigger, qty):
+    stats['rest_calls'] += 1
+    response = client.futures_create_order(
+        symbol=symbol,
+        side=_exit_side(side),
+        type=kind,
+        stopPrice=str(trigger),
+        quantity=qty,
+        reduceOnly='true',
+        timeInForce='GTC',
+    )
+    stats['created'] += 1
+    return order_id(response)
+
+
+def _cancel(client, symbol, algo_ids):
+    # Não existe cancelamento em lote de algo orders por id
+    for algo_id in algo_ids:
+        stats['rest_calls'] += 1
+        try:
+            client.futures_cancel_order(symbol=symbol, algoId=algo_id)
+            stats['cancelled'] += 1
+        except Exception as e:
+            # -2011: já executada ou cancelada
+            if getattr(e, 'code', None) != -2011:
+                log(f"Erro ao cancelar ordem {algo_id} de {symbol}: {e}", level="ERROR")
+
+
+def _open_protection(client, symbol, kind, side):
+    stats['rest_calls'] += 1
+    orders = client.futures_get_open_orders(symbol=symbol, conditional=True)
+    return [o['algoId'] for o in orders if o['orderType'] == kind and o['side'] == _exit_side(side)]
+
+
+def _replace(client, symbol, kind, side, trigger, qty):
+    # Nova ordem primeiro; a antiga só é cancelada depois que a nova existe
+    with _lock(symbol):
+        live = _live.get(symbol, {})
+        old = list(live[kind]) if kind in live else _open_protection(client, symbol, kind, side)
+        new_id = _create(client, symbol, kind, side, trigger, qty)
+        _cancel(client, symbol, [i for i in old if i != new_id])
+        _desired.setdefault(symbol, {})[kind] = float(trigger)
+        _live.setdefault(symbol, {})[kind] = [new_id]
+        _sizes.setdefault(symbol, {})[kind] = float(qty)
+        _touch(symbol)
+        return new_id
+
+
+def replace_stop(client, symbol, side, trigger, qty):
+    return _replace(client, symbol, STOP, side, trigger, qty)
+
+
+def resize(client, symbol, side, qty):
+    # Posição mudou de tamanho: troca as ordens de quantidade fixa que ficaram
+    # com outra quantidade (closePosition acompanha a posição sozinho)
+    with _lock(symbol):
+        if symbol in _busy:
+            return []
+        desired = _desired.get(symbol, {})
+        sizes = _sizes.get(symbol, {})
+        stale = [
+            kind for kind in KINDS
+            if kind in desired and sizes.get(kind) is not None and not _same_qty(symbol, sizes[kind], qty)
+        ]
+        for kind in stale:
+            _replace(client, symbol, kind, side, desired[kind], qty)
+            log(f"📏 {kind} de {symbol} ajustado para {qty}", symbol=symbol, event="order_sync")
+        return stale
+
+
+def cancel_symbol(client, symbol, regular=True, conditional=True):
+    # Até duas chamadas, sem consultar as ordens antes
+    with _lock(symbol):
+        if regular:
+            stats['rest_calls'] += 1
+            client.futures_cancel_all_open_orders(symbol=symbol)
+        if conditional:
+            stats['rest_calls'] += 1
+            client.futures_cancel_all_open_orders(symbol=symbol, conditional=True)
+        _desired.pop(symbol, None)
+        _live.pop(symbol, None)
+        _sizes.pop(symbol, None)
+        _touch(symbol)
+
+
+def _group(orders):
+    grouped = {}
+    for order in orders:
+        grouped.setdefault(order['symbol'], []).append(order)
+    return grouped
+
+
+def _reconcile_open(client, symbol, pos, orders):
+    exit_side = _exit_side(pos['side'])
+    existing = {kind: [] for kind in KINDS}
+    stray = []
+    for order in orders:
+        if order['side'] == exit_side and order['orderType'] in existing:
+            existing[order['orderType']].append(order)
+        else:
+            # Sobra de uma posição anterior no sentido oposto
+            stray.append(order['algoId'])
+
+    desired = _desired.get(symbol)
+    if desired is None:
+        # Sem estado em memória (reinício): adota as ordens que já estão na exchange
+        desired = {kind: float(found[-1]['triggerPrice']) for kind, found in existing.items() if found}
+        if STOP not in desired and pos.get('stop') is not None:
+            desired[STOP] = pos['stop']
+        _desired[symbol] = desired
+
+    live, sizes = {}, {}
+    to_cancel = list(stray)
+    for kind in KINDS:
+        keep = None
+        for order in existing[kind]:
+            size = _order_size(order)
+            # Quantidade fixa diferente da posição (que cresceu ou diminuiu) é recriada
+            if (keep is None and kind in desired and _same_price(symbol, order['triggerPrice'], desired[kind])
+                    and (size is None or _same_qty(symbol, size, pos['qty']))):
+                keep = order['algoId']
+                sizes[kind] = size
+            else:
+                to_cancel.append(order['algoId'])
+        if keep is not None:
+            live[kind] = [keep]
+        elif kind in desired:
+            try:
+                live[kind] = [_create(client, symbol, kind, pos['side'], desired[kind], pos['qty'])]
+                sizes[kind] = float(pos['qty'])
+                log(f"🛡️ {kind} recriado para {symbol} em {desired[kind]}", symbol=symbol, event="order_sync")
+            except Exception as e:
+                log(f"Erro ao recriar {kind} de {symbol}: {e}", level="ERROR")
+                # Mantém as ordens antigas desse tipo em vez de deixar a posição descoberta
+                to_cancel = [i for i in to_cancel if i not in {o['algoId'] for o in existing[kind]}]
+    _live[symbol] = live
+    _sizes[symbol] = sizes
+    _cancel(client, symbol, to_cancel)
+
+
+def _fetch_orders(client, symbols):
+    # Busca pelo menor peso: duas por símbolo ou duas para todas as moedas
+    per_symbol = len(symbols) * (ENDPOINT_WEIGHTS['openOrders'] + ENDPOINT_WEIGHTS['openAlgoOrders'])
+    if per_symbol >= ALL_SYMBOLS_WEIGHTS['openOrders'] + ALL_SYMBOLS_WEIGHTS['openAlgoOrders']:
+        stats['rest_calls'] += 2
+        return _group(client.futures_get_open_orders()), _group(client.futures_get_open_orders(conditional=True))
+    regular, conditional = {}, {}
+    for symbol in symbols:
+        stats['rest_calls'] += 2
+        regular[symbol] = client.futures_get_open_orders(symbol=symbol)
+        conditional[symbol] = client.futures_get_open_orders(symbol=symbol, conditional=True)
+    return regular, conditional
+
+
+# positions_fn() -> {símbolo: {'open', 'side', 'qty', 'stop'}} para os símbolos
+# operados; é chamada de novo depois da busca das ordens para refletir o
+# estado mais novo. Moedas que entraram nesse meio tempo ficam para o próximo ciclo.
+def reconcile(client, positions_fn):
+    started = time.monotonic()
+    symbols = list(positions_fn())
+    regular, conditional = _fetch_orders(client, symbols)
+    positions = {s: pos for s, pos in positions_fn().items() if s in symbols}
+    stats['reconciles'] += 1
+    for symbol, pos in positions.items():
+        with _lock(symbol):
+            if changed_since(symbol, started):
+                # Alterado depois da busca; fica para o próximo ciclo
+                stats['skipped'] += 1
+                continue
+            try:
+                if not pos['open']:
+                    if regular.get(symbol) or conditional.get(symbol):
+                        cancel_symbol(client, symbol, bool(regular.get(symbol)), bool(conditional.get(symbol)))
+                        log(f"🗑️ Ordens canceladas para {symbol} (sem posição)", symbol=symbol, event="order_sync")
+                    else:
+                        _desired.pop(symbol, None)
+                        _live.pop(symbol, None)
+                        _sizes.pop(symbol, None)
+                    continue
+                _reconcile_open(client, symbol, pos, conditional.get(symbol, []))
+            except Exception as e:
+                log(f"Erro ao reconciliar ordens de {symbol}: {e}", level="ERROR")
+
+
+def order_sync_stats():
+    return {**stats, 'tracked': len(_desired)}
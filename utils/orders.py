@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from utils.rate_limit import GovernedClient, high_priority
+from utils.util import log
+
+# Caminho de execução de ordens: um client próprio com pool de conexões
+# mantidas abertas (sem handshake TLS na hora do sinal), alavancagem em cache
+# e stop/take profit enviados juntos logo após a execução da entrada.
+#
+# Desde a migração das ordens condicionais para o serviço de algo orders, a
+# Binance não aceita STOP_MARKET/TAKE_PROFIT_MARKET no batchOrders; as duas
+# ordens de proteção saem em paralelo, cada uma na sua conexão do pool.
+
+ORDER_POOL_SIZE = int(os.getenv("ORDER_POOL_SIZE", 4))
+ORDER_KEEPALIVE = int(os.getenv("ORDER_KEEPALIVE", 30))  # segundos entre pings que mantêm a conexão aberta
+LATENCY_HISTORY = 500
+
+order_client = None
+leverage_cache = {}  # símbolo -> alavancagem configurada na Binance
+latencies = deque(maxlen=LATENCY_HISTORY)  # (símbolo, total, entrada, proteção) em ms
+
+_protect_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="protect")
+
+
+def tune_session(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def _keepalive_loop():
+    while True:
+        time.sleep(ORDER_KEEPALIVE)
+        try:
+            order_client.futures_ping()
+        except Exception as e:
+            log(f"Erro no ping de keep-alive de ordens: {e}", level="ERROR")
+
+
+def init_order_client(api_key, api_secret):
+    global order_client
+    order_client = GovernedClient(api_key, api_secret)
+    tune_session(order_client.session, ORDER_POOL_SIZE)
+    try:
+        # Já abre a conexão com a API de futuros
+        order_client.futures_ping()
+        load_leverages()
+    except Exception as e:
+        log(f"Erro ao preparar client de ordens: {e}", level="ERROR")
+    threading.Thread(target=_keepalive_loop, name="order-keepalive", daemon=True).start()
+    return order_client
+
+
+def load_leverages():
+    # Uma chamada com a alavancagem atual de todos os símbolos
+    for item in order_client.futures_symbol_config():
+        leverage_cache[item['symbol']] = int(item['leverage'])
+
+
+def ensure_leverage(symbol, leverage):
+    if leverage_cache.get(symbol) == leverage:
+        return
+    try:
+        order_client.futures_change_leverage(symbol=symbol, leverage=leverage)
+        leverage_cache[symbol] = leverage
+    except Exception:
+        leverage_cache.pop(symbol, None)
+        raise
+
+
+def order_id(response):
+    # Ordens condicionais voltam do endpoint de algo orders com algoId
+    if not isinstance(response, dict):
+        return None
+    return response.get('orderId') or response.get('algoId')
+
+
+def place_entry(symbol, side, qty):
+    # RESULT devolve preço médio e quantidade executada da ordem a mercado
+    return order_client.futures_create_order(
+        symbol=symbol,
+        side='BUY' if side == 'LONG' else 'SELL',
+        type='MARKET',
+        quantity=qty,
+        newOrderRespType='RESULT',
+    )
+
+
+@high_priority
+def _create_order(params):
+    try:
+        return order_client.futures_create_order(**params)
+    except Exception as e:
+        return e
+
+
+def place_protection(symbol, side, stop_price, take_profit_price=None):
+    # Envia stop e take profit ao mesmo tempo; devolve as respostas (ou exceções)
+    base = {
+        'symbol': symbol,
+        'side': 'SELL' if side == 'LONG' else 'BUY',
+        'closePosition': True,
+        'timeInForce': 'GTC',
+    }
+    orders = [{**base, 'type': 'STOP_MARKET', 'stopPrice': str(stop_price)}]
+    if take_profit_price is not None:
+        orders.append({**base, 'type': 'TAKE_PROFIT_MARKET', 'stopPrice': str(take_profit_price)})
+    futures = [_protect_pool.submit(_create_order, params) for params in orders]
+    return [f.result() for f in futures]
+
+
+def record_latency(symbol, started, entry_done, protected):
+    total = (protected - started) * 1000
+    entry = (entry_done - started) * 1000
+    protect = (protected - entry_done) * 1000
+    latencies.append((symbol, total, entry, protect))
+    log(f"⚡ {symbol} protegido em {total:.0f} ms (entrada {entry:.0f} ms, proteção {protect:.0f} ms)", symbol=symbol, event="order_latency")
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def latency_stats():
+    if not latencies:
+        return {'count': 0}
+    totals = [x[1] for x in latencies]
+    return {
+        'count': len(totals),
+        'p50_ms': round(_percentile(totals, 0.5), 1),
+        'p99_ms': round(_percentile(totals, 0.99), 1),
+        'last_ms': round(totals[-1], 1),
+    }
@@ -0,0 +1,230 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from binance.client import Client
+from utils.util import log
+from utils import clock
+from utils.metrics import inc, observe
+
+# Controle do peso de requisições da API de futuros (limite por IP por minuto).
+# Cada chamada consome tokens de um balde que se recompõe continuamente; o
+# peso informado pela Binance no header X-MBX-USED-WEIGHT-1M corrige a
+# estimativa local. Leituras de mercado esperam antes de chegar perto do
+# limite, deixando folga para ordens e atualizações de stop.
+
+WEIGHT_LIMIT = int(os.getenv("BINANCE_WEIGHT_LIMIT", 2400))  # peso por minuto
+
+HIGH, NORMAL, LOW = 'high', 'normal', 'low'
+
+# Fração do limite que precisa sobrar depois da chamada, por prioridade
+RESERVE = {HIGH: 0.0, NORMAL: 0.1, LOW: 0.3}
+
+ENDPOINT_WEIGHTS = {
+    'account': 5,
+    'balance': 5,
+    'positionRisk': 5,
+    'exchangeInfo': 1,
+    'ticker/price': 1,
+    'ticker/24hr': 1,
+    'ticker/bookTicker': 1,
+    'premiumIndex': 1,
+    'openOrders': 1,
+    'openAlgoOrders': 1,
+    'allOrders': 5,
+    'userTrades': 5,
+    'income': 30,
+    'order': 1,
+    'batchOrders': 5,
+    'allOpenOrders': 1,
+    'algoOrder': 1,
+    'algoOpenOrders': 1,
+    'leverage': 1,
+    'symbolConfig': 5,
+    'listenKey': 1,
+}
+
+# Peso das consultas sem símbolo (todas as moedas de uma vez). openOrders e
+# openAlgoOrders sem símbolo só compensam a partir de ~40 moedas (order_sync)
+ALL_SYMBOLS_WEIGHTS = {
+    'ticker/price': 2,
+    'ticker/24hr': 40,
+    'ticker/bookTicker': 2,
+    'premiumIndex': 10,
+    'openOrders': 40,
+    'openAlgoOrders': 40,
+}
+
+LOW_PRIORITY = {'klines', 'exchangeInfo', 'ticker/price', 'ticker/24hr', 'ticker/bookTicker', 'premiumIndex', 'depth'}
+HIGH_PRIORITY = {'order', 'batchOrders', 'allOpenOrders', 'algoOrder', 'algoOpenOrders', 'leverage', 'listenKey'}
+
+BAN_STATUS = (418, 429)
+
+
+def _klines_weight(limit):
+    limit = int(limit or 500)
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def endpoint_weight(path, params):
+    if path in ('klines', 'continuousKlines', 'markPriceKlines', 'indexPriceKlines'):
+        return _klines_weight(params.get('limit'))
+    if path == 'depth':
+        return _klines_weight(params.get('limit'))
+    if 'symbol' not in params and path in ALL_SYMBOLS_WEIGHTS:
+        return ALL_SYMBOLS_WEIGHTS[path]
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+
+def endpoint_priority(method, path):
+    if method != 'get' and path in HIGH_PRIORITY:
+        return HIGH
+    if path in LOW_PRIORITY:
+        return LOW
+    return NORMAL
+
+
+class WeightGovernor:
+    def __init__(self, limit=WEIGHT_LIMIT):
+        self.limit = limit
+        self.tokens = float(limit)
+        self.updated = clock.monotonic()
+        self.server_used = 0
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.weight_spent = 0
+        self.delayed = {HIGH: 0, NORMAL: 0, LOW: 0}
+        self.delay_seconds = 0.0
+        self.bans = 0
+        self.cond = threading.Condition()
+        self.local = threading.local()
+
+    def _refill(self, now):
+        # max(): ao trocar de relógio (replay) o novo pode estar atrás do antigo
+        self.tokens = min(self.limit, self.tokens + max(0.0, now - self.updated) * self.limit / 60.0)
+        self.updated = now
+
+    def acquire(self, weight, priority=NORMAL):
+        priority = getattr(self.local, 'priority', None) or priority
+        reserve = RESERVE[priority] * self.limit
+        started = None
+        with self.cond:
+            while True:
+                now = clock.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens - weight >= reserve:
+                    self.tokens -= weight
+                    self.requests += 1
+                    self.weight_spent += weight
+                    break
+                if started is None:
+                    started = now
+                    self.delayed[priority] += 1
+                missing = weight + reserve - self.tokens
+                delay = max(self.blocked_until - now, missing * 60.0 / self.limit, 0.05)
+                clock.wait(self.cond, min(delay, 1.0))
+            if started is not None:
+                self.delay_seconds += clock.monotonic() - started
+
+    def observe(self, used=None, status=None, retry_after=None):
+        with self.cond:
+            now = clock.monotonic()
+            self._refill(now)
+            if used is not None:
+                # O valor do servidor prevalece sobre a estimativa local
+                self.server_used = used
+                self.tokens = min(self.tokens, self.limit - used)
+            if status in BAN_STATUS:
+                self.bans += 1
+                self.blocked_until = max(self.blocked_until, now + (retry_after or 60))
+                self.tokens = min(self.tokens, 0)
+            self.cond.notify_all()
+        if status in BAN_STATUS:
+            log(f"⛔ Limite de peso da Binance atingido (HTTP {status}), pausando {retry_after or 60}s", level="ERROR")
+
+    @contextmanager
+    def priority(self, level):
+        # Eleva (ou rebaixa) a prioridade de todas as chamadas do bloco nesta thread
+        previous = getattr(self.local, 'priority', None)
+        self.local.priority = level
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def metrics(self):
+        with self.cond:
+            self._refill(clock.monotonic())
+            return {
+                'limit': self.limit,
+                'used_weight_1m': self.server_used,
+                'estimated_used': round(self.limit - self.tokens, 1),
+                'requests': self.requests,
+                'weight_spent': self.weight_spent,
+                'delayed': dict(self.delayed),
+                'delay_seconds': round(self.delay_seconds, 2),
+                'bans': self.bans,
+                'blocked': self.blocked_until > clock.monotonic(),
+            }
+
+
+governor = WeightGovernor()
+
+
+class GovernedClient(Client):
+    # Client da python-binance com as chamadas de futuros passando pelo governor
+    def __init__(self, *args, governor=governor, **kwargs):
+        self.governor = governor
+        # Endereço alternativo da API (ex.: http://127.0.0.1:8088 do mock_exchange.py)
+        override = os.getenv("BINANCE_FUTURES_URL")
+        if override:
+            kwargs.setdefault('ping', False)
+        super().__init__(*args, **kwargs)
+        if override:
+            base = override.rstrip('/')
+            self.API_URL = f"{base}/api"
+            self.FUTURES_URL = f"{base}/fapi"
+        self.session.hooks['response'].append(self._observe_response)
+
+    def _request_futures_api(self, method, path, signed=False, version=1, **kwargs):
+        params = kwargs.get('data') or kwargs.get('params') or {}
+        self.governor.acquire(endpoint_weight(path, params), endpoint_priority(method, path))
+        started = time.perf_counter()
+        try:
+            return super()._request_futures_api(method, path, signed, version, **kwargs)
+        except Exception as e:
+            inc('binance_request_errors_total', endpoint=path, status=getattr(e, 'status_code', 'none'))
+            raise
+        finally:
+            observe('binance_request_seconds', time.perf_counter() - started, endpoint=path, method=method)
+
+    def _observe_response(self, response, *args, **kwargs):
+        if not response.url.startswith(self.FUTURES_URL):
+            return
+        used = response.headers.get('X-MBX-USED-WEIGHT-1M')
+        retry_after = response.headers.get('Retry-After')
+        self.governor.observe(
+            used=int(used) if used else None,
+            status=response.status_code,
+            retry_after=int(retry_after) if retry_after else None,
+        )
+
+
+# Decorator: todas as chamadas feitas pela função usam prioridade alta
+def high_priority(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with governor.priority(HIGH):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def weight_metrics():
+    return governor.metrics()
@@ -0,0 +1,168 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from utils.klines import parse_klines
+from utils.rate_limit import governor
+from utils.strategies import RSI_LOW, RSI_HIGH, MA_FAST, MA_SLOW, BREAKOUT_LOOKBACK
+from utils.util import log
+
+# Scanner do universo de futuros USDT-M. Com um ticker 24h (todas as moedas
+# numa chamada) escolhe as perpétuas líquidas, busca os candles recentes de
+# cada uma e calcula as pré-condições das estratégias numa passada NumPy sobre
+# a matriz moedas x tempo:
+#   - RSI 1h (mesmo cálculo de WilderRSI) perto/além de rsi_low/rsi_high
+#   - distância do preço à máxima/mínima dos 20 candles de 1h anteriores (turtle)
+#   - spread MA9/MA21 no 3m e cruzamento no último candle (scalper)
+# Como no bot, o último candle é o que está em formação.
+#
+# Peso: exchange info (1) + ticker 24h (40) + 2 buscas de klines por moeda com
+# limit < 100 (peso 1 cada), todas em prioridade baixa no governor.
+
+SCAN_MIN_QUOTE_VOLUME = float(os.getenv("SCAN_MIN_QUOTE_VOLUME", 20_000_000))  # USDT negociados em 24h
+SCAN_MAX_SYMBOLS = int(os.getenv("SCAN_MAX_SYMBOLS", 400))   # moedas mais líquidas analisadas
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", 16))            # buscas de klines em paralelo
+SCAN_BARS = 99               # limit < 100 mantém peso 1 por busca
+SCAN_INTERVALS = ('1h', '3m')
+BREAKOUT_BAND = 0.05         # distância (fração do preço) até o rompimento que ainda pontua
+MA_BAND = 0.005              # distância entre as médias que ainda pontua
+
+LONG, SHORT = 'LONG', 'SHORT'
+
+
+def perpetuals(client):
+    info = client.futures_exchange_info()
+    return {
+        s['symbol'] for s in info['symbols']
+        if s.get('contractType') == 'PERPETUAL' and s.get('quoteAsset') == 'USDT' and s.get('status') == 'TRADING'
+    }
+
+
+def liquid_tickers(client, universe, min_quote_volume=SCAN_MIN_QUOTE_VOLUME, limit=SCAN_MAX_SYMBOLS):
+    # Um ticker 24h de todas as moedas, filtrado e ordenado por volume financeiro
+    tickers = [t for t in client.futures_ticker() if t['symbol'] in universe]
+    tickers = [t for t in tickers if float(t['quoteVolume']) >= min_quote_volume]
+    tickers.sort(key=lambda t: float(t['quoteVolume']), reverse=True)
+    return {
+        t['symbol']: {'quote_volume': float(t['quoteVolume']), 'change_pct': float(t['priceChangePercent'])}
+        for t in tickers[:limit]
+    }
+
+
+def _fetch(client, symbol, interval, bars):
+    try:
+        return parse_klines(client.futures_klines(symbol=symbol, interval=interval, limit=bars))
+    except Exception as e:
+        log(f"Scanner: erro ao buscar klines {interval} de {symbol}: {e}", level="WARNING", symbol=symbol)
+        return None
+
+
+def fetch_matrix(client, symbols, intervals=SCAN_INTERVALS, bars=SCAN_BARS, workers=SCAN_WORKERS):
+    # Matriz moedas x tempo por intervalo. Fica só quem tem o histórico completo
+    # e o candle em formação atual em todos os intervalos (moedas novas ou
+    # paradas saem).
+    jobs = [(symbol, interval) for symbol in symbols for interval in intervals]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scanner") as pool:
+        fetched = dict(zip(jobs, pool.map(lambda job: _fetch(client, job[0], job[1], bars), jobs)))
+
+    complete = [s for s in symbols if all(
+        fetched[(s, i)] is not None and len(fetched[(s, i)]) == bars for i in intervals
+    )]
+    current = {i: max((int(fetched[(s, i)]['open_time'][-1]) for s in complete), default=0) for i in intervals}
+    keep = [s for s in complete if all(int(fetched[(s, i)]['open_time'][-1]) == current[i] for i in intervals)]
+    return keep, {i: np.stack([fetched[(s, i)] for s in keep]) for i in intervals} if keep else {}
+
+
+def rsi(close, window=14):
+    # WilderRSI sobre cada linha: a média exponencial partindo de zero vira uma
+    # soma ponderada dos ganhos/perdas, então é um produto matriz x vetor
+    alpha = 1.0 / window
+    delta = np.diff(close, axis=1)
+    weights = alpha * (1.0 - alpha) ** np.arange(delta.shape[1] - 1, -1, -1)
+    avg_up = np.clip(delta, 0, None) @ weights
+    avg_dn = np.clip(-delta, 0, None) @ weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + avg_up / avg_dn)
+    return np.where(avg_dn == 0, 100.0, out)
+
+
+def score(close_1h, high_1h, low_1h, close_3m, rsi_low=RSI_LOW, rsi_high=RSI_HIGH,
+          ma_fast=MA_FAST, ma_slow=MA_SLOW, lookback=BREAKOUT_LOOKBACK):
+    price = close_3m[:, -1]
+    last_rsi = rsi(close_1h)
+
+    # Lado cujo gatilho RSI está mais perto; 1.0 = gatilho armado
+    long_rsi = np.clip((50.0 - last_rsi) / (50.0 - rsi_low), 0.0, 1.0)
+    short_rsi = np.clip((last_rsi - 50.0) / (rsi_high - 50.0), 0.0, 1.0)
+    is_long = long_rsi >= short_rsi
+    rsi_score = np.where(is_long, long_rsi, short_rsi)
+
+    # Turtle: quanto falta (fração do preço) para romper a máxima/mínima dos
+    # `lookback` candles de 1h anteriores ao atual; <= 0 já rompeu
+    breakout_high = high_1h[:, -lookback - 1:-1].max(axis=1)
+    breakout_low = low_1h[:, -lookback - 1:-1].min(axis=1)
+    close_now = close_1h[:, -1]
+    breakout = np.where(is_long, breakout_high - close_now, close_now - breakout_low) / close_now
+    breakout_score = np.clip(1.0 - breakout / BREAKOUT_BAND, 0.0, 1.0)
+
+    # Scalper: médias no 3m antes e depois do candle em formação
+    fast_prev, fast_curr = close_3m[:, -ma_fast - 1:-1].mean(axis=1), close_3m[:, -ma_fast:].mean(axis=1)
+    slow_prev, slow_curr = close_3m[:, -ma_slow - 1:-1].mean(axis=1), close_3m[:, -ma_slow:].mean(axis=1)
+    spread = (fast_curr - slow_curr) / price
+    crossed = np.where(
+        is_long,
+        (fast_prev < slow_prev) & (fast_curr > slow_curr),
+        (fast_prev > slow_prev) & (fast_curr < slow_curr),
+    )
+    # Só conta a média rápida do lado de onde o cruzamento ainda vai acontecer
+    gap = np.where(is_long, -spread, spread)
+    ma_score = np.where(crossed, 1.0, np.where(gap > 0, np.clip(1.0 - gap / MA_BAND, 0.0, 1.0), 0.0))
+
+    scalper = rsi_score + ma_score
+    turtle = rsi_score + breakout_score
+    return {
+        'side': np.where(is_long, LONG, SHORT),
+        'strategy': np.where(turtle > scalper, 'turtle', 'scalper'),
+        'score': np.maximum(scalper, turtle),
+        'rsi': last_rsi,
+        'rsi_armed': rsi_score >= 1.0,
+        'breakout_pct': breakout * 100,
+        'ma_spread_pct': spread * 100,
+        'crossed': crossed,
+        'price': price,
+    }
+
+
+# Ranking das moedas líquidas, melhor candidato primeiro
+def scan(client, min_quote_volume=SCAN_MIN_QUOTE_VOLUME, max_symbols=SCAN_MAX_SYMBOLS, workers=SCAN_WORKERS):
+    started = time.perf_counter()
+    weight_before = governor.weight_spent
+    tickers = liquid_tickers(client, perpetuals(client), min_quote_volume, max_symbols)
+    symbols, m = fetch_matrix(client, list(tickers), workers=workers)
+    if not symbols:
+        log("🔭 Scanner: nenhuma moeda com histórico suficiente", level="WARNING")
+        return []
+
+    h1, m3 = m['1h'], m['3m']
+    result = score(h1['close'], h1['high'], h1['low'], m3['close'])
+    ranked = []
+    for i, symbol in enumerate(symbols):
+        ranked.append({
+            'symbol': symbol,
+            'side': str(result['side'][i]),
+            'strategy': str(result['strategy'][i]),
+            'score': round(float(result['score'][i]), 4),
+            'rsi': round(float(result['rsi'][i]), 2),
+            'rsi_armed': bool(result['rsi_armed'][i]),
+            'breakout_pct': round(float(result['breakout_pct'][i]), 3),
+            'ma_spread_pct': round(float(result['ma_spread_pct'][i]), 4),
+            'crossed': bool(result['crossed'][i]),
+            'price': float(result['price'][i]),
+            **tickers[symbol],
+        })
+    ranked.sort(key=lambda r: (r['score'], r['quote_volume']), reverse=True)
+    log(
+        f"🔭 Scanner: {len(ranked)}/{len(tickers)} moedas em {time.perf_counter() - started:.1f}s"
+        f" | peso {governor.weight_spent - weight_before}"
+    )
+    return ranked
@@ -0,0 +1,228 @@
+import os
+import asyncio
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.klines import INTERVAL_MS
+from utils.util import log
+from utils.metrics import observe
+from utils import clock
+
+# Agendador assíncrono do loop principal. Um único despachante asyncio dispara
+# as tarefas nos horários certos (fechamento de candle ou período fixo) e as
+# executa em pools de threads separados por prioridade, então um ciclo de
+# sinais lento não atrasa stops e monitoramento. Se a execução anterior ainda
+# estiver rodando, a nova é pulada e registrada em vez de enfileirar.
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {HIGH: 'high', NORMAL: 'normal', LOW: 'low'}
+
+CANDLE_CLOSE_DELAY = float(os.getenv("CANDLE_CLOSE_DELAY", 2.0))  # segundos após o fechamento
+HEALTH_STALE_PERIODS = float(os.getenv("HEALTH_STALE_PERIODS", 3))  # períodos sem execução ok até a tarefa ser dada como parada
+POOL_SIZE = 4
+
+
+class Job:
+    def __init__(self, name, fn, period, priority=NORMAL, aligned=False, offset=0.0):
+        self.name = name
+        self.fn = fn
+        self.period = period
+        self.priority = priority
+        self.aligned = aligned
+        self.offset = offset
+        self.running = False
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.last_lateness = None
+        self.last_success = None
+        self.started_at = None
+        self.created_at = clock.now()
+
+    def first_run(self, now):
+        if self.aligned:
+            return self.next_boundary(now)
+        return now + self.period
+
+    def next_boundary(self, now):
+        # Próximo fechamento de candle (múltiplo do período) mais o atraso
+        base = now - self.offset
+        return (base // self.period + 1) * self.period + self.offset
+
+    def stats(self):
+        return {
+            'priority': PRIORITY_NAMES[self.priority],
+            'period': self.period,
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'running': self.running,
+            'last_duration': self.last_duration,
+            'max_duration': round(self.max_duration, 3),
+            'last_lateness': self.last_lateness,
+            'last_success': self.last_success,
+        }
+
+    def problems(self, now):
+        problems = []
+        if self.running and self.started_at and now - self.started_at > self.period:
+            problems.append(f"{self.name} rodando há {now - self.started_at:.0f}s (período {self.period:.0f}s)")
+        elif self.last_duration is not None and self.last_duration > self.period:
+            problems.append(f"{self.name} levou {self.last_duration:.0f}s na última execução (período {self.period:.0f}s)")
+        since = self.last_success or self.created_at
+        if now - since > self.period * HEALTH_STALE_PERIODS:
+            problems.append(f"{self.name} sem execução ok há {now - since:.0f}s")
+        return problems
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = []
+        self.pools = {
+            p: ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix=f"sched-{name}")
+            for p, name in PRIORITY_NAMES.items()
+        }
+        self._seq = itertools.count()
+
+    def every(self, seconds, fn, name=None, priority=NORMAL):
+        job = Job(name or fn.__name__, fn, seconds, priority)
+        self.jobs.append(job)
+        return job
+
+    def on_candle_close(self, interval, fn, name=None, priority=NORMAL, delay=CANDLE_CLOSE_DELAY):
+        # Roda logo depois de cada fechamento de candle do intervalo (3m, 5m, 1h...)
+        job = Job(name or f"{fn.__name__}[{interval}]", fn, INTERVAL_MS[interval] / 1000, priority,
+                  aligned=True, offset=delay)
+        self.jobs.append(job)
+        return job
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
+
+    def health(self):
+        now = clock.now()
+        return [problem for job in self.jobs for problem in job.problems(now)]
+
+    # Gauges por tarefa para o /metrics
+    def samples(self):
+        out = []
+        for job in self.jobs:
+            labels = {'job': job.name}
+            out += [
+                ('scheduler_job_runs', labels, job.runs),
+                ('scheduler_job_overruns', labels, job.overruns),
+                ('scheduler_job_skipped', labels, job.skipped),
+                ('scheduler_job_errors', labels, job.errors),
+                ('scheduler_job_running', labels, job.running),
+                ('scheduler_job_period_seconds', labels, job.period),
+                ('scheduler_job_last_duration_seconds', labels, job.last_duration),
+                ('scheduler_job_last_lateness_seconds', labels, job.last_lateness),
+                ('scheduler_job_last_success_timestamp', labels, job.last_success),
+            ]
+        return sorted(out, key=lambda sample: sample[0])
+
+    def _start(self, job, scheduled):
+        started = clock.now()
+        job.started_at = started
+        job.last_lateness = round(started - scheduled, 3)
+
+    def _finish(self, job, duration, error=None):
+        if error is None:
+            job.last_success = clock.now()
+        else:
+            job.errors += 1
+            log(f"Erro na tarefa {job.name}: {error}", level="ERROR")
+        job.running = False
+        job.runs += 1
+        job.last_duration = round(duration, 3)
+        job.max_duration = max(job.max_duration, duration)
+        observe('task_duration_seconds', duration, job=job.name)
+        if duration > job.period:
+            job.overruns += 1
+            log(f"⚠️ {job.name} levou {duration:.1f}s (período {job.period:.0f}s)", level="WARNING")
+
+    async def _execute(self, job, scheduled):
+        loop = asyncio.get_running_loop()
+        self._start(job, scheduled)
+        error = None
+        try:
+            await loop.run_in_executor(self.pools[job.priority], job.fn)
+        except Exception as e:
+            error = e
+        finally:
+            self._finish(job, clock.now() - job.started_at, error)
+
+    def _dispatch(self, job, scheduled):
+        if job.running:
+            job.skipped += 1
+            log(f"⏭️ {job.name}: execução anterior ainda em andamento, pulando", level="WARNING")
+            return
+        job.running = True
+        asyncio.get_running_loop().create_task(self._execute(job, scheduled))
+
+    def _next(self, job, scheduled, now):
+        if job.aligned:
+            return job.next_boundary(max(now, scheduled))
+        nxt = scheduled + job.period
+        while nxt <= now:
+            # Loop atrasado: descarta os horários perdidos em vez de acumular
+            job.skipped += 1
+            nxt += job.period
+        return nxt
+
+    async def run(self):
+        heap = []
+        now = clock.now()
+        for job in self.jobs:
+            heapq.heappush(heap, (job.first_run(now), job.priority, next(self._seq), job))
+        while heap:
+            when = heap[0][0]
+            delay = when - clock.now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Todas as tarefas vencidas, das mais prioritárias para as menos
+            now = clock.now()
+            due = []
+            while heap and heap[0][0] <= now:
+                due.append(heapq.heappop(heap))
+            due.sort(key=lambda entry: entry[1])
+            for scheduled, priority, _, job in due:
+                self._dispatch(job, scheduled)
+                heapq.heappush(heap, (self._next(job, scheduled, now), priority, next(self._seq), job))
+
+    def run_forever(self):
+        asyncio.run(self.run())
+
+    # Replay (paper.py): mesma fila de tarefas no relógio virtual, sem threads.
+    # Cada tarefa roda até o fim antes do relógio andar; advance(t) leva o
+    # relógio até t (e a exchange simulada junto). A duração registrada é o
+    # tempo real de CPU da tarefa, que vira o perfil de tempo do replay.
+    def run_virtual(self, until, advance):
+        heap = []
+        now = clock.now()
+        for job in self.jobs:
+            heapq.heappush(heap, (job.first_run(now), job.priority, next(self._seq), job))
+        while heap and heap[0][0] <= until:
+            advance(heap[0][0])
+            now = clock.now()
+            due = []
+            while heap and heap[0][0] <= now:
+                due.append(heapq.heappop(heap))
+            due.sort(key=lambda entry: entry[1])
+            for scheduled, priority, _, job in due:
+                self._start(job, scheduled)
+                job.running = True
+                started = time.perf_counter()
+                error = None
+                try:
+                    job.fn()
+                except Exception as e:
+                    error = e
+                self._finish(job, time.perf_counter() - started, error)
+                heapq.heappush(heap, (self._next(job, scheduled, clock.now()), priority, next(self._seq), job))
+        advance(until)
@@ -0,0 +1,304 @@
+import os
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+from utils.util import log, flush_log
+
+# Modo shard: um coordenador divide as moedas de COIN_CONFIGS entre vários
+# processos do bot (locais ou em outras máquinas), ligados por socket
+# (multiprocessing.connection, com authkey). O coordenador faz três coisas:
+# - Entrega a cada worker a sua parte das moedas.
+# - Guarda o orçamento global de margem. Antes de abrir uma posição, o worker
+#   reserva a margem, e o coordenador desconta as reservas que ainda não
+#   aparecem na foto da conta. Assim dois workers não gastam a mesma margem.
+# - Redistribui as moedas de um worker que morre (processo saiu ou sem
+#   heartbeat) entre os que continuam vivos.
+# Um worker que perde contato com o coordenador para de abrir posições, e um
+# worker dado como morto que tenta voltar é encerrado.
+
+# As mensagens são pickle: quem completa o handshake com a chave executa código
+# no coordenador e nos workers. Não há chave padrão, e a porta não deve ficar
+# exposta fora de uma rede privada.
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "").encode()
+MIN_AUTHKEY_BYTES = 16
+SHARD_HEARTBEAT = float(os.getenv("SHARD_HEARTBEAT", 5))                  # segundos entre heartbeats
+SHARD_HEARTBEAT_TIMEOUT = float(os.getenv("SHARD_HEARTBEAT_TIMEOUT", 20))  # sem heartbeat -> worker morto
+SHARD_MARGIN_FRACTION = float(os.getenv("SHARD_MARGIN_FRACTION", 1.0))     # fração da margem disponível que pode ser reservada
+SHARD_MAX_POSITIONS = int(os.getenv("SHARD_MAX_POSITIONS", 0))             # posições abertas somando todos os workers (0 = sem limite)
+RESERVATION_TTL = 60       # reserva não confirmada expira (worker caiu no meio da ordem)
+SNAPSHOT_MARGIN = 1.0      # segundos de folga para considerar uma execução refletida na foto da conta
+
+
+def check_authkey(authkey):
+    if len(authkey or b'') < MIN_AUTHKEY_BYTES:
+        raise ValueError(
+            f"SHARD_AUTHKEY ausente ou curta (mínimo {MIN_AUTHKEY_BYTES} caracteres);"
+            " gere uma com: python -c \"import secrets; print(secrets.token_hex(32))\""
+        )
+    return authkey
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def split_symbols(symbols, n):
+    # Round-robin sobre a lista ordenada: partes com tamanhos iguais (±1)
+    shards = [[] for _ in range(n)]
+    for i, symbol in enumerate(sorted(symbols)):
+        shards[i % n].append(symbol)
+    return shards
+
+
+class Coordinator:
+    def __init__(self, symbols, workers, address=('127.0.0.1', 7070), authkey=SHARD_AUTHKEY):
+        self.plan = {f"w{i}": shard for i, shard in enumerate(split_symbols(symbols, workers))}
+        self.assignment = {}  # worker -> moedas atuais
+        self.last_seen = {}   # worker -> instante do último contato
+        self.dead = set()
+        self.orphans = []     # moedas sem dono esperando um worker vivo
+        self.to_add = {}      # worker -> moedas a adotar no próximo heartbeat
+        self.open_symbols = {}  # worker -> posições abertas informadas
+        self.available = 0.0
+        self.available_at = 0.0
+        self.reservations = {}  # moeda -> {'margin', 'reserved_at', 'committed_at'}
+        self.stats = {'granted': 0, 'denied': 0, 'reassigned': 0}
+        self.lock = threading.Lock()
+        self.listener = Listener(address, authkey=check_authkey(authkey))
+        self.address = self.listener.address
+
+    # --- atribuição ---------------------------------------------------------
+
+    def hello(self, worker):
+        with self.lock:
+            if worker in self.dead:
+                return {'fenced': True}
+            if worker not in self.assignment:
+                symbols = list(self.plan.get(worker, []))
+                # Worker novo também pega as moedas órfãs
+                symbols += self.orphans
+                self.orphans = []
+                self.assignment[worker] = symbols
+            self.last_seen[worker] = time.time()
+            log(f"🤝 Worker {worker} conectado com {len(self.assignment[worker])} moedas")
+            return {'symbols': list(self.assignment[worker])}
+
+    def heartbeat(self, worker, open_symbols):
+        with self.lock:
+            if worker in self.dead or worker not in self.assignment:
+                return {'fenced': True}
+            self.last_seen[worker] = time.time()
+            self.open_symbols[worker] = set(open_symbols)
+            add = self.to_add.pop(worker, [])
+            return {'add': add}
+
+    def mark_dead(self, worker, reason):
+        with self.lock:
+            if worker in self.dead or worker not in self.assignment:
+                return
+            self.dead.add(worker)
+            symbols = self.assignment.pop(worker)
+            self.to_add.pop(worker, None)
+            self.open_symbols.pop(worker, None)
+            alive = [w for w in self.assignment if w not in self.dead]
+            log(f"💀 Worker {worker} morto ({reason}); redistribuindo {len(symbols)} moedas entre {len(alive)} workers", level="WARNING")
+            if not alive:
+                self.orphans += symbols
+                return
+            for symbol in symbols:
+                target = min(alive, key=lambda w: len(self.assignment[w]))
+                self.assignment[target].append(symbol)
+                self.to_add.setdefault(target, []).append(symbol)
+                self.stats['reassigned'] += 1
+
+    def check_alive(self):
+        now = time.time()
+        for worker, seen in list(self.last_seen.items()):
+            if worker not in self.dead and now - seen > SHARD_HEARTBEAT_TIMEOUT:
+                self.mark_dead(worker, f"sem heartbeat há {now - seen:.0f}s")
+
+    # --- orçamento de margem ------------------------------------------------
+
+    def _pending_margin(self, now):
+        pending = 0.0
+        for symbol, r in list(self.reservations.items()):
+            committed = r['committed_at']
+            if committed is None and now - r['reserved_at'] > RESERVATION_TTL:
+                del self.reservations[symbol]
+            elif committed is not None and committed < self.available_at - SNAPSHOT_MARGIN:
+                # A foto da conta mais nova já inclui essa posição
+                del self.reservations[symbol]
+            else:
+                pending += r['margin']
+        return pending
+
+    def reserve(self, worker, symbol, wanted, available, fetched_at):
+        now = time.time()
+        with self.lock:
+            if worker in self.dead:
+                return {'fenced': True}
+            if fetched_at > self.available_at:
+                self.available, self.available_at = available, fetched_at
+            budget = self.available * SHARD_MARGIN_FRACTION - self._pending_margin(now)
+            open_count = sum(len(s) for s in self.open_symbols.values()) + sum(
+                1 for r in self.reservations.values() if r['committed_at'] is None
+            )
+            if SHARD_MAX_POSITIONS and open_count >= SHARD_MAX_POSITIONS:
+                budget = 0.0
+            grant = max(0.0, min(wanted, budget))
+            if grant > 0:
+                self.reservations[symbol] = {'margin': grant, 'reserved_at': now, 'committed_at': None}
+                self.stats['granted'] += 1
+            else:
+                self.stats['denied'] += 1
+            return {'margin': grant}
+
+    def commit(self, worker, symbol):
+        with self.lock:
+            r = self.reservations.get(symbol)
+            if r is not None:
+                r['committed_at'] = time.time()
+            self.open_symbols.setdefault(worker, set()).add(symbol)
+        return {}
+
+    def release(self, worker, symbol):
+        with self.lock:
+            self.reservations.pop(symbol, None)
+            self.open_symbols.get(worker, set()).discard(symbol)
+        return {}
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'workers': {w: len(s) for w, s in self.assignment.items()},
+                'dead': sorted(self.dead),
+                'orphans': len(self.orphans),
+                'open_positions': sum(len(s) for s in self.open_symbols.values()),
+                'pending_margin': round(sum(r['margin'] for r in self.reservations.values()), 2),
+                'available': round(self.available, 2),
+                **self.stats,
+            }
+
+    # --- transporte ---------------------------------------------------------
+
+    def _serve(self, conn):
+        worker = None
+        handlers = {
+            'hello': lambda m: self.hello(m['worker']),
+            'heartbeat': lambda m: self.heartbeat(m['worker'], m.get('open', [])),
+            'reserve': lambda m: self.reserve(m['worker'], m['symbol'], m['wanted'], m['available'], m['fetched_at']),
+            'commit': lambda m: self.commit(m['worker'], m['symbol']),
+            'release': lambda m: self.release(m['worker'], m['symbol']),
+        }
+        try:
+            while True:
+                msg = conn.recv()
+                worker = msg.get('worker', worker)
+                conn.send(handlers[msg['op']](msg))
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            log(f"Erro na conexão do worker {worker}: {e}", level="ERROR")
+        finally:
+            conn.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                log(f"Erro ao aceitar worker: {e}", level="ERROR")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def start(self):
+        threading.Thread(target=self._accept_loop, name="shard-accept", daemon=True).start()
+
+        def watchdog():
+            while True:
+                time.sleep(1)
+                self.check_alive()
+
+        threading.Thread(target=watchdog, name="shard-watchdog", daemon=True).start()
+
+
+class ShardClient:
+    # Lado do worker: também é o alocador de margem usado por place_order
+    def __init__(self, address, worker, authkey=SHARD_AUTHKEY):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.worker = worker
+        self.authkey = check_authkey(authkey)
+        self.conn = None
+        self.lock = threading.Lock()
+        self.lost = False
+        self.on_assign = None           # callback(moedas) para moedas redistribuídas
+        self.open_symbols = lambda: []  # posições abertas deste worker
+        self.symbols = self._hello()
+
+    def _connect(self):
+        self.conn = Client(self.address, authkey=self.authkey)
+
+    def _call(self, **msg):
+        with self.lock:
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.send({**msg, 'worker': self.worker})
+                reply = self.conn.recv()
+            except Exception:
+                self.conn = None
+                raise
+        if reply.get('fenced'):
+            log(f"⛔ Worker {self.worker} foi substituído pelo coordenador; encerrando", level="ERROR")
+            flush_log()
+            os._exit(1)
+        return reply
+
+    def _hello(self):
+        return self._call(op='hello')['symbols']
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(SHARD_HEARTBEAT)
+            try:
+                reply = self._call(op='heartbeat', open=list(self.open_symbols()))
+                if self.lost:
+                    log(f"🔗 Worker {self.worker} reconectado ao coordenador")
+                self.lost = False
+            except Exception as e:
+                if not self.lost:
+                    log(f"Sem contato com o coordenador, novas entradas suspensas: {e}", level="ERROR")
+                self.lost = True
+                continue
+            if reply.get('add') and self.on_assign is not None:
+                log(f"📥 Worker {self.worker} assumiu {len(reply['add'])} moedas: {', '.join(reply['add'])}")
+                try:
+                    self.on_assign(reply['add'])
+                except Exception as e:
+                    log(f"Erro ao assumir moedas: {e}", level="ERROR")
+
+    def start(self):
+        threading.Thread(target=self._heartbeat_loop, name="shard-heartbeat", daemon=True).start()
+
+    # Alocador de margem: devolve a margem liberada (0 nega a entrada)
+    def reserve(self, symbol, wanted, available, fetched_at):
+        if self.lost:
+            return 0.0
+        try:
+            return self._call(op='reserve', symbol=symbol, wanted=wanted, available=available, fetched_at=fetched_at)['margin']
+        except Exception as e:
+            log(f"Erro ao reservar margem para {symbol}: {e}", level="ERROR")
+            return 0.0
+
+    def commit(self, symbol):
+        try:
+            self._call(op='commit', symbol=symbol)
+        except Exception as e:
+            log(f"Erro ao confirmar margem de {symbol}: {e}", level="ERROR")
+
+    def release(self, symbol):
+        try:
+            self._call(op='release', symbol=symbol)
+        except Exception as e:
+            log(f"Erro ao liberar margem de {symbol}: {e}", level="ERROR")
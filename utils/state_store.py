@@ -0,0 +1,134 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from utils.util import log
+
+# Estado persistente do bot (posições e triggers de RSI) em SQLite no modo WAL.
+# Cada transição grava a linha atual do símbolo e uma entrada no histórico,
+# numa única transação curta. Com synchronous=NORMAL o commit não espera fsync,
+# e o WAL continua consistente mesmo se o processo cair no meio. Na partida,
+# load_state devolve o último estado de cada símbolo.
+
+STATE_DB = os.getenv("STATE_DB", "data/state.db")  # vazio desativa a persistência
+STATE_HISTORY = int(os.getenv("STATE_HISTORY", 10000))  # transições mantidas no histórico
+PRUNE_EVERY = 500
+
+POSITION = 'position'
+RSI_FLAGS = 'rsi_flags'
+
+_conn = None
+_lock = threading.Lock()
+_writes = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    kind TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, symbol)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+def open_store(path=None):
+    global _conn
+    path = STATE_DB if path is None else path
+    if not path:
+        return None
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = conn
+    return conn
+
+
+def close_store():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+# {kind: {símbolo: dados}} com o último estado gravado (só de `symbols`, se dado)
+def load_state(symbols=None):
+    state = {POSITION: {}, RSI_FLAGS: {}}
+    if _conn is None or symbols == []:
+        return state
+    query = "SELECT kind, symbol, data FROM state"
+    params = ()
+    if symbols is not None:
+        params = tuple(symbols)
+        query += f" WHERE symbol IN ({','.join('?' * len(params))})"
+    with _lock:
+        rows = _conn.execute(query, params).fetchall()
+    for kind, symbol, data in rows:
+        state.setdefault(kind, {})[symbol] = json.loads(data)
+    return state
+
+
+def save(kind, symbol, data):
+    global _writes
+    if _conn is None:
+        return
+    payload = json.dumps(data, separators=(',', ':'))
+    now = time.time()
+    with _lock:
+        try:
+            _conn.execute("BEGIN")
+            _conn.execute(
+                "INSERT OR REPLACE INTO state (kind, symbol, data, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, symbol, payload, now),
+            )
+            _conn.execute(
+                "INSERT INTO transitions (ts, kind, symbol, data) VALUES (?, ?, ?, ?)",
+                (now, kind, symbol, payload),
+            )
+            _conn.execute("COMMIT")
+            _writes += 1
+            if _writes % PRUNE_EVERY == 0:
+                _conn.execute(
+                    "DELETE FROM transitions WHERE id <= (SELECT MAX(id) FROM transitions) - ?", (STATE_HISTORY,)
+                )
+        except Exception as e:
+            if _conn.in_transaction:
+                _conn.execute("ROLLBACK")
+            log(f"Erro ao gravar estado {kind} {symbol}: {e}", level="ERROR")
+
+
+def save_position(symbol, state):
+    save(POSITION, symbol, state)
+
+
+def save_rsi_flags(symbol, flags):
+    save(RSI_FLAGS, symbol, flags)
+
+
+def history(symbol=None, limit=100):
+    if _conn is None:
+        return []
+    query = "SELECT ts, kind, symbol, data FROM transitions"
+    params = ()
+    if symbol is not None:
+        query += " WHERE symbol = ?"
+        params = (symbol,)
+    query += " ORDER BY id DESC LIMIT ?"
+    with _lock:
+        rows = _conn.execute(query, params + (limit,)).fetchall()
+    return [{'ts': ts, 'kind': kind, 'symbol': s, 'data': json.loads(data)} for ts, kind, s, data in rows]
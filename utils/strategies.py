@@ -1,86 +1,99 @@
-import ta
+import time
 from utils.core import (
-    get_klines,
+    get_kline_array,
     log,
     place_order,
-    get_available_margin,
     rsi_trigger_flags,
-    RISK_PERCENT,
+    set_rsi_trigger,
+    INDICATOR_HISTORY,
     CONFIGS,
 )
+from utils.indicators import live_values, WilderRSI, SMA, RollingMax, RollingMin
+
+# Parâmetros ajustáveis por moeda em COIN_CONFIGS (gerados por optimize.py)
+RSI_LOW = 30
+RSI_HIGH = 70
+MA_FAST = 9
+MA_SLOW = 21
+BREAKOUT_LOOKBACK = 20
 
 def update_rsi_trigger(symbol, interval='1h'):
-    df = get_klines(symbol, interval=interval, limit=100)
-    if df.empty:
+    rows = get_kline_array(symbol, interval=interval, limit=INDICATOR_HISTORY)
+    if rows is None or len(rows) == 0:
         return
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-    last_rsi = df['rsi'].iloc[-1]
+    config = CONFIGS.get(symbol, {})
+    _, last_rsi = live_values(symbol, interval, rows, 'rsi14', lambda: WilderRSI(14))
 
-    if last_rsi <= 30:
-        rsi_trigger_flags[symbol]['LONG'] = True
-        log(f"{symbol} RSI LONG trigger ativado (RSI={last_rsi:.2f})")
-    elif last_rsi >= 70:
-        rsi_trigger_flags[symbol]['SHORT'] = True
-        log(f"{symbol} RSI SHORT trigger ativado (RSI={last_rsi:.2f})")
+    if last_rsi <= config.get('rsi_low', RSI_LOW):
+        set_rsi_trigger(symbol, 'LONG', True)
+        log(f"{symbol} RSI LONG trigger ativado (RSI={last_rsi:.2f})", level="DEBUG", symbol=symbol, event="rsi_trigger")
+    elif last_rsi >= config.get('rsi_high', RSI_HIGH):
+        set_rsi_trigger(symbol, 'SHORT', True)
+        log(f"{symbol} RSI SHORT trigger ativado (RSI={last_rsi:.2f})", level="DEBUG", symbol=symbol, event="rsi_trigger")
 
 def check_signals_scalper(symbol):
     # Etapa 1: Atualiza trigger RSI (1h)
     update_rsi_trigger(symbol)
 
     # Etapa 2: Verifica cruzamento de MAs no 3m
-    df = get_klines(symbol, interval='3m', limit=100)
-    if df.empty or len(df) < 22:
-        log(f"⛔ Dados insuficientes para médias móveis {symbol}")
-        return
+    config = CONFIGS.get(symbol, {})
+    fast = config.get('ma_fast', MA_FAST)
+    slow = config.get('ma_slow', MA_SLOW)
 
-    df['ma9'] = df['close'].rolling(window=9).mean()
-    df['ma21'] = df['close'].rolling(window=21).mean()
+    rows = get_kline_array(symbol, interval='3m', limit=INDICATOR_HISTORY)
+    if rows is None or len(rows) < slow + 1:
+        log(f"⛔ Dados insuficientes para médias móveis {symbol}", level="WARNING", symbol=symbol)
+        return
 
-    ma9_prev, ma9_curr = df['ma9'].iloc[-2], df['ma9'].iloc[-1]
-    ma21_prev, ma21_curr = df['ma21'].iloc[-2], df['ma21'].iloc[-1]
+    fast_prev, fast_curr = live_values(symbol, '3m', rows, f'ma{fast}', lambda: SMA(fast))
+    slow_prev, slow_curr = live_values(symbol, '3m', rows, f'ma{slow}', lambda: SMA(slow))
 
     direction = CONFIGS.get(symbol, {}).get('direction', 'BOTH')
-    risk_percent = CONFIGS.get(symbol, {}).get('risk_percent', RISK_PERCENT)
 
     # Compra: cruzamento de alta + trigger RSI LONG
-    if ma9_prev < ma21_prev and ma9_curr > ma21_curr and rsi_trigger_flags[symbol].get('LONG') and direction in ['LONG', 'BOTH']:
-        log(f"🔔 Sinal COMPRA (LONG) confirmado para {symbol} (RSI + MA9>MA21)")
-        if place_order(symbol, 'LONG', get_available_margin() * risk_percent):
-            rsi_trigger_flags[symbol]['LONG'] = False
+    if fast_prev < slow_prev and fast_curr > slow_curr and rsi_trigger_flags[symbol].get('LONG') and direction in ['LONG', 'BOTH']:
+        signal_time = time.time()
+        log(f"🔔 Sinal COMPRA (LONG) confirmado para {symbol} (RSI + MA{fast}>MA{slow})", symbol=symbol, event="signal")
+        if place_order(symbol, 'LONG', signal_time=signal_time):
+            set_rsi_trigger(symbol, 'LONG', False)
 
     # Venda: cruzamento de baixa + trigger RSI SHORT
-    elif ma9_prev > ma21_prev and ma9_curr < ma21_curr and rsi_trigger_flags[symbol].get('SHORT') and direction in ['SHORT', 'BOTH']:
-        log(f"🔻 Sinal VENDA (SHORT) confirmado para {symbol} (RSI + MA9<MA21)")
-        if place_order(symbol, 'SHORT', get_available_margin() * risk_percent):
-            rsi_trigger_flags[symbol]['SHORT'] = False
+    elif fast_prev > slow_prev and fast_curr < slow_curr and rsi_trigger_flags[symbol].get('SHORT') and direction in ['SHORT', 'BOTH']:
+        signal_time = time.time()
+        log(f"🔻 Sinal VENDA (SHORT) confirmado para {symbol} (RSI + MA{fast}<MA{slow})", symbol=symbol, event="signal")
+        if place_order(symbol, 'SHORT', signal_time=signal_time):
+            set_rsi_trigger(symbol, 'SHORT', False)
 
     else:
-        log(f"ℹ️ {symbol} sem sinal (RSI ou MA cruzamento não confirmados)")
+        log(f"ℹ️ {symbol} sem sinal (RSI ou MA cruzamento não confirmados)", level="DEBUG", symbol=symbol, event="no_signal")
 
 def check_signals_turtle(symbol):
     # Etapa 1: Verifica RSI (1h) e atualiza flag
     update_rsi_trigger(symbol)
 
     # Etapa 2: Verifica rompimento dos últimos 20 candles no 1h
-    df = get_klines(symbol, interval='1h', limit=21)
-    if df.empty or len(df) < 21:
+    n = CONFIGS.get(symbol, {}).get('breakout_lookback', BREAKOUT_LOOKBACK)
+    rows = get_kline_array(symbol, interval='1h', limit=INDICATOR_HISTORY)
+    if rows is None or len(rows) < n + 1:
         return
 
-    breakout_high = df['high'][:-1].max()
-    breakout_low = df['low'][:-1].min()
-    last_close = df['close'].iloc[-1]
+    # Máximo/mínimo dos n candles anteriores ao último
+    breakout_high, _ = live_values(symbol, '1h', rows, f'high{n}', lambda: RollingMax(n), field='high')
+    breakout_low, _ = live_values(symbol, '1h', rows, f'low{n}', lambda: RollingMin(n), field='low')
+    last_close = rows['close'][-1]
 
     direction = CONFIGS.get(symbol, {}).get('direction', 'BOTH')
-    risk_percent = CONFIGS.get(symbol, {}).get('risk_percent', RISK_PERCENT)
 
     if last_close > breakout_high and rsi_trigger_flags[symbol]['LONG'] and direction in ['LONG', 'BOTH']:
-        log(f"🐢 Turtle LONG breakout confirmado para {symbol}")
-        success = place_order(symbol, 'LONG', get_available_margin() * risk_percent)
+        signal_time = time.time()
+        log(f"🐢 Turtle LONG breakout confirmado para {symbol}", symbol=symbol, event="signal")
+        success = place_order(symbol, 'LONG', signal_time=signal_time)
         if success:
-            rsi_trigger_flags[symbol]['LONG'] = False
+            set_rsi_trigger(symbol, 'LONG', False)
 
     elif last_close < breakout_low and rsi_trigger_flags[symbol]['SHORT'] and direction in ['SHORT', 'BOTH']:
-        log(f"🐢 Turtle SHORT breakout confirmado para {symbol}")
-        success = place_order(symbol, 'SHORT', get_available_margin() * risk_percent)
+        signal_time = time.time()
+        log(f"🐢 Turtle SHORT breakout confirmado para {symbol}", symbol=symbol, event="signal")
+        success = place_order(symbol, 'SHORT', signal_time=signal_time)
         if success:
-            rsi_trigger_flags[symbol]['SHORT'] = False
+            set_rsi_trigger(symbol, 'SHORT', False)
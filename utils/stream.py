@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+import time
+import websocket
+from utils.util import log
+from utils.klines import get_kline_view, apply_stream_kline, set_stream_state, close_derived
+from utils.aggregate import AGGREGATE_KLINES, BASE_INTERVAL, derivable
+
+STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://fstream.binance.com")
+STREAM_RECORD_FILE = os.getenv("STREAM_RECORD_FILE")  # grava os frames recebidos (jsonl) para replay
+STREAM_INTERVALS = ['1h', '5m', '3m']  # intervalos usados pelas estratégias
+MAX_STREAMS_PER_CONNECTION = 200
+RECONNECT_DELAY = 5
+
+# Tabela de último preço (mark price) por símbolo: symbol -> (preço, timestamp)
+last_prices = {}
+
+_callbacks = []
+_client = None
+_record_lock = threading.Lock()
+_threads = []
+_last_message = 0.0
+_started_at = 0.0
+
+
+def get_last_price(symbol, max_age=5.0):
+    entry = last_prices.get(symbol)
+    if entry is None or time.time() - entry[1] > max_age:
+        return None
+    return entry[0]
+
+
+def _record(raw):
+    with _record_lock:
+        with open(STREAM_RECORD_FILE, "a") as f:
+            f.write(json.dumps({'t': int(time.time() * 1000), 'frame': raw}) + "\n")
+
+
+def handle_message(raw):
+    global _last_message
+    _last_message = time.time()
+    if STREAM_RECORD_FILE:
+        _record(raw)
+    msg = json.loads(raw)
+    data = msg.get('data', msg)
+    event = data.get('e')
+
+    if event == 'kline':
+        k = data['k']
+        symbol = data['s']
+        if apply_stream_kline(symbol, k['i'], k):
+            closed = [k['i']]
+            if AGGREGATE_KLINES and k['i'] == BASE_INTERVAL and _client is not None:
+                # Intervalos maiores saem da agregação do minuto que fechou
+                closed += close_derived(_client, symbol, k['T'] + 1)
+            for interval in closed:
+                for callback in _callbacks:
+                    try:
+                        callback(symbol, interval)
+                    except Exception as e:
+                        log(f"Erro no callback de candle {symbol} {interval}: {e}", level="ERROR")
+    elif event == 'markPriceUpdate':
+        last_prices[data['s']] = (float(data['p']), time.time())
+
+
+# Segundos desde a última mensagem do stream (None se o stream não foi iniciado)
+def stream_age():
+    if not _threads:
+        return None
+    return time.time() - (_last_message or _started_at)
+
+
+def stream_names(symbols, intervals):
+    names = []
+    for symbol in symbols:
+        s = symbol.lower()
+        names.append(f"{s}@markPrice@1s")
+        for interval in intervals:
+            names.append(f"{s}@kline_{interval}")
+    return names
+
+
+def _run_connection(names, keys):
+    url = f"{STREAM_URL}/stream?streams={'/'.join(names)}"
+
+    def on_open(ws):
+        log(f"📡 Stream conectado ({len(names)} streams)")
+
+    def on_message(ws, raw):
+        try:
+            handle_message(raw)
+        except Exception as e:
+            log(f"Erro ao processar mensagem do stream: {e}", level="ERROR")
+
+    def on_error(ws, error):
+        log(f"Erro no stream: {error}", level="ERROR")
+
+    def on_close(ws, code, reason):
+        # Enquanto desconectado, get_klines volta a usar REST
+        set_stream_state(keys, False)
+        log(f"📴 Stream desconectado ({code} {reason})")
+
+    while True:
+        ws = websocket.WebSocketApp(
+            url, on_open=on_open, on_message=on_message, on_error=on_error, on_close=on_close
+        )
+        ws.run_forever()
+        set_stream_state(keys, False)
+        time.sleep(RECONNECT_DELAY)
+
+
+# Com a agregação ligada basta o stream de 1m (e os intervalos que não dá para montar)
+def subscribed_intervals(intervals):
+    if not AGGREGATE_KLINES:
+        return list(intervals)
+    return [BASE_INTERVAL] + [i for i in intervals if i != BASE_INTERVAL and not derivable(i)]
+
+
+def start_market_stream(client, symbols, intervals=STREAM_INTERVALS, on_candle_close=None):
+    global _started_at, _client
+    _client = client
+    if on_candle_close is not None:
+        _callbacks.append(on_candle_close)
+
+    # Carga inicial via REST; o stream só acrescenta candles novos
+    for symbol in symbols:
+        for interval in intervals:
+            try:
+                get_kline_view(client, symbol, interval)
+            except Exception as e:
+                log(f"Erro ao carregar klines iniciais {symbol} {interval}: {e}", level="ERROR")
+
+    _started_at = time.time()
+    intervals = subscribed_intervals(intervals)
+    per_symbol = 1 + len(intervals)
+    chunk = max(1, MAX_STREAMS_PER_CONNECTION // per_symbol)
+    for i in range(0, len(symbols), chunk):
+        group = symbols[i:i + chunk]
+        names = stream_names(group, intervals)
+        keys = [(s, interval) for s in group for interval in intervals]
+        t = threading.Thread(target=_run_connection, args=(names, keys), daemon=True)
+        t.start()
+        _threads.append(t)
@@ -0,0 +1,88 @@
+import os
+import math
+import threading
+import time
+from collections import namedtuple
+from utils.util import log
+
+# Registro compacto com os filtros de cada símbolo (extraído do exchange info)
+SymbolInfo = namedtuple('SymbolInfo', [
+    'symbol', 'tick_size', 'step_size', 'min_qty', 'min_notional',
+    'price_decimals', 'qty_decimals',
+])
+
+SYMBOLS_TTL = int(os.getenv("SYMBOLS_TTL", 3600))  # segundos entre atualizações do exchange info
+
+_symbols = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+_refresher = None
+
+
+def _decimals(step):
+    if step <= 0:
+        return 0
+    return max(0, abs(int(round(math.log10(step)))))
+
+
+def parse_symbol(s):
+    tick_size = 0.01
+    step_size = 0.001
+    min_qty = 0.001
+    min_notional = 0.0
+    for filt in s.get('filters', []):
+        if filt['filterType'] == 'PRICE_FILTER':
+            tick_size = float(filt['tickSize'])
+        elif filt['filterType'] == 'LOT_SIZE':
+            step_size = float(filt['stepSize'])
+            min_qty = float(filt['minQty'])
+        elif filt['filterType'] == 'MIN_NOTIONAL':
+            min_notional = float(filt.get('notional', filt.get('minNotional', 0.0)))
+    return SymbolInfo(
+        symbol=s['symbol'],
+        tick_size=tick_size,
+        step_size=step_size,
+        min_qty=min_qty,
+        min_notional=min_notional,
+        price_decimals=_decimals(tick_size),
+        qty_decimals=_decimals(step_size),
+    )
+
+
+def load_symbols(client):
+    global _symbols, _loaded_at
+    try:
+        info = client.futures_exchange_info()
+        symbols = {s['symbol']: parse_symbol(s) for s in info['symbols']}
+    except Exception as e:
+        log(f"Erro ao carregar exchange info: {e}", level="ERROR")
+        return False
+    # Troca o dicionário inteiro para que leitores nunca vejam um estado parcial
+    with _lock:
+        _symbols = symbols
+        _loaded_at = time.time()
+    return True
+
+
+def get_symbol(symbol):
+    return _symbols.get(symbol)
+
+
+def symbols_age():
+    return time.time() - _loaded_at if _loaded_at else None
+
+
+def _refresh_loop(client, ttl):
+    while True:
+        # Se a última carga falhou, tenta novamente mais cedo
+        time.sleep(ttl if _symbols else min(ttl, 60))
+        if load_symbols(client):
+            log(f"🔄 Exchange info atualizado ({len(_symbols)} símbolos)")
+
+
+def start_symbols_refresher(client, ttl=SYMBOLS_TTL):
+    global _refresher
+    if _refresher is not None and _refresher.is_alive():
+        return
+    _refresher = threading.Thread(target=_refresh_loop, args=(client, ttl), daemon=True)
+    _refresher.start()
@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
-from utils.util import log
-import requests
+from utils.notifier import Notifier
 
 
 load_dotenv()
@@ -12,12 +11,19 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
 ENABLE_TELEGRAM_ALERTS = True   # Ajuste aqui para ativar/desativar Telegram
 
+TELEGRAM_MAX_CHARS = 4096
+
+
+def _post_telegram(session, text):
+    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text}
+    return session.post(url, json=payload, timeout=5)
+
+
+telegram_notifier = Notifier("telegram", _post_telegram, TELEGRAM_MAX_CHARS)
+
 
 def send_telegram(msg):
+    # Só enfileira: o envio acontece na thread do notifier
     if ENABLE_TELEGRAM_ALERTS and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {"chat_id": TELEGRAM_CHAT_ID, "text": msg}
-        try:
-            requests.post(url, json=payload, timeout=5)
-        except Exception as e:
-            log(f"Erro ao enviar Telegram: {e}")
\ No newline at end of file
+        telegram_notifier.enqueue(msg)
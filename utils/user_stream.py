@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+import websocket
+from utils.util import log
+from utils.stream import STREAM_URL
+
+LISTEN_KEY_KEEPALIVE = 30 * 60  # listenKey expira em 60 min sem keepalive
+RECONNECT_DELAY = 5
+
+_handlers = {}
+_listen_key = None
+
+
+def _parse_fill(data):
+    o = data['o']
+    return {
+        'order_id': o['i'],
+        'side': o['S'],
+        'type': o.get('ot', o['o']),
+        'status': o['X'],
+        'price': float(o['L']),
+        'qty': float(o['l']),
+        'avg_price': float(o['ap']),
+        'filled_qty': float(o['z']),
+        'realized_pnl': float(o.get('rp', 0.0)),
+        'reduce_only': bool(o.get('R', False)),
+        'close_position': bool(o.get('cp', False)),
+        'time': data.get('T', data.get('E')),
+    }
+
+
+def handle_user_message(raw):
+    data = json.loads(raw)
+    event = data.get('e')
+
+    if event == 'ORDER_TRADE_UPDATE':
+        # Só execuções reais (TRADE) interessam para o estado da posição
+        if data['o']['x'] == 'TRADE' and 'on_fill' in _handlers:
+            _handlers['on_fill'](data['o']['s'], _parse_fill(data))
+    elif event == 'ACCOUNT_UPDATE':
+        if 'on_position' in _handlers:
+            for p in data['a'].get('P', []):
+                _handlers['on_position'](p['s'], float(p['pa']), float(p['ep']))
+    elif event == 'listenKeyExpired':
+        log("⚠️ listenKey expirado, reconectando user data stream")
+        raise ConnectionError("listenKey expirado")
+
+
+def _keepalive_loop(client):
+    while True:
+        time.sleep(LISTEN_KEY_KEEPALIVE)
+        if _listen_key is None:
+            continue
+        try:
+            client.futures_stream_keepalive(listenKey=_listen_key)
+        except Exception as e:
+            log(f"Erro no keepalive do listenKey: {e}", level="ERROR")
+
+
+def _run(client):
+    global _listen_key
+    while True:
+        try:
+            _listen_key = client.futures_stream_get_listen_key()
+        except Exception as e:
+            log(f"Erro ao obter listenKey: {e}", level="ERROR")
+            time.sleep(RECONNECT_DELAY)
+            continue
+
+        def on_open(ws):
+            log("📡 User data stream conectado")
+            # Eventos perdidos enquanto desconectado são recuperados pela reconciliação
+            if 'on_reconnect' in _handlers:
+                threading.Thread(target=_handlers['on_reconnect'], daemon=True).start()
+
+        def on_message(ws, raw):
+            try:
+                handle_user_message(raw)
+            except ConnectionError:
+                ws.close()
+            except Exception as e:
+                log(f"Erro ao processar user data stream: {e}", level="ERROR")
+
+        def on_error(ws, error):
+            log(f"Erro no user data stream: {error}", level="ERROR")
+
+        ws = websocket.WebSocketApp(
+            f"{STREAM_URL}/ws/{_listen_key}", on_open=on_open, on_message=on_message, on_error=on_error
+        )
+        ws.run_forever()
+        log("📴 User data stream desconectado")
+        time.sleep(RECONNECT_DELAY)
+
+
+def start_user_stream(client, on_fill, on_position, on_reconnect=None):
+    _handlers['on_fill'] = on_fill
+    _handlers['on_position'] = on_position
+    if on_reconnect is not None:
+        _handlers['on_reconnect'] = on_reconnect
+    threading.Thread(target=_run, args=(client,), daemon=True).start()
+    threading.Thread(target=_keepalive_loop, args=(client,), daemon=True).start()
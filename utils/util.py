@@ -1,7 +1,171 @@
+import os
+import sys
+import json
+import atexit
+import queue
+import threading
 from datetime import datetime
+from utils import clock
 
+# Log assíncrono: log() só enfileira; uma thread grava em lote no arquivo
+# (mantido aberto) e no console, rotacionando por tamanho e por dia. Se a
+# gravação travar e a fila encher, as linhas mais antigas são descartadas e o
+# writer registra quantas se perderam.
 
-def log(msg):
-    print(msg)
-    with open("logs.txt", "a") as f:
-        f.write(f"{datetime.now()} | {msg}\n")
\ No newline at end of file
+LOG_FILE = os.getenv("LOG_FILE", "logs.txt")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", 5))
+LOG_ROTATE_DAILY = os.getenv("LOG_ROTATE_DAILY", "true").lower() == "true"
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 0.5))  # segundos entre gravações
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 50_000))  # linhas pendentes antes de descartar
+LOG_BATCH_SIZE = 1000
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_dropped = 0
+_writer = None
+_writer_lock = threading.Lock()
+_stop = object()
+
+
+def set_level(level):
+    global LOG_LEVEL
+    LOG_LEVEL = level.upper()
+
+
+def log(msg, level="INFO", **fields):
+    # Campos extras (symbol=..., event=...) vão para a saída JSON
+    if LEVELS.get(level, 20) < LEVELS.get(LOG_LEVEL, 20):
+        return
+    _ensure_writer()
+    # Horário do relógio do bot (virtual no replay)
+    _enqueue((datetime.fromtimestamp(clock.now()), level, msg, fields))
+
+
+def _enqueue(record):
+    global _dropped
+    try:
+        _queue.put_nowait(record)
+        return
+    except queue.Full:
+        pass
+    # Política de descarte: perde a linha mais antiga
+    try:
+        oldest = _queue.get_nowait()
+        if oldest is _stop:
+            # Encerramento em andamento: o marcador fica, a linha nova é que se perde
+            _queue.put_nowait(_stop)
+            oldest = record
+        _dropped += 1
+        if oldest is not record:
+            _queue.put_nowait(record)
+    except (queue.Empty, queue.Full):
+        pass
+
+
+def log_queue_depth():
+    return _queue.qsize()
+
+
+def log_dropped():
+    return _dropped
+
+
+def _format(record):
+    ts, level, msg, fields = record
+    if LOG_FORMAT == "json":
+        return json.dumps({"time": ts.isoformat(), "level": level, "msg": msg, **fields}, ensure_ascii=False, default=str)
+    return f"{ts} | {msg}" if level == "INFO" else f"{ts} | {level} | {msg}"
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.day = None
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.day = datetime.now().date()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(LOG_BACKUPS - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if LOG_BACKUPS > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, lines):
+        if LOG_ROTATE_DAILY and datetime.now().date() != self.day and self.file.tell() > 0:
+            self._rotate()
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+        if LOG_MAX_BYTES and self.file.tell() >= LOG_MAX_BYTES:
+            self._rotate()
+
+
+def _run():
+    writer = _Writer(LOG_FILE)
+    reported = 0
+    running = True
+    while running:
+        try:
+            batch = [_queue.get(timeout=LOG_FLUSH_INTERVAL)]
+        except queue.Empty:
+            continue
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if _stop in batch:
+            running = False
+            batch = [r for r in batch if r is not _stop]
+        if _dropped > reported:
+            lost, reported = _dropped - reported, _dropped
+            batch.append((datetime.fromtimestamp(clock.now()), "WARNING",
+                          f"⚠️ Fila de log cheia, {lost} linhas descartadas ({reported} no total)", {}))
+        if not batch:
+            continue
+        try:
+            if LOG_CONSOLE:
+                sys.stdout.write("\n".join(r[2] for r in batch) + "\n")
+                sys.stdout.flush()
+            writer.write([_format(r) for r in batch])
+        except Exception as e:
+            sys.stderr.write(f"Erro ao gravar log: {e}\n")
+    writer.file.close()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="log-writer", daemon=True)
+            _writer.start()
+
+
+def flush_log(timeout=5):
+    # Grava o que estiver pendente e encerra a thread (usado na saída)
+    if _writer is None or not _writer.is_alive():
+        return
+    try:
+        _queue.put(_stop, timeout=timeout)
+    except queue.Full:
+        return
+    _writer.join(timeout)
+
+
+atexit.register(flush_log)
@@ -0,0 +1,90 @@
+import base64
+import hashlib
+import socketserver
+import struct
+
+# Servidor WebSocket mínimo (somente stdlib) usado pelos substitutos locais
+# da Binance (ws_replay.py, mock_exchange.py). Envia frames de texto sem máscara.
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def ws_handshake(sock):
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            return None
+        data += chunk
+    lines = data.split(b'\r\n')
+    path = lines[0].split(b' ')[1].decode()
+    key = None
+    for line in lines[1:]:
+        if line.lower().startswith(b'sec-websocket-key:'):
+            key = line.split(b':', 1)[1].strip()
+    if key is None:
+        return None
+    accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+    sock.sendall(
+        b"HTTP/1.1 101 Switching Protocols\r\n"
+        b"Upgrade: websocket\r\n"
+        b"Connection: Upgrade\r\n"
+        b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+    )
+    return path
+
+
+def ws_send(sock, text, opcode=0x1):
+    payload = text.encode() if isinstance(text, str) else text
+    size = len(payload)
+    if size < 126:
+        header = struct.pack('!BB', 0x80 | opcode, size)
+    elif size < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, size)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, size)
+    sock.sendall(header + payload)
+
+
+def _recv_exact(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("conexão encerrada")
+        data += chunk
+    return data
+
+
+def ws_recv(sock):
+    b1, b2 = _recv_exact(sock, 2)
+    opcode = b1 & 0x0F
+    size = b2 & 0x7F
+    if size == 126:
+        size = struct.unpack('!H', _recv_exact(sock, 2))[0]
+    elif size == 127:
+        size = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b2 & 0x80 else None
+    payload = _recv_exact(sock, size)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+# Lê frames do cliente em segundo plano: responde pings e detecta o fechamento
+def ws_drain(sock, closed):
+    try:
+        while True:
+            opcode, payload = ws_recv(sock)
+            if opcode == 0x9:
+                ws_send(sock, payload, opcode=0xA)
+            elif opcode == 0x8:
+                break
+    except (ConnectionError, OSError, ValueError):
+        pass
+    closed.set()
+
+
+class ThreadingWSServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
@@ -0,0 +1,76 @@
+import argparse
+import json
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from utils.ws_server import ws_handshake, ws_send, ws_drain, ThreadingWSServer
+
+# Substituto local do WebSocket da Binance: reproduz frames gravados com
+# STREAM_RECORD_FILE. Use com BINANCE_STREAM_URL=ws://localhost:<porta>
+
+
+def load_frames(path):
+    frames = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                frames.append((entry['t'], entry['frame']))
+    return frames
+
+
+def make_handler(frames, speed, loop):
+    class ReplayHandler(socketserver.BaseRequestHandler):
+        def handle(self):
+            path = ws_handshake(self.request)
+            if path is None:
+                return
+            query = parse_qs(urlparse(path).query)
+            wanted = set(query['streams'][0].split('/')) if 'streams' in query else None
+
+            closed = threading.Event()
+            threading.Thread(target=ws_drain, args=(self.request, closed), daemon=True).start()
+
+            while not closed.is_set():
+                start_wall = time.time()
+                start_t = frames[0][0] if frames else 0
+                for t, raw in frames:
+                    if closed.is_set():
+                        return
+                    if wanted is not None and json.loads(raw).get('stream') not in wanted:
+                        continue
+                    if speed > 0:
+                        delay = (t - start_t) / 1000 / speed - (time.time() - start_wall)
+                        if delay > 0:
+                            time.sleep(delay)
+                    try:
+                        ws_send(self.request, raw)
+                    except OSError:
+                        return
+                if not loop:
+                    break
+            closed.wait()
+
+    return ReplayHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de frames WebSocket gravados")
+    parser.add_argument("file", help="arquivo jsonl gravado com STREAM_RECORD_FILE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9443)
+    parser.add_argument("--speed", type=float, default=1.0, help="multiplicador de velocidade (0 = sem espera)")
+    parser.add_argument("--loop", action="store_true", help="repete a gravação indefinidamente")
+    args = parser.parse_args()
+
+    frames = load_frames(args.file)
+    server = ThreadingWSServer((args.host, args.port), make_handler(frames, args.speed, args.loop))
+    print(f"🔁 Reproduzindo {len(frames)} frames em ws://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()